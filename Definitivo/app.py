@@ -1,17 +1,38 @@
 ﻿# app.py - Servidor web principal (Flask)
-from flask import Flask, render_template, abort, request
-import asyncio
-from playwright.async_api import async_playwright
+from flask import Flask, render_template, stream_template, abort, request, Response, stream_with_context
+import contextlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from bs4 import BeautifulSoup
 import datetime
 import re
 import math
+from urllib.parse import urlparse
 
 # Â¡Importante! Importa tu nuevo mÃ³dulo de scraping
-from modules.estudio_scraper import obtener_datos_completos_partido, format_ah_as_decimal_string_of, obtener_datos_preview_rapido, obtener_datos_preview_ligero
+from modules.estudio_scraper import BASE_URL_OF, obtener_resultado_analisis, format_ah_as_decimal_string_of, obtener_datos_preview_rapido, obtener_datos_preview_ligero
+from modules.shared_fetch import SharedFetches
+from modules.analysis_cache import obtener_resultado_cacheado
+from modules.circuit_breaker import BREAKER_RESET_TIMEOUT
+from modules.prewarm import get_prewarm_scheduler
+from modules import html_archive
+from modules.async_runtime import get_browser_pool, run_async
+from modules.fragment_cache import render_fragments
+from modules import health, http_caching
+from modules.http_caching import etag_matches, make_etag, not_modified
+from modules.match_index import get_upcoming_store, parse_query
+from modules.odds_tracker import get_odds_tracker
 from flask import jsonify # AsegÃºrate de que jsonify estÃ¡ importado
 
 app = Flask(__name__)
+# ETag/304, Cache-Control y compresion gzip/brotli de las respuestas (modules/http_caching.py)
+http_caching.init_app(app)
+
+# Análisis concurrentes por lote (cada uno abre su propio Chrome)
+BATCH_MAX_WORKERS = int(os.environ.get('BATCH_MAX_WORKERS', 3))
+BATCH_MAX_IDS = int(os.environ.get('BATCH_MAX_IDS', 100))
 
 # --- MantÃ©n tu lÃ³gica para la pÃ¡gina principal ---
 URL_NOWGOAL = "https://live20.nowgoal25.com/"
@@ -123,11 +144,13 @@ def parse_main_page_matches(html_content, limit=20, offset=0, handicap_filter=No
 
         if match_time < now_utc: continue
 
+        league_cell = row.find('td', class_='black-down')
         home_team_tag = row.find('a', {'id': f'team1_{match_id}'})
         away_team_tag = row.find('a', {'id': f'team2_{match_id}'})
         odds_data = row.get('odds', '').split(',')
         handicap = odds_data[2] if len(odds_data) > 2 else "N/A"
         goal_line = odds_data[10] if len(odds_data) > 10 else "N/A"
+        odd = lambda i: odds_data[i] if len(odds_data) > i else ""
 
         # Filtro robusto: Ignorar si no hay datos de handicap o goles
         if not handicap or handicap == "N/A" or not goal_line or goal_line == "N/A":
@@ -139,7 +162,13 @@ def parse_main_page_matches(html_content, limit=20, offset=0, handicap_filter=No
             "home_team": home_team_tag.text.strip() if home_team_tag else "N/A",
             "away_team": away_team_tag.text.strip() if away_team_tag else "N/A",
             "handicap": handicap,
-            "goal_line": goal_line
+            "goal_line": goal_line,
+            "ah_home_odds": odd(3),
+            "ah_away_odds": odd(4),
+            "over_odds": odd(11),
+            "under_odds": odd(12),
+            "league": league_cell.get('title', '').strip() if league_cell else "",
+            "league_id": row.get('sclassid', '')
         })
 
     # Aplicar filtro por hÃ¡ndicap mapeando a pasos de 0.5
@@ -157,32 +186,72 @@ def parse_main_page_matches(html_content, limit=20, offset=0, handicap_filter=No
             pass
 
     upcoming_matches.sort(key=lambda x: x['time'])
+    if limit is None:
+        return upcoming_matches[offset:]
     return upcoming_matches[offset:offset+limit]
 
 async def get_main_page_matches_async(limit=20, offset=0, handicap_filter=None):
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True, args=['--no-sandbox','--disable-setuid-sandbox','--disable-dev-shm-usage'])
-        page = await browser.new_page()
-        try:
-            await page.goto(URL_NOWGOAL, wait_until="domcontentloaded", timeout=20000)
-            await page.wait_for_timeout(5000)
-            html_content = await page.content()
-            return parse_main_page_matches(html_content, limit, offset, handicap_filter)
-        finally:
-            await browser.close()
+    if html_archive.replaying():
+        html_content = html_archive.replay_page(URL_NOWGOAL, "home")
+        if html_content is None:
+            raise RuntimeError("La portada no está en el archivo HTML.")
+        matches = parse_main_page_matches(html_content, limit, offset, handicap_filter)
+        health.note_snapshot(matches)
+        return matches
+    # Chromium persistente del worker (modules/async_runtime.py): solo se abre una pagina
+    async with get_browser_pool().page() as page:
+        await page.goto(URL_NOWGOAL, wait_until="domcontentloaded", timeout=20000)
+        await page.wait_for_timeout(5000)
+        html_content = await page.content()
+    html_archive.archive_page(URL_NOWGOAL, html_content, "home")
+    matches = parse_main_page_matches(html_content, limit, offset, handicap_filter)
+    health.note_snapshot(matches)
+    return matches
+
+# Próximos partidos indexados en memoria: filtros y paginación sin volver a descargar (modules/match_index.py)
+upcoming_store = get_upcoming_store(normalize_handicap_to_half_bucket_str)
+
+def indice_proximos():
+    """Índice de la portada; se vuelve a descargar solo cuando ha caducado (MATCH_INDEX_TTL)."""
+    return upcoming_store.get(lambda: run_async(get_main_page_matches_async(limit=None)))
+
+# Precalentamiento de analisis de los partidos que empiezan pronto (modules/prewarm.py): recibe
+# las fotos del indice de la portada en lugar de descargarla por su cuenta
+prewarm = get_prewarm_scheduler(lambda match_id: obtener_resultado_analisis(match_id), indice_proximos)
+if prewarm:
+    upcoming_store.add_listener(prewarm.note_snapshot)
+
+# Historial de movimientos de cuotas de cada foto indexada (modules/odds_tracker.py), en SQLite
+# compartido entre workers; el sondeo propio es opcional y lo hace un solo worker
+odds_tracker = get_odds_tracker()
+if odds_tracker:
+    upcoming_store.add_listener(odds_tracker.observe)
+    odds_tracker.start_polling(indice_proximos)
+
+def _interactiva():
+    """Contexto que hace ceder el paso al precalentamiento durante una peticion de usuario."""
+    return prewarm.interactive() if prewarm else contextlib.nullcontext()
+
+# --- Sondas de Render: solo estado en memoria, nunca Chromium ni red (modules/health.py) ---
+@app.route('/healthz')
+def healthz():
+    return health.liveness(), 200, {'Cache-Control': http_caching.CACHE_NONE}
+
+@app.route('/readyz')
+def readyz():
+    ready, checks = health.readiness(urlparse(BASE_URL_OF).netloc)
+    return {'ready': ready, 'checks': checks}, 200 if ready else 503, {'Cache-Control': http_caching.CACHE_NONE}
 
 @app.route('/')
 def index():
     try:
         print("Recibida peticiÃ³n. Ejecutando scraper de partidos...")
         hf = request.args.get('handicap')
-        matches = asyncio.run(get_main_page_matches_async(handicap_filter=hf))
+        indice = indice_proximos()
+        matches, next_cursor = indice.query(handicap=hf, limit=20)
         print(f"Scraper finalizado. {len(matches)} partidos encontrados.")
-        opts = sorted({
-            normalize_handicap_to_half_bucket_str(m.get('handicap'))
-            for m in matches if normalize_handicap_to_half_bucket_str(m.get('handicap')) is not None
-        }, key=lambda x: float(x))
-        return render_template('index.html', matches=matches, handicap_filter=hf, handicap_options=opts)
+        return render_template('index.html', matches=matches, handicap_filter=hf,
+                               handicap_options=indice.handicap_options, next_cursor=next_cursor)
     except Exception as e:
         print(f"ERROR en la ruta principal: {e}")
         return render_template('index.html', matches=[], error=f"No se pudieron cargar los partidos: {e}")
@@ -190,30 +259,89 @@ def index():
 @app.route('/api/matches')
 def api_matches():
     try:
-        offset = int(request.args.get('offset', 0))
-        limit = int(request.args.get('limit', 5))
-        matches = asyncio.run(get_main_page_matches_async(limit, offset, request.args.get('handicap')))
-        return {'matches': matches}
+        query = dict({'limit': 5}, **parse_query(request.args))
+    except ValueError as e:
+        return {'error': str(e)}, 400, {'Cache-Control': http_caching.CACHE_NONE}
+    try:
+        indice = indice_proximos()
+        # Misma portada indexada y mismos parámetros en el mismo minuto -> misma página
+        etag = make_etag(indice.built_at, sorted(query.items()), time.strftime('%Y-%m-%d %H:%M', time.gmtime()))
+        if etag_matches(etag):
+            return not_modified(etag, http_caching.CACHE_MATCH_LIST)
+        matches, next_cursor = indice.query(**query)
+        response = jsonify({'matches': matches, 'next_cursor': next_cursor})
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = http_caching.CACHE_MATCH_LIST
+        return response
     except Exception as e:
-        return {'error': str(e)}, 500
+        return {'error': str(e)}, 500, {'Cache-Control': http_caching.CACHE_NONE}
 
 @app.route('/proximos')
 def proximos():
     try:
         print("Recibida peticiÃ³n. Ejecutando scraper de partidos...")
         hf = request.args.get('handicap')
-        matches = asyncio.run(get_main_page_matches_async(25, 0, hf))
+        indice = indice_proximos()
+        matches, next_cursor = indice.query(handicap=hf, limit=25)
         print(f"Scraper finalizado. {len(matches)} partidos encontrados.")
-        opts = sorted({
-            normalize_handicap_to_half_bucket_str(m.get('handicap'))
-            for m in matches if normalize_handicap_to_half_bucket_str(m.get('handicap')) is not None
-        }, key=lambda x: float(x))
-        return render_template('index.html', matches=matches, handicap_filter=hf, handicap_options=opts)
+        return render_template('index.html', matches=matches, handicap_filter=hf,
+                               handicap_options=indice.handicap_options, next_cursor=next_cursor)
     except Exception as e:
         print(f"ERROR en la ruta principal: {e}")
         return render_template('index.html', matches=[], error=f"No se pudieron cargar los partidos: {e}")
 
+@app.route('/api/odds_history/<string:match_id>')
+def api_odds_history(match_id):
+    if not odds_tracker:
+        return {'error': 'El historial de cuotas está desactivado.'}, 404, {'Cache-Control': http_caching.CACHE_NONE}
+    historial = odds_tracker.history(match_id)
+    if historial is None:
+        return {'error': f'Sin historial de cuotas para el partido {match_id}.'}, 404, {'Cache-Control': http_caching.CACHE_NONE}
+    return historial, 200, {'Cache-Control': http_caching.CACHE_MATCH_LIST}
+
+@app.route('/api/odds_movers')
+def api_odds_movers():
+    if not odds_tracker:
+        return {'error': 'El historial de cuotas está desactivado.'}, 404, {'Cache-Control': http_caching.CACHE_NONE}
+    try:
+        limit = max(1, min(int(request.args.get('limit', 20)), 100))
+    except ValueError:
+        return {'error': "'limit' debe ser un número"}, 400, {'Cache-Control': http_caching.CACHE_NONE}
+    return {'movers': odds_tracker.movers(limit), 'tracker': odds_tracker.snapshot()}, 200, \
+        {'Cache-Control': http_caching.CACHE_MATCH_LIST}
+
 # --- NUEVA RUTA PARA MOSTRAR EL ESTUDIO DETALLADO ---
+def _analizar_con_cache(match_id, shared_fetches=None):
+    """
+    Analisis completo pasando por la cache de resultados (modules/analysis_cache.py).
+    ?refresh=1 fuerza un analisis nuevo. Devuelve (AnalysisResult, estado de cache).
+    """
+    refresh = request.args.get('refresh') == '1'
+    with _interactiva():
+        return obtener_resultado_cacheado(
+            match_id, lambda: obtener_resultado_analisis(match_id, shared_fetches=shared_fetches), refresh=refresh
+        )
+
+# Codigo HTTP para cada tipo de error de AnalysisResult.error_kind
+_HTTP_STATUS_POR_ERROR = {
+    'invalid': 400,
+    'not_found': 404,
+    'upstream_unavailable': 503,
+    'upstream_error': 502,
+    'load_error': 504,
+}
+
+def _estado_http_error(resultado):
+    """(codigo HTTP, cabeceras) para un AnalysisResult con error."""
+    status = _HTTP_STATUS_POR_ERROR.get(resultado.error_kind, 500)
+    headers = {'Retry-After': str(int(BREAKER_RESET_TIMEOUT))} if status == 503 else {}
+    return status, headers
+
+def _render_estudio(datos_partido):
+    """estudio.html en streaming; cada seccion sale de la cache de fragmentos si sus datos no cambiaron."""
+    fragmentos = render_fragments(datos_partido, render_template)
+    return Response(stream_template('estudio.html', data=datos_partido, fragmentos=fragmentos), mimetype='text/html')
+
 @app.route('/estudio/<string:match_id>')
 def mostrar_estudio(match_id):
     """
@@ -221,17 +349,21 @@ def mostrar_estudio(match_id):
     """
     print(f"Recibida peticiÃ³n para el estudio del partido ID: {match_id}")
     
-    # Llama a la funciÃ³n principal de tu mÃ³dulo de scraping
-    datos_partido = obtener_datos_completos_partido(match_id)
+    # Llama a la funciÃ³n principal de tu mÃ³dulo de scraping (o la cache si no ha cambiado nada)
+    resultado, estado_cache = _analizar_con_cache(match_id)
+    datos_partido = resultado.to_template_data()
     
     if not datos_partido or "error" in datos_partido:
         # Si hay un error, puedes mostrar una pÃ¡gina de error
         print(f"Error al obtener datos para {match_id}: {datos_partido.get('error')}")
-        abort(500, description=datos_partido.get('error', 'Error desconocido'))
+        status, headers = _estado_http_error(resultado)
+        abort(Response(datos_partido.get('error', 'Error desconocido'), status=status, headers=headers))
 
     # Si todo va bien, renderiza la plantilla HTML pasÃ¡ndole los datos
-    print(f"Datos obtenidos para {datos_partido['home_name']} vs {datos_partido['away_name']}. Renderizando plantilla...")
-    return render_template('estudio.html', data=datos_partido, format_ah=format_ah_as_decimal_string_of)
+    print(f"Datos obtenidos para {datos_partido['home_name']} vs {datos_partido['away_name']} (cache: {estado_cache}). Renderizando plantilla...")
+    response = _render_estudio(datos_partido)
+    response.headers['X-Analysis-Cache'] = estado_cache
+    return response
 
 # --- NUEVA RUTA PARA ANALIZAR PARTIDOS FINALIZADOS ---
 @app.route('/analizar_partido', methods=['GET', 'POST'])
@@ -244,8 +376,9 @@ def analizar_partido():
         if match_id:
             print(f"Recibida peticiÃ³n para analizar partido finalizado ID: {match_id}")
             
-            # Llama a la funciÃ³n principal de tu mÃ³dulo de scraping
-            datos_partido = obtener_datos_completos_partido(match_id)
+            # Llama a la funciÃ³n principal de tu mÃ³dulo de scraping (o la cache)
+            resultado, _ = _analizar_con_cache(match_id)
+            datos_partido = resultado.to_template_data()
             
             if not datos_partido or "error" in datos_partido:
                 # Si hay un error, mostrarlo en la pÃ¡gina
@@ -254,7 +387,7 @@ def analizar_partido():
             
             # Si todo va bien, renderiza la plantilla HTML pasÃ¡ndole los datos
             print(f"Datos obtenidos para {datos_partido['home_name']} vs {datos_partido['away_name']}. Renderizando plantilla...")
-            return render_template('estudio.html', data=datos_partido, format_ah=format_ah_as_decimal_string_of)
+            return _render_estudio(datos_partido)
         else:
             return render_template('analizar_partido.html', error="Por favor, introduce un ID de partido vÃ¡lido.")
     
@@ -276,13 +409,130 @@ def api_preview(match_id):
         else:
             preview_data = obtener_datos_preview_ligero(match_id)
         if "error" in preview_data:
-            return jsonify(preview_data), 500
-        return jsonify(preview_data)
+            return jsonify(preview_data), 500, {'Cache-Control': http_caching.CACHE_NONE}
+        response = jsonify(preview_data)
+        response.headers['Cache-Control'] = http_caching.CACHE_PREVIEW
+        return response
     except Exception as e:
         print(f"Error en la ruta /api/preview/{match_id}: {e}")
         return jsonify({'error': 'OcurriÃ³ un error interno en el servidor.'}), 500
 
 
+def _construir_payload_analisis(datos):
+    """
+    Construye el JSON compacto de /api/analisis a partir del diccionario completo
+    devuelto por obtener_datos_completos_partido.
+    """
+    def df_to_rows(stats):
+        # stats es un MatchStats (modules/analysis_model.py) o None
+        rows = []
+        for row in getattr(stats, 'rows', None) or []:
+            rows.append({'label': row.label_es, 'home': row.home or '', 'away': row.away or ''})
+        return rows
+
+    payload = {
+        'home_team': datos.get('home_name', ''),
+        'away_team': datos.get('away_name', ''),
+        'recent_indirect_full': {
+            'last_home': None,
+            'last_away': None,
+            'h2h_col3': None
+        },
+        'comparativas_indirectas': {
+            'left': None,
+            'right': None
+        }
+    }
+
+    # Ultimo del Local
+    last_home = (datos.get('last_home_match') or {})
+    last_home_details = last_home.get('details') or {}
+    if last_home_details:
+        payload['recent_indirect_full']['last_home'] = {
+            'home': last_home_details.get('home_team'),
+            'away': last_home_details.get('away_team'),
+            'score': (last_home_details.get('score') or '').replace(':', ' : '),
+            'ah': format_ah_as_decimal_string_of(last_home_details.get('handicap_line_raw') or '-'),
+            'ou': last_home_details.get('ouLine') or '-',
+            'stats_rows': df_to_rows(last_home.get('stats'))
+        }
+
+    # Ultimo del Visitante
+    last_away = (datos.get('last_away_match') or {})
+    last_away_details = last_away.get('details') or {}
+    if last_away_details:
+        payload['recent_indirect_full']['last_away'] = {
+            'home': last_away_details.get('home_team'),
+            'away': last_away_details.get('away_team'),
+            'score': (last_away_details.get('score') or '').replace(':', ' : '),
+            'ah': format_ah_as_decimal_string_of(last_away_details.get('handicap_line_raw') or '-'),
+            'ou': last_away_details.get('ouLine') or '-',
+            'stats_rows': df_to_rows(last_away.get('stats'))
+        }
+
+    # H2H Rivales (Col3)
+    h2h_col3 = (datos.get('h2h_col3') or {})
+    h2h_col3_details = h2h_col3.get('details') or {}
+    if h2h_col3_details and h2h_col3_details.get('status') == 'found':
+        payload['recent_indirect_full']['h2h_col3'] = {
+            'home': h2h_col3_details.get('h2h_home_team_name'),
+            'away': h2h_col3_details.get('h2h_away_team_name'),
+            'score': f"{h2h_col3_details.get('goles_home')} : {h2h_col3_details.get('goles_away')}",
+            'ah': format_ah_as_decimal_string_of(h2h_col3_details.get('handicap_line_raw') or '-'),
+            'ou': h2h_col3_details.get('ou_result') or '-',
+            'stats_rows': df_to_rows(h2h_col3.get('stats'))
+        }
+
+    # Comparativas Indirectas (Left)
+    comp_left = (datos.get('comp_L_vs_UV_A') or {})
+    comp_left_details = comp_left.get('details') or {}
+    if comp_left_details:
+        payload['comparativas_indirectas']['left'] = {
+            'title_home_name': datos.get('home_name'),
+            'title_away_name': datos.get('away_name'),
+            'home_team': comp_left_details.get('home_team'),
+            'away_team': comp_left_details.get('away_team'),
+            'score': (comp_left_details.get('score') or '').replace(':', ' : '),
+            'ah': format_ah_as_decimal_string_of(comp_left_details.get('ah_line') or '-') if comp_left_details.get('ah_line') else '-',
+            'ou': comp_left_details.get('ou_line') or '-',
+            'localia': comp_left_details.get('localia') or '',
+            'stats_rows': df_to_rows(comp_left.get('stats'))
+        }
+
+    # Comparativas Indirectas (Right)
+    comp_right = (datos.get('comp_V_vs_UL_H') or {})
+    comp_right_details = comp_right.get('details') or {}
+    if comp_right_details:
+        payload['comparativas_indirectas']['right'] = {
+            'title_home_name': datos.get('home_name'),
+            'title_away_name': datos.get('away_name'),
+            'home_team': comp_right_details.get('home_team'),
+            'away_team': comp_right_details.get('away_team'),
+            'score': (comp_right_details.get('score') or '').replace(':', ' : '),
+            'ah': format_ah_as_decimal_string_of(comp_right_details.get('ah_line') or '-') if comp_right_details.get('ah_line') else '-',
+            'ou': comp_right_details.get('ou_line') or '-',
+            'localia': comp_right_details.get('localia') or '',
+            'stats_rows': df_to_rows(comp_right.get('stats'))
+        }
+
+    # Etapas omitidas por el deadline de la peticion
+    payload['partial'] = bool(datos.get('partial'))
+    payload['partial_stages'] = datos.get('partial_stages') or []
+    return payload
+
+
+def _etag_analisis(resultado, formato):
+    """
+    ETag de /api/analisis sin serializar la respuesta: huella de la pagina analizada
+    (cuotas + historial, la misma que guarda la cache) y duracion del calculo, que
+    distingue dos analisis distintos con la misma huella. Sin huella se usa el hash
+    del resultado.
+    """
+    fingerprint = resultado.fingerprint if not resultado.partial else None
+    if fingerprint is None:
+        fingerprint = make_etag(resultado.dumps())
+    return make_etag(fingerprint, resultado.elapsed_s, resultado.schema_version, formato)
+
 @app.route('/api/analisis/<string:match_id>')
 def api_analisis(match_id):
     """
@@ -290,125 +540,104 @@ def api_analisis(match_id):
     Devuelve solo:
     - Rendimiento Reciente y H2H Indirecto (3 columnas)
     - Comparativas Indirectas (2 columnas)
+    Con ?formato=completo devuelve el AnalysisResult serializado (esquema versionado).
     """
     try:
-        datos = obtener_datos_completos_partido(match_id)
-        if not datos or (isinstance(datos, dict) and datos.get('error')):
-            return jsonify({'error': (datos or {}).get('error', 'No se pudieron obtener datos.')}), 500
-
-        def df_to_rows(df):
-            rows = []
-            try:
-                if df is not None and hasattr(df, 'iterrows'):
-                    for idx, row in df.iterrows():
-                        label = str(idx)
-                        label = label.replace('Shots on Goal', 'Tiros a Puerta') \
-                                     .replace('Shots', 'Tiros') \
-                                     .replace('Dangerous Attacks', 'Ataques Peligrosos') \
-                                     .replace('Attacks', 'Ataques')
-                        try:
-                            home_val = row['Casa']
-                        except Exception:
-                            home_val = ''
-                        try:
-                            away_val = row['Fuera']
-                        except Exception:
-                            away_val = ''
-                        rows.append({'label': label, 'home': home_val or '', 'away': away_val or ''})
-            except Exception:
-                pass
-            return rows
-
-        payload = {
-            'home_team': datos.get('home_name', ''),
-            'away_team': datos.get('away_name', ''),
-            'recent_indirect_full': {
-                'last_home': None,
-                'last_away': None,
-                'h2h_col3': None
-            },
-            'comparativas_indirectas': {
-                'left': None,
-                'right': None
-            }
-        }
-
-        # Ultimo del Local
-        last_home = (datos.get('last_home_match') or {})
-        last_home_details = last_home.get('details') or {}
-        if last_home_details:
-            payload['recent_indirect_full']['last_home'] = {
-                'home': last_home_details.get('home_team'),
-                'away': last_home_details.get('away_team'),
-                'score': (last_home_details.get('score') or '').replace(':', ' : '),
-                'ah': format_ah_as_decimal_string_of(last_home_details.get('handicap_line_raw') or '-'),
-                'ou': last_home_details.get('ouLine') or '-',
-                'stats_rows': df_to_rows(last_home.get('stats'))
-            }
-
-        # Ultimo del Visitante
-        last_away = (datos.get('last_away_match') or {})
-        last_away_details = last_away.get('details') or {}
-        if last_away_details:
-            payload['recent_indirect_full']['last_away'] = {
-                'home': last_away_details.get('home_team'),
-                'away': last_away_details.get('away_team'),
-                'score': (last_away_details.get('score') or '').replace(':', ' : '),
-                'ah': format_ah_as_decimal_string_of(last_away_details.get('handicap_line_raw') or '-'),
-                'ou': last_away_details.get('ouLine') or '-',
-                'stats_rows': df_to_rows(last_away.get('stats'))
-            }
-
-        # H2H Rivales (Col3)
-        h2h_col3 = (datos.get('h2h_col3') or {})
-        h2h_col3_details = h2h_col3.get('details') or {}
-        if h2h_col3_details and h2h_col3_details.get('status') == 'found':
-            payload['recent_indirect_full']['h2h_col3'] = {
-                'home': h2h_col3_details.get('h2h_home_team_name'),
-                'away': h2h_col3_details.get('h2h_away_team_name'),
-                'score': f"{h2h_col3_details.get('goles_home')} : {h2h_col3_details.get('goles_away')}",
-                'ah': format_ah_as_decimal_string_of(h2h_col3_details.get('handicap_line_raw') or '-'),
-                'ou': h2h_col3_details.get('ou_result') or '-',
-                'stats_rows': df_to_rows(h2h_col3.get('stats'))
-            }
-
-        # Comparativas Indirectas (Left)
-        comp_left = (datos.get('comp_L_vs_UV_A') or {})
-        comp_left_details = comp_left.get('details') or {}
-        if comp_left_details:
-            payload['comparativas_indirectas']['left'] = {
-                'title_home_name': datos.get('home_name'),
-                'title_away_name': datos.get('away_name'),
-                'home_team': comp_left_details.get('home_team'),
-                'away_team': comp_left_details.get('away_team'),
-                'score': (comp_left_details.get('score') or '').replace(':', ' : '),
-                'ah': format_ah_as_decimal_string_of(comp_left_details.get('ah_line') or '-') if comp_left_details.get('ah_line') else '-',
-                'ou': comp_left_details.get('ou_line') or '-',
-                'localia': comp_left_details.get('localia') or '',
-                'stats_rows': df_to_rows(comp_left.get('stats'))
-            }
-
-        # Comparativas Indirectas (Right)
-        comp_right = (datos.get('comp_V_vs_UL_H') or {})
-        comp_right_details = comp_right.get('details') or {}
-        if comp_right_details:
-            payload['comparativas_indirectas']['right'] = {
-                'title_home_name': datos.get('home_name'),
-                'title_away_name': datos.get('away_name'),
-                'home_team': comp_right_details.get('home_team'),
-                'away_team': comp_right_details.get('away_team'),
-                'score': (comp_right_details.get('score') or '').replace(':', ' : '),
-                'ah': format_ah_as_decimal_string_of(comp_right_details.get('ah_line') or '-') if comp_right_details.get('ah_line') else '-',
-                'ou': comp_right_details.get('ou_line') or '-',
-                'localia': comp_right_details.get('localia') or '',
-                'stats_rows': df_to_rows(comp_right.get('stats'))
-            }
-
-        return jsonify(payload)
+        resultado, estado_cache = _analizar_con_cache(match_id)
+        if resultado.error:
+            status, headers = _estado_http_error(resultado)
+            headers['X-Analysis-Cache'] = estado_cache
+            headers['Cache-Control'] = http_caching.CACHE_NONE
+            return jsonify({'error': resultado.error, 'error_kind': resultado.error_kind}), status, headers
+        formato = request.args.get('formato', 'compacto')
+        # Los parciales no se cachean en el navegador: la siguiente peticion puede traer el analisis completo
+        cache_control = http_caching.CACHE_NONE if resultado.partial else http_caching.CACHE_ANALYSIS
+        etag = _etag_analisis(resultado, formato)
+        if etag_matches(etag):
+            return not_modified(etag, cache_control, {'X-Analysis-Cache': estado_cache})
+        if formato == 'completo':
+            response = jsonify(resultado.to_dict())
+        else:
+            response = jsonify(_construir_payload_analisis(resultado.to_template_data()))
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = cache_control
+        response.headers['X-Analysis-Cache'] = estado_cache
+        return response
     except Exception as e:
         print(f"Error en la ruta /api/analisis/{match_id}: {e}")
         return jsonify({'error': 'Ocurriï¿½ï¿½ un error interno en el servidor.'}), 500
 
+@app.route('/api/analisis/batch', methods=['GET', 'POST'])
+def api_analisis_batch():
+    """
+    Analiza varios partidos en una sola petición (p. ej. toda una jornada).
+    Acepta JSON {"ids": [...]} por POST o ?ids=1,2,3 por GET.
+    Los análisis se reparten entre BATCH_MAX_WORKERS hilos y comparten las páginas
+    secundarias repetidas. La respuesta es NDJSON: una línea por partido en cuanto
+    termina y una línea final con el resumen de rendimiento del lote.
+    """
+    if request.method == 'POST':
+        body = request.get_json(silent=True)
+        ids = body.get('ids') if isinstance(body, dict) else None
+        # Una cadena se recorrería carácter a carácter: solo se acepta una lista de IDs
+        if not isinstance(ids, list) or any(isinstance(x, bool) or not isinstance(x, (str, int)) for x in ids):
+            return jsonify({'error': 'El cuerpo debe ser un objeto JSON {"ids": [...]} con una lista de IDs.'}), 400
+    else:
+        ids = [x for x in (request.args.get('ids') or '').split(',')]
+    # Normalizar, eliminar duplicados manteniendo el orden
+    ids = list(dict.fromkeys(str(x).strip() for x in ids if str(x).strip()))
+    invalid = [x for x in ids if not x.isdigit()]
+    if not ids or invalid:
+        return jsonify({'error': 'Lista de IDs vacía o no válida.', 'invalid': invalid}), 400
+    if len(ids) > BATCH_MAX_IDS:
+        return jsonify({'error': f'Máximo {BATCH_MAX_IDS} partidos por lote.'}), 400
+
+    refresh = request.args.get('refresh') == '1'
+
+    def analizar(match_id, shared):
+        start = time.perf_counter()
+        try:
+            with _interactiva():
+                resultado, estado_cache = obtener_resultado_cacheado(
+                    match_id, lambda: obtener_resultado_analisis(match_id, shared_fetches=shared), refresh=refresh)
+            if resultado.error:
+                line = {'match_id': match_id, 'status': 'error', 'error': resultado.error,
+                        'error_kind': resultado.error_kind, 'cache': estado_cache}
+            else:
+                line = {'match_id': match_id, 'status': 'ok', 'cache': estado_cache,
+                        'data': _construir_payload_analisis(resultado.to_template_data())}
+        except Exception as e:
+            print(f"Error en el lote para {match_id}: {e}")
+            line = {'match_id': match_id, 'status': 'error', 'error': 'Error interno durante el análisis.'}
+        line['elapsed_ms'] = round((time.perf_counter() - start) * 1000)
+        return line
+
+    def generar():
+        shared = SharedFetches()
+        start = time.perf_counter()
+        counts = {'ok': 0, 'error': 0}
+        busy_ms = 0
+        with ThreadPoolExecutor(max_workers=min(BATCH_MAX_WORKERS, len(ids))) as executor:
+            futures = [executor.submit(analizar, match_id, shared) for match_id in ids]
+            for future in as_completed(futures):
+                line = future.result()
+                counts[line['status']] += 1
+                busy_ms += line['elapsed_ms']
+                yield json.dumps(line, ensure_ascii=False) + '\n'
+        elapsed = time.perf_counter() - start
+        yield json.dumps({'summary': {
+            'total': len(ids),
+            'ok': counts['ok'],
+            'errors': counts['error'],
+            'elapsed_s': round(elapsed, 2),
+            'matches_per_minute': round(len(ids) / elapsed * 60, 1) if elapsed > 0 else None,
+            'sum_of_individual_s': round(busy_ms / 1000, 2),
+            'workers': min(BATCH_MAX_WORKERS, len(ids)),
+            'shared_fetches': shared.stats()
+        }}) + '\n'
+
+    return Response(stream_with_context(generar()), mimetype='application/x-ndjson')
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True) # debug=True es Ãºtil para desarrollar
 
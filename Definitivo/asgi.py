@@ -0,0 +1,94 @@
+# asgi.py - Modo de servicio ASGI (Starlette + uvicorn)
+"""
+Alternativa a 'gunicorn app:app -k gthread': los workers de uvicorn sirven la app
+como ASGI.
+  - /api/matches se atiende de forma nativa con async: las páginas salen del
+    índice en memoria (modules/match_index.py) y, cuando ha caducado, la descarga
+    de la portada se espera en el bucle persistente del worker
+    (modules/async_runtime.py) sin ocupar ningún hilo, así que muchas peticiones
+    en vuelo comparten el mismo Chromium y unos pocos hilos.
+  - El resto de rutas (análisis con Selenium, plantillas) siguen siendo las de
+    Flask (app.py), montadas con a2wsgi sobre un pool de ASGI_WSGI_THREADS hilos.
+
+Arranque (Dockerfile con SERVER_MODE=asgi):
+    gunicorn asgi:app -k uvicorn.workers.UvicornWorker -w 2 -b 0.0.0.0:$PORT
+
+Configuración por variables de entorno:
+    ASGI_WSGI_THREADS=N     (por defecto 8)
+"""
+import asyncio
+import json
+import os
+from contextlib import asynccontextmanager
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Mount, Route
+
+from app import app as flask_app, get_main_page_matches_async, upcoming_store
+from modules import http_caching
+from modules.match_index import parse_query
+from modules.async_runtime import await_on_runtime, get_browser_pool
+
+ASGI_WSGI_THREADS = int(os.environ.get("ASGI_WSGI_THREADS", "8"))
+
+_refresh_lock = asyncio.Lock()
+
+
+async def _indice_proximos():
+    """Como app.indice_proximos(), pero esperando la descarga sin bloquear el bucle de uvicorn."""
+    if upcoming_store.fresh():
+        return upcoming_store.current()
+    async with _refresh_lock:
+        if upcoming_store.fresh():
+            return upcoming_store.current()
+        try:
+            matches = await await_on_runtime(get_main_page_matches_async(limit=None))
+        except Exception:
+            if upcoming_store.current() is None:
+                raise
+            return upcoming_store.current()
+        return upcoming_store.publish(matches)
+
+
+async def api_matches(request):
+    """Misma respuesta que /api/matches de Flask, sin bloquear un hilo mientras se descarga la portada."""
+    headers = {"Cache-Control": http_caching.CACHE_NONE}
+    try:
+        query = dict({"limit": 5}, **parse_query(request.query_params))
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400, headers=headers)
+    try:
+        matches, next_cursor = (await _indice_proximos()).query(**query)
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500, headers=headers)
+    body = json.dumps({"matches": matches, "next_cursor": next_cursor},
+                      ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    etag = http_caching.make_etag(body)
+    headers = {"Cache-Control": http_caching.CACHE_MATCH_LIST, "Vary": "Accept-Encoding"}
+    inm = request.headers.get("if-none-match", "")
+    if inm.strip() == "*" or any(f'"{etag}{suffix}"' in inm for suffix in http_caching.ENCODING_SUFFIXES):
+        return Response(status_code=304, headers=dict(headers, ETag=f'"{etag}"'))
+    # Misma compresion y sufijo de ETag que el after_request de Flask (gzip; brotli queda para Flask)
+    if "gzip" in request.headers.get("accept-encoding", "") and len(body) >= http_caching.COMPRESS_MIN_BYTES:
+        body = http_caching._compress(body, "gzip")
+        headers["Content-Encoding"] = "gzip"
+        etag += "-gzip"
+    headers["ETag"] = f'"{etag}"'
+    return Response(body, media_type="application/json", headers=headers)
+
+
+@asynccontextmanager
+async def lifespan(_app):
+    yield
+    await await_on_runtime(get_browser_pool().close())
+
+
+app = Starlette(
+    routes=[
+        Route("/api/matches", api_matches),
+        Mount("/", app=WSGIMiddleware(flask_app, workers=ASGI_WSGI_THREADS)),
+    ],
+    lifespan=lifespan,
+)
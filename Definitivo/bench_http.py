@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Prueba de carga de la API: bytes en la red y tiempo de respuesta por modo de petición.
+
+Lanza N peticiones concurrentes contra una instancia en marcha de la app y compara:
+  - plain:       sin compresión (Accept-Encoding: identity)
+  - compressed:  con Accept-Encoding: gzip, br
+  - conditional: comprimido y con If-None-Match del ETag obtenido antes (-> 304)
+
+Uso:
+
+    python bench_http.py --base-url http://localhost:5000 [--path /api/matches?limit=20]
+                         [--path /api/analisis/2696131] [--concurrency 8] [--requests 40]
+"""
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+MODES = ("plain", "compressed", "conditional")
+
+
+def _headers(mode, etag):
+    if mode == "plain":
+        return {"Accept-Encoding": "identity"}
+    headers = {"Accept-Encoding": "gzip, br"}
+    if mode == "conditional" and etag:
+        headers["If-None-Match"] = etag
+    return headers
+
+
+def _peticion(url, headers):
+    start = time.perf_counter()
+    with requests.get(url, headers=headers, stream=True, timeout=120) as r:
+        # Bytes tal y como llegan por la red (sin descomprimir)
+        wire = len(r.raw.read(decode_content=False))
+        status = r.status_code
+    return time.perf_counter() - start, wire, status
+
+
+def run(url, mode, etag, concurrency, total_requests):
+    headers = _headers(mode, etag)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as clients:
+        results = list(clients.map(lambda _: _peticion(url, headers), range(total_requests)))
+    elapsed = time.perf_counter() - start
+    latencies = sorted(r[0] for r in results)
+    p95 = latencies[max(0, int(len(latencies) * 0.95) - 1)]
+    wire = statistics.mean(r[1] for r in results)
+    codes = sorted({r[2] for r in results})
+    print(f"{mode:>11} | {total_requests} peticiones, concurrencia {concurrency} | "
+          f"{elapsed:.2f}s | {total_requests / elapsed:.1f} req/s | "
+          f"p50 {statistics.median(latencies) * 1000:.0f}ms | p95 {p95 * 1000:.0f}ms | "
+          f"{wire / 1024:.1f} KB/resp | HTTP {codes}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--base-url", default="http://localhost:5000")
+    parser.add_argument("--path", action="append", help="Ruta a medir (se puede repetir)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=40)
+    args = parser.parse_args()
+
+    for path in args.path or ["/api/matches?limit=20"]:
+        url = args.base_url.rstrip("/") + path
+        # Petición previa: calienta las cachés del servidor y da el ETag para el modo condicional
+        first = requests.get(url, headers={"Accept-Encoding": "gzip, br"}, timeout=300)
+        etag = first.headers.get("ETag")
+        print(f"{path}: HTTP {first.status_code}, ETag {etag}, Content-Encoding {first.headers.get('Content-Encoding')}, "
+              f"Cache-Control {first.headers.get('Cache-Control')}")
+        for mode in MODES:
+            run(url, mode, etag, args.concurrency, args.requests)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Benchmark del parseo de la página H2H: modo 'thread' (original) frente a modo 'process'.
+
+Simula N peticiones concurrentes (un hilo por petición, como gunicorn gthread) que
+parsean el mismo HTML y extraen todas las secciones. Uso:
+
+    python bench_parse_pool.py [--html HTML_extraer/analisis.txt] [--concurrency 8] [--requests 40]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bs4 import BeautifulSoup
+from modules import parse_pool
+from modules.estudio_scraper import extraer_secciones_h2h, extraer_secciones_h2h_desde_html
+
+
+def _peticion_thread(html):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        extraer_secciones_h2h(BeautifulSoup(html, "lxml"), executor)
+    return time.perf_counter() - start
+
+
+def _peticion_process(html):
+    start = time.perf_counter()
+    parse_pool.run_in_process_pool(extraer_secciones_h2h_desde_html, html)
+    return time.perf_counter() - start
+
+
+def run(mode, html, concurrency, total_requests):
+    fn = _peticion_process if mode == "process" else _peticion_thread
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as clients:
+        latencies = list(clients.map(fn, [html] * total_requests))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    p95 = latencies[max(0, int(len(latencies) * 0.95) - 1)]
+    print(f"{mode:>8} | {total_requests} peticiones, concurrencia {concurrency} | "
+          f"{elapsed:.2f}s | {total_requests / elapsed:.1f} req/s | "
+          f"p50 {statistics.median(latencies) * 1000:.0f}ms | p95 {p95 * 1000:.0f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--html", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "HTML_extraer", "analisis.txt"))
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--workers", type=int, default=None, help="Procesos del pool (por defecto PARSE_PROCESS_WORKERS)")
+    args = parser.parse_args()
+
+    with open(args.html, encoding="utf-8") as f:
+        html = f.read()
+    print(f"HTML: {args.html} ({len(html) / 1024:.0f} KB), CPUs: {os.cpu_count()}")
+
+    # Calentar el pool para no medir el arranque de los procesos
+    parse_pool.get_process_pool(args.workers)
+    parse_pool.run_in_process_pool(extraer_secciones_h2h_desde_html, html)
+
+    try:
+        run("thread", html, args.concurrency, args.requests)
+        run("process", html, args.concurrency, args.requests)
+    finally:
+        parse_pool.shutdown_process_pool()
+
+
+if __name__ == "__main__":
+    main()
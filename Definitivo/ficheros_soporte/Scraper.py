@@ -14,18 +14,22 @@ from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait, Select
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException
+from selenium.common.exceptions import TimeoutException, WebDriverException
 import gspread
-import math
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import threading
 import random
 import os
+import argparse
+import multiprocessing
 import psutil
+from checkpoint import ExtractionCheckpoint, RETRY_STATUSES
+from work_queue import LeaseQueue, LeaseHeartbeat, default_owner
+from sinks import make_sink
+from sheets_uploader import SheetsUploader
+from autoscaler import WorkerAutoscaler
 
 # --- 2. CONFIGURACIÓN GLOBAL ---
-print("--- [Paso 1/7] Configurando el script... ---")
-
 # -- Credenciales y Google Sheets --
 NOMBRE_SHEET = "Datos" # Nombre de tu Google Sheet
 NOMBRE_HOJA_NEG_CERO = "Visitantes" # Hoja para partidos con AH del visitante o 0
@@ -42,7 +46,34 @@ MAX_WORKERS = 4
 SELENIUM_TIMEOUT = 15
 BATCH_SIZE = 150
 API_PAUSE = 0.3
+UPLOAD_FLUSH_INTERVAL = 10 # Segundos máximos que una fila espera en el buffer antes de subirse
+UPLOAD_MAX_RETRIES = 6 # Reintentos con backoff exponencial + jitter ante errores de cuota/5xx
 WORKER_START_DELAY = random.uniform(0.3, 0.8)
+DRIVER_MAX_MATCHES = 200 # Reciclar cada driver tras N partidos para contener fugas de memoria de Chrome
+
+# -- Autoescalado (MAX_WORKERS es el punto de partida) --
+AUTOSCALE = True
+MIN_WORKERS = 1
+MAX_WORKERS_CAP = 8
+MEMORY_LIMIT_MB = None # None = 80% de la RAM total; cuenta Python + chromedriver + Chromium
+TARGET_MATCHES_PER_MIN = None # No subir más workers una vez alcanzado este throughput
+MAX_ERROR_RATE = 0.25 # Tasa de load_error/parse_error que provoca bajar workers
+AUTOSCALE_INTERVAL = 20 # Segundos entre decisiones
+
+# -- Checkpoint y Reintentos --
+CHECKPOINT_FILE = "scraper_checkpoint.sqlite3" # Progreso local para reanudar ejecuciones interrumpidas
+MAX_ATTEMPTS = 3 # Intentos máximos por ID (load_error/parse_error)
+RETRY_ROUNDS = 2 # Rondas de reintento al final de cada rango
+
+# -- Cola de Trabajo Distribuida (modo --worker) --
+QUEUE_FILE = "scraper_queue.sqlite3" # Cola de leases compartida entre procesos/máquinas
+LEASE_SIZE = 250 # IDs por lease
+LEASE_TTL = 300 # Segundos sin heartbeat tras los que un lease se considera abandonado
+
+# -- Salida Local en Streaming (opcional, además de / en lugar de Google Sheets) --
+OUTPUT_SINK = None # None, 'csv' o 'parquet' (requiere pyarrow)
+OUTPUT_PATH = "extraccion_output" # Fichero .csv o directorio de ficheros parquet
+SINK_FLUSH_EVERY = 200 # Filas por vuelco / row group
 
 # -- Columnas Finales --
 COLS = ["AH_H2H_V", "AH_Act", "Res_H2H_V", "AH_L_H", "Res_L_H",
@@ -51,28 +82,30 @@ COLS = ["AH_H2H_V", "AH_Act", "Res_H2H_V", "AH_L_H", "Res_L_H",
         "Stats_L", "Stats_V",
         "Fin", "G_i", "match_id"]
 
-print("✅ Configuración cargada.\n")
-
 # --- 3. MANEJO DE CREDENCIALES ---
-print("--- [Paso 2/7] Gestionando credenciales de Google... ---")
 # El script buscará el archivo en la misma carpeta donde lo ejecutes.
 CREDENTIALS_FILENAME = "google_credentials.json"
-if not os.path.exists(CREDENTIALS_FILENAME):
-    print(f"❌ Error: Archivo de credenciales '{CREDENTIALS_FILENAME}' no encontrado.")
-    print("   Asegúrate de que el archivo .json esté en la misma carpeta que este script.")
-    exit() # Detiene la ejecución si no encuentra el archivo
-else:
-    print(f"✅ Archivo de credenciales encontrado.\n")
+
+def check_credentials():
+    print("--- [Paso 2/7] Gestionando credenciales de Google... ---")
+    if not os.path.exists(CREDENTIALS_FILENAME):
+        print(f"❌ Error: Archivo de credenciales '{CREDENTIALS_FILENAME}' no encontrado.")
+        print("   Asegúrate de que el archivo .json esté en la misma carpeta que este script.")
+        exit() # Detiene la ejecución si no encuentra el archivo
+    else:
+        print(f"✅ Archivo de credenciales encontrado.\n")
 
 
 # --- 4. CONEXIÓN A GOOGLE SHEETS ---
-print(f"--- [Paso 3/7] Conectando a Google Sheet '{NOMBRE_SHEET}'... ---")
-try:
-    gc = gspread.service_account(filename=CREDENTIALS_FILENAME)
-    sh = gc.open(NOMBRE_SHEET)
-    print(f"✅ Conexión exitosa.\n")
-except Exception as e:
-    print(f"❌ Error crítico conectando a Google Sheets: {e}"); exit()
+def connect_to_sheet():
+    print(f"--- [Paso 3/7] Conectando a Google Sheet '{NOMBRE_SHEET}'... ---")
+    try:
+        gc = gspread.service_account(filename=CREDENTIALS_FILENAME)
+        sh = gc.open(NOMBRE_SHEET)
+        print(f"✅ Conexión exitosa.\n")
+        return sh
+    except Exception as e:
+        print(f"❌ Error crítico conectando a Google Sheets: {e}"); exit()
 
 
 # --- 5. FUNCIONES HELPER Y DE LÓGICA AVANZADA ---
@@ -241,22 +274,143 @@ def format_col3_h2h_rivals(h2h_details, rival_local_name):
     return f"{score}/{ah} {localia_str}"
 
 # --- 6. WORKER PRINCIPAL DE EXTRACCIÓN ---
-def extract_match_worker(mid):
+BASE_URL = "https://live18.nowgoal25.com"
+
+# Drivers de larga duración reutilizables entre partidos: cada tarea toma uno libre del pool
+# (get_worker_driver) y run_task lo devuelve al terminar. Los hilos no se quedan ningún
+# driver, así que un ThreadPoolExecutor nuevo por rango, reintento o lease no deja Chrome abiertos.
+_thread_local = threading.local()
+_all_drivers = []
+_all_drivers_lock = threading.Lock()
+
+def _create_driver():
     # ¡CAMBIO IMPORTANTE! Esta sección ahora busca chromedriver.exe en la misma carpeta.
     service = ChromeService(executable_path="chromedriver.exe")
     driver = webdriver.Chrome(service=service, options=get_chrome_options())
-    
-    BASE_URL = "https://live18.nowgoal25.com"
+    with _all_drivers_lock:
+        _all_drivers.append(driver)
+    return driver
+
+def _quit_driver(driver):
+    with _all_drivers_lock:
+        if driver in _all_drivers:
+            _all_drivers.remove(driver)
+    try: driver.quit()
+    except Exception: pass
+
+class DriverPool:
+    """Drivers libres [(driver, usos)] y número de drivers prestados a tareas en curso."""
+
+    def __init__(self):
+        self._idle = []
+        self._in_use = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, max_uses):
+        """(driver, usos) libre, o uno nuevo; los que llegaron a max_uses se cierran (reciclado)."""
+        worn = []
+        with self._lock:
+            while self._idle:
+                driver, uses = self._idle.pop()
+                if uses < max_uses:
+                    self._in_use += 1
+                    break
+                worn.append(driver)
+            else:
+                driver = None
+                self._in_use += 1
+        for old in worn:
+            _quit_driver(old)
+        if driver is not None:
+            return driver, uses
+        try:
+            time.sleep(WORKER_START_DELAY) # Escalonar el arranque de los Chrome
+            return _create_driver(), 0
+        except BaseException:
+            with self._lock:
+                self._in_use -= 1
+            raise
+
+    def release(self, driver, uses, keep):
+        """Devuelve un driver prestado (None si se descartó); se cierra si ya hay `keep` drivers vivos."""
+        with self._lock:
+            self._in_use -= 1
+            if driver is None:
+                return
+            if len(self._idle) + self._in_use < keep:
+                self._idle.append((driver, uses))
+                return
+        _quit_driver(driver)
+
+    def live_count(self):
+        """Drivers abiertos: libres + prestados."""
+        with self._lock:
+            return len(self._idle) + self._in_use
+
+    def clear(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for driver, _ in idle:
+            _quit_driver(driver)
+
+_driver_pool = DriverPool()
+
+def get_worker_driver():
+    """Driver de la tarea en curso en este hilo, tomado del pool la primera vez que se pide."""
+    driver = getattr(_thread_local, 'driver', None)
+    if driver is None:
+        driver, uses = _driver_pool.acquire(getattr(_thread_local, 'max_uses', DRIVER_MAX_MATCHES))
+        _thread_local.driver, _thread_local.uses = driver, uses + 1
+    return driver
+
+def release_worker_driver(keep=MAX_WORKERS, discard=False):
+    """Devuelve al pool el driver de la tarea en curso (al terminar cada partido), o lo cierra si discard."""
+    driver = getattr(_thread_local, 'driver', None)
+    _thread_local.driver = None
+    if driver is None:
+        return
+    if discard:
+        _driver_pool.release(None, 0, keep)
+        _quit_driver(driver)
+    else:
+        _driver_pool.release(driver, _thread_local.uses, keep)
+
+def discard_worker_driver():
+    """Cierra el driver de la tarea en curso (p. ej. tras un error de sesión); la siguiente tarea abre otro."""
+    release_worker_driver(discard=True)
+
+def active_driver_count():
+    return _driver_pool.live_count()
+
+def quit_all_drivers():
+    _driver_pool.clear()
+    with _all_drivers_lock:
+        drivers = list(_all_drivers)
+        _all_drivers.clear()
+    for driver in drivers:
+        try: driver.quit()
+        except Exception: pass
+
+def extract_match_worker(mid):
     original_url = f"{BASE_URL}/match/h2h-{mid}"
     try:
-        driver.get(original_url)
-        WebDriverWait(driver, SELENIUM_TIMEOUT).until(EC.presence_of_element_located((By.ID, "table_v1")))
+        driver = get_worker_driver()
+    except WebDriverException as e:
+        return mid, 'load_error', (original_url, f"No se pudo iniciar Chrome: {type(e).__name__}: {str(e)}")
+    try:
+        try:
+            driver.get(original_url)
+            WebDriverWait(driver, SELENIUM_TIMEOUT).until(EC.presence_of_element_located((By.ID, "table_v1")))
+        except TimeoutException:
+            if "match not found" in driver.page_source.lower(): return mid, 'not_found', None
+            return mid, 'load_error', (original_url, "Timeout esperando table_v1")
         for select_id in ["hSelect_1", "hSelect_2", "hSelect_3"]:
             try: Select(WebDriverWait(driver, 3).until(EC.element_to_be_clickable((By.ID, select_id)))).select_by_value("8")
             except TimeoutException: continue
         time.sleep(0.5)
-        soup_main = BeautifulSoup(driver.page_source, 'lxml')
-        if "match not found" in driver.page_source.lower(): return mid, 'not_found', None
+        page_source = driver.page_source
+        if "match not found" in page_source.lower(): return mid, 'not_found', None
+        soup_main = BeautifulSoup(page_source, 'lxml')
 
         home_id, away_id, league_id, home_name, away_name, _ = get_team_league_info_from_script(soup_main)
         if not all([home_id, away_id, league_id, home_name, away_name]): return mid, 'parse_error', (original_url, "Missing base IDs or names")
@@ -293,12 +447,10 @@ def extract_match_worker(mid):
         key_id_a, rival_a_id, rival_a_name = get_key_and_rival_ids(soup_main, "table_v1")
         _, rival_b_id, _ = get_key_and_rival_ids(soup_main, "table_v2")
 
+        # El driver se queda en la página Col3: el resto de datos salen de soup_main, no hace falta volver
         details_h2h_col3 = get_col3_h2h_details_from_new_page(driver, BASE_URL, key_id_a, rival_a_id, rival_b_id)
         regla3 = format_col3_h2h_rivals(details_h2h_col3, rival_a_name)
         
-        driver.get(original_url)
-        WebDriverWait(driver, SELENIUM_TIMEOUT).until(EC.presence_of_element_located((By.ID, "table_v1")))
-        
         localStatsStr = extract_team_stats_from_summary(soup_main, 'table.team-table-home', True)
         visitorStatsStr = extract_team_stats_from_summary(soup_main, 'table.team-table-guest', False)
         
@@ -315,111 +467,314 @@ def extract_match_worker(mid):
 
         return mid, 'ok', (formatted_row, ah_curr_num)
 
+    except WebDriverException as e:
+        # Sesión de Chrome rota: se descarta el driver y el ID va a la cola de reintentos
+        discard_worker_driver()
+        return mid, 'load_error', (original_url, f"{type(e).__name__}: {str(e)}")
     except Exception as e:
         return mid, 'parse_error', (original_url, f"{type(e).__name__}: {str(e)}")
-    finally:
-        if driver: driver.quit()
 
 
 # --- 7. BUCLE PRINCIPAL Y RESUMEN ---
 def worker_task(mid):
-    time.sleep(WORKER_START_DELAY)
     return extract_match_worker(mid)
 
-def upload_data_to_sheet(worksheet_name, data_rows, columns_list, sheet_handle):
-    if not data_rows:
-        print(f"  ✅ No hay datos nuevos para subir a '{worksheet_name}'.")
-        return True
-    print(f"\n--- Subiendo {len(data_rows)} filas a la hoja '{worksheet_name}'... ---")
+def run_task(mid, autoscaler=None):
+    """Ejecuta worker_task con un driver del pool y lo devuelve al terminar."""
+    if autoscaler is not None:
+        _thread_local.max_uses = autoscaler.driver_max_matches
     try:
-        ws = sheet_handle.worksheet(worksheet_name)
-    except gspread.exceptions.WorksheetNotFound:
-        print(f"  Hoja '{worksheet_name}' no encontrada. Creando...")
-        ws = sheet_handle.add_worksheet(title=worksheet_name, rows=len(data_rows) + 100, cols=len(columns_list))
-    
-    header_in_sheet = ws.get('A1:Z1')
-    if not header_in_sheet or header_in_sheet[0] != columns_list:
-        print("  Escribiendo encabezado...")
-        ws.update('A1', [columns_list], value_input_option='USER_ENTERED')
-        time.sleep(API_PAUSE)
-
-    start_row = len(ws.get_all_values()) + 1
-    num_batches = math.ceil(len(data_rows) / BATCH_SIZE)
-    print(f"  Subiendo en {num_batches} lotes...")
-    for i in range(num_batches):
-        start_index = i * BATCH_SIZE
-        end_index = start_index + BATCH_SIZE
-        batch_data = data_rows[start_index:end_index]
-        target_range = f'A{start_row + start_index}'
-        print(f"    Lote {i+1}/{num_batches}: Subiendo {len(batch_data)} filas...", end="")
-        try:
-            ws.update(target_range, batch_data, value_input_option='USER_ENTERED')
-            print(" OK.")
-            time.sleep(API_PAUSE)
-        except gspread.exceptions.APIError as e:
-            print(f" ❌ ERROR API. Esperando 60s. Mensaje: {e}")
-            time.sleep(60)
-            try:
-                ws.update(target_range, batch_data, value_input_option='USER_ENTERED')
-                print(" Reintento OK.")
-            except Exception as re_e:
-                print(f" Reintento fallido: {re_e}"); return False
-    print(f"  ✅ Subida a '{worksheet_name}' completada.")
-    return True
-
-print("--- [Paso 4/7] Iniciando proceso de extracción... ---")
-global_start_time = time.time()
-main_process = psutil.Process(os.getpid())
-print(f"    (RAM inicial: {main_process.memory_info().rss / 1024**2:.2f} MB)")
-
-counts = {'ok': 0, 'skipped': 0, 'not_found': 0, 'load_error': 0, 'parse_error': 0}
-failed_mids = {'not_found': [], 'load': [], 'parse': []}
-
-for range_info in EXTRACTION_RANGES:
-    range_start_time = time.time()
-    start_id, end_id, label = range_info['start_id'], range_info['end_id'], range_info['label']
-    print(f"\n{'='*60}\n--- Procesando Rango: '{label}' (IDs: {start_id} a {end_id}) ---\n{'='*60}")
-    
-    ids_to_process = list(range(start_id, end_id - 1, -1))
-    rows_neg_zero, rows_pos = [], []
+        return worker_task(mid)
+    finally:
+        # Si se bajó el número de workers, el pool cierra los drivers que sobran sobre el límite
+        # (libres + prestados) en vez de guardarlos: así se libera RAM sin tocar a los demás
+        release_worker_driver(keep=autoscaler.limit if autoscaler is not None else MAX_WORKERS)
+
+def make_autoscaler(enabled=AUTOSCALE):
+    if not enabled:
+        return None
+    return WorkerAutoscaler(initial=MAX_WORKERS, min_workers=MIN_WORKERS, max_workers=MAX_WORKERS_CAP,
+                            memory_limit_mb=MEMORY_LIMIT_MB, max_error_rate=MAX_ERROR_RATE,
+                            target_per_min=TARGET_MATCHES_PER_MIN, interval=AUTOSCALE_INTERVAL,
+                            driver_max_matches=DRIVER_MAX_MATCHES)
+
+def sheet_for(ah_num):
+    return NOMBRE_HOJA_NEG_CERO if ah_num is not None and ah_num <= 0 else NOMBRE_HOJA_POSITIVOS
+
+def process_ids(ids, label, checkpoint, counts, main_process, sink=None, uploader=None, autoscaler=None, should_stop=None):
+    """Procesa una lista de IDs en paralelo registrando cada resultado en el checkpoint, el sink y Sheets.
+
+    Con autoscaler solo hay `autoscaler.limit` partidos en vuelo a la vez; el límite se revisa tras cada resultado.
+    Si should_stop() devuelve True (p. ej. lease perdido) no se lanzan más partidos y los que terminan
+    solo se anotan en el checkpoint, sin escribirlos en el sink ni en Sheets.
+    """
     processed_count = 0
-
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        futures = {executor.submit(worker_task, mid): mid for mid in ids_to_process}
-        for future in as_completed(futures):
-            processed_count += 1
-            mid_completed = futures[future]
-            try:
-                mid_res, status, result = future.result()
+    pool_size = autoscaler.max_workers if autoscaler is not None else MAX_WORKERS
+    pending_ids = iter(ids)
+    futures = {}
+    with ThreadPoolExecutor(max_workers=pool_size) as executor:
+        while True:
+            # Solo se rellena hasta el límite actual: si el autoscaler lo bajó, los partidos en vuelo
+            # van terminando sin reponerse hasta quedar por debajo (y sus drivers sobrantes se cierran)
+            stopped = should_stop is not None and should_stop()
+            limit = 0 if stopped else autoscaler.limit if autoscaler is not None else MAX_WORKERS
+            while len(futures) < limit:
+                mid = next(pending_ids, None)
+                if mid is None:
+                    break
+                futures[executor.submit(run_task, mid, autoscaler)] = mid
+            if not futures:
+                break
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                processed_count += 1
+                mid_completed = futures.pop(future)
+                try:
+                    mid_res, status, result = future.result()
+                except Exception as exc:
+                    status, result = 'load_error', (mid_completed, str(exc))
+                    print(f"\n  [ERROR FATAL] MID {mid_completed}: {exc}")
                 counts[status] += 1
                 if status == 'ok':
                     row_data, ah_num = result
-                    if ah_num is not None and ah_num <= 0: rows_neg_zero.append(row_data)
-                    else: rows_pos.append(row_data)
-                elif status in failed_mids:
-                    failed_mids[status].append(result if status != 'not_found' else mid_completed)
-                print(f"\r  Progreso '{label}': {processed_count}/{len(ids_to_process)} | OK: {counts['ok']} | Fallos: {counts['load_error'] + counts['parse_error']} | RAM: {main_process.memory_info().rss / 1024**2:.1f}MB", end="")
-            except Exception as exc:
-                counts['load_error'] += 1; failed_mids['load'].append((mid_completed, str(exc)))
-                print(f"\n  [ERROR FATAL] MID {mid_completed}: {exc}")
-    
-    print(f"\n\n--- Fin Extracción Rango '{label}' ({(time.time() - range_start_time):.2f}s) ---")
-    print(f"  Resultados: {len(rows_pos)} para '{NOMBRE_HOJA_POSITIVOS}', {len(rows_neg_zero)} para '{NOMBRE_HOJA_NEG_CERO}'.")
-
-    upload_data_to_sheet(NOMBRE_HOJA_NEG_CERO, rows_neg_zero, COLS, sh)
-    upload_data_to_sheet(NOMBRE_HOJA_POSITIVOS, rows_pos, COLS, sh)
-    
-print("\n" + "="*60)
-print("--- [Paso 5/7] Proceso de extracción y subida completado. ---")
-print("="*60 + "\n")
-
-print("--- [Paso 6/7] Resumen Final del Proceso ---")
-total_duration = time.time() - global_start_time
-print(f"⏱️ Tiempo Total de Ejecución: {total_duration / 60:.2f} minutos.")
-print(f"✅ Partidos Procesados con Éxito (OK): {counts['ok']}")
-print(f"🟡 Partidos Saltados (Sin AH inicial): {counts['skipped']}")
-print(f"🔴 Partidos No Encontrados (404): {counts['not_found']}")
-print(f"❌ Errores de Carga (Timeout/Driver): {counts['load_error']}")
-print(f"❌ Errores de Parseo (HTML inesperado): {counts['parse_error']}")
-print(f"🧠 RAM Final: {main_process.memory_info().rss / 1024**2:.2f} MB")
-print("\n🎉 ¡Proceso finalizado! Revisa tus hojas de Google Sheets para ver los datos.")
\ No newline at end of file
+                    checkpoint.record(mid_completed, status, row=row_data, ah_num=ah_num)
+                    if sink is not None and not stopped:
+                        sink.write(row_data)
+                    if uploader is not None and not stopped:
+                        uploader.submit(sheet_for(ah_num), mid_completed, row_data)
+                else:
+                    checkpoint.record(mid_completed, status, error=result[1] if result else None)
+                workers_info = ""
+                if autoscaler is not None:
+                    # Drivers realmente abiertos (libres + en uso), no hilos del executor
+                    autoscaler.record(status, active_driver_count())
+                    workers_info = f" | Workers: {autoscaler.limit}"
+                print(f"\r  Progreso '{label}': {processed_count}/{len(ids)} | OK: {counts['ok']} | Fallos: {counts['load_error'] + counts['parse_error']}{workers_info} | RAM: {main_process.memory_info().rss / 1024**2:.1f}MB", end="")
+
+def upload_pending_rows(checkpoint, all_ids, uploader):
+    """Sube las filas OK del rango que aún no constan como subidas (p. ej. de ejecuciones interrumpidas)."""
+    uploader.flush()  # Primero lo que ya está en cola, para no duplicar filas
+    pending = checkpoint.rows_to_upload(all_ids)
+    if pending:
+        print(f"\n  Subiendo {len(pending)} filas pendientes de ejecuciones anteriores...")
+        for mid, row, ah_num in pending:
+            uploader.submit(sheet_for(ah_num), mid, row)
+        uploader.flush()
+    stats = uploader.stats
+    print(f"\n  Sheets: {stats['rows_uploaded']} filas subidas en {stats['batches']} lotes | reintentos: {stats['retries']} | fallidas: {stats['rows_failed']}")
+
+def write_pending_rows(checkpoint, all_ids, sink):
+    """Vuelca al sink las filas OK del rango que no llegaron a escribirse (p. ej. en el buffer de un proceso muerto)."""
+    sink.flush()  # Primero el buffer actual, que marca sus filas como escritas
+    pending = checkpoint.rows_to_write(all_ids)
+    if pending:
+        print(f"\n  Escribiendo {len(pending)} filas pendientes de ejecuciones anteriores en '{sink.path}'...")
+        for _, row in pending:
+            sink.write(row)
+        sink.flush()
+
+def run_ids(all_ids, label, checkpoint, counts, main_process, uploader=None, sink=None, autoscaler=None, should_stop=None):
+    """Procesa un rango de IDs (con reanudación y reintentos) y sube sus filas pendientes.
+
+    Si should_stop() pasa a True se corta en cuanto terminan los partidos en vuelo y no se suben
+    las filas pendientes: el rango lo completará quien lo haya reclamado.
+    """
+    stop = should_stop or (lambda: False)
+    ids_to_process = checkpoint.pending_ids(all_ids, MAX_ATTEMPTS)
+    if len(ids_to_process) < len(all_ids):
+        print(f"  Reanudando: {len(all_ids) - len(ids_to_process)} IDs ya procesados según el checkpoint.")
+    process_ids(ids_to_process, label, checkpoint, counts, main_process, sink, uploader, autoscaler, stop)
+    if stop():
+        return
+
+    # Cola de reintentos: solo IDs con load_error/parse_error y con intentos disponibles
+    for retry_round in range(1, RETRY_ROUNDS + 1):
+        retry_ids = checkpoint.retry_ids(all_ids, MAX_ATTEMPTS)
+        if not retry_ids:
+            break
+        print(f"\n  Reintento {retry_round}/{RETRY_ROUNDS}: {len(retry_ids)} IDs con errores de carga/parseo...")
+        process_ids(retry_ids, f"{label} (reintento {retry_round})", checkpoint, counts, main_process, sink, uploader, autoscaler, stop)
+        if stop():
+            return
+
+    if sink is not None:
+        write_pending_rows(checkpoint, all_ids, sink)
+    if uploader is not None:
+        upload_pending_rows(checkpoint, all_ids, uploader)
+
+def open_outputs(checkpoint, sink_kind=OUTPUT_SINK, output_path=OUTPUT_PATH, use_sheets=True, per_process=False):
+    """Devuelve (uploader de Google Sheets o None, sink local o None) según las salidas pedidas."""
+    uploader = None
+    if use_sheets:
+        check_credentials()
+        uploader = SheetsUploader(connect_to_sheet(), COLS, batch_size=BATCH_SIZE, flush_interval=UPLOAD_FLUSH_INTERVAL,
+                                  api_pause=API_PAUSE, max_retries=UPLOAD_MAX_RETRIES, on_uploaded=checkpoint.mark_uploaded)
+    if sink_kind == 'csv':
+        root, ext = os.path.splitext(output_path)
+        # Con varios procesos cada uno escribe su propio CSV para no intercalar líneas
+        output_path = f"{root}-{os.getpid()}{ext or '.csv'}" if per_process else root + (ext or '.csv')
+    sink = make_sink(sink_kind, output_path, COLS, SINK_FLUSH_EVERY, on_written=checkpoint.mark_written)
+    if sink is not None:
+        print(f"✅ Salida local '{sink_kind}': {getattr(sink, 'path', output_path)}")
+    return uploader, sink
+
+def main(sink_kind=OUTPUT_SINK, output_path=OUTPUT_PATH, use_sheets=True, autoscale=AUTOSCALE):
+    print("--- [Paso 1/7] Configurando el script... ---")
+    print("✅ Configuración cargada.\n")
+    checkpoint = ExtractionCheckpoint(CHECKPOINT_FILE)
+    uploader, sink = open_outputs(checkpoint, sink_kind, output_path, use_sheets)
+
+    print("--- [Paso 4/7] Iniciando proceso de extracción... ---")
+    global_start_time = time.time()
+    main_process = psutil.Process(os.getpid())
+    print(f"    (RAM inicial: {main_process.memory_info().rss / 1024**2:.2f} MB)")
+    print(f"    (Checkpoint: {CHECKPOINT_FILE})")
+    autoscaler = make_autoscaler(autoscale)
+    if autoscaler is not None:
+        print(f"    (Autoescalado: {autoscaler.limit} workers iniciales, {MIN_WORKERS}-{MAX_WORKERS_CAP}, límite de memoria {autoscaler.memory_limit_mb:.0f}MB)")
+    counts = {'ok': 0, 'skipped': 0, 'not_found': 0, 'load_error': 0, 'parse_error': 0}
+    failed_mids = {'not_found': [], 'load_error': [], 'parse_error': []}
+
+    try:
+        for range_info in EXTRACTION_RANGES:
+            range_start_time = time.time()
+            start_id, end_id, label = range_info['start_id'], range_info['end_id'], range_info['label']
+            print(f"\n{'='*60}\n--- Procesando Rango: '{label}' (IDs: {start_id} a {end_id}) ---\n{'='*60}")
+
+            all_ids = list(range(start_id, end_id - 1, -1))
+            run_ids(all_ids, label, checkpoint, counts, main_process, uploader, sink, autoscaler)
+            print(f"\n--- Fin Rango '{label}' ({(time.time() - range_start_time):.2f}s) ---")
+            for status, items in checkpoint.failures(all_ids).items():
+                failed_mids.setdefault(status, []).extend(items)
+    finally:
+        quit_all_drivers()
+        if uploader is not None:
+            uploader.close()
+        checkpoint.close()
+        if sink is not None:
+            sink.close()
+
+    print("\n" + "="*60)
+    print("--- [Paso 5/7] Proceso de extracción y subida completado. ---")
+    print("="*60 + "\n")
+
+    print("--- [Paso 6/7] Resumen Final del Proceso ---")
+    total_duration = time.time() - global_start_time
+    print(f"⏱️ Tiempo Total de Ejecución: {total_duration / 60:.2f} minutos.")
+    print(f"✅ Partidos Procesados con Éxito (OK): {counts['ok']}")
+    print(f"🟡 Partidos Saltados (Sin AH inicial): {counts['skipped']}")
+    print(f"🔴 Partidos No Encontrados (404): {len(failed_mids['not_found'])}")
+    print(f"❌ Errores de Carga (Timeout/Driver): {len(failed_mids['load_error'])} (intentos fallidos: {counts['load_error']})")
+    print(f"❌ Errores de Parseo (HTML inesperado): {len(failed_mids['parse_error'])} (intentos fallidos: {counts['parse_error']})")
+    pending_errors = sum(len(failed_mids[st]) for st in RETRY_STATUSES)
+    if pending_errors:
+        print(f"🔁 IDs con errores tras los reintentos: {pending_errors} (se reintentarán en la próxima ejecución hasta {MAX_ATTEMPTS} intentos)")
+    if sink is not None:
+        print(f"💾 Filas escritas en '{sink.path}': {sink.rows_written}")
+    if autoscaler is not None:
+        print(f"⚖️ Autoescalado: {len(autoscaler.decisions)} ajustes, {autoscaler.limit} workers al final")
+    print(f"🧠 RAM Final: {main_process.memory_info().rss / 1024**2:.2f} MB")
+    print("\n🎉 ¡Proceso finalizado! Revisa tus hojas de Google Sheets para ver los datos.")
+
+
+# --- 8. MODO DISTRIBUIDO (COLA DE LEASES) ---
+def init_queue(queue_file=QUEUE_FILE, lease_size=LEASE_SIZE):
+    """Coordinador: divide EXTRACTION_RANGES en leases dentro de la cola."""
+    queue = LeaseQueue(queue_file)
+    created = queue.enqueue_ranges(EXTRACTION_RANGES, lease_size)
+    print(f"✅ Cola '{queue_file}': {created} leases nuevos ({lease_size} IDs por lease).")
+    print_queue_status(queue)
+    queue.close()
+
+def print_queue_status(queue):
+    summary = queue.summary()
+    leases, c = summary['leases'], summary['counts']
+    print(f"  Leases: {leases.get('done', 0)} completados | {leases.get('claimed', 0)} en curso | {leases.get('pending', 0)} pendientes")
+    print(f"  Partidos: OK {c['ok']} | No encontrados {c['not_found']} | Err. carga {c['load_error']} | Err. parseo {c['parse_error']}")
+    for owner, n in sorted(summary['done_by_owner'].items()):
+        print(f"    {owner}: {n} leases")
+
+def queue_worker(queue_file=QUEUE_FILE, sink_kind=OUTPUT_SINK, output_path=OUTPUT_PATH, use_sheets=True, autoscale=AUTOSCALE):
+    """Trabajador: reclama leases de la cola hasta vaciarla, procesándolos con MAX_WORKERS hilos."""
+    owner = default_owner()
+    queue = LeaseQueue(queue_file)
+    checkpoint = ExtractionCheckpoint(CHECKPOINT_FILE)
+    uploader, sink = open_outputs(checkpoint, sink_kind, output_path, use_sheets, per_process=True)
+    autoscaler = make_autoscaler(autoscale)
+    main_process = psutil.Process(os.getpid())
+    counts = {'ok': 0, 'skipped': 0, 'not_found': 0, 'load_error': 0, 'parse_error': 0}
+    print(f"--- Trabajador {owner} conectado a la cola '{queue_file}' ---")
+    try:
+        while (lease := queue.claim(owner, LEASE_TTL)):
+            label = f"{lease['label']} #{lease['lease_id']}"
+            all_ids = list(range(lease['start_id'], lease['end_id'] - 1, -1))
+            print(f"\n--- [{owner}] Lease {label}: IDs {lease['start_id']} a {lease['end_id']} ---")
+            try:
+                with LeaseHeartbeat(queue, lease['lease_id'], owner, LEASE_TTL / 3) as hb:
+                    # Si el lease se pierde, se deja de procesar y de subir filas: el nuevo dueño las subirá
+                    run_ids(all_ids, label, checkpoint, counts, main_process, uploader, sink, autoscaler,
+                            should_stop=lambda: hb.lost)
+            except BaseException:
+                queue.release(lease['lease_id'], owner)
+                raise
+            if hb.lost:
+                print(f"\n  ⚠️ Lease {label} perdido (heartbeat caducado); lo completará otro trabajador.")
+                continue
+            queue.complete(lease['lease_id'], owner, checkpoint.status_counts(all_ids))
+        print(f"\n--- [{owner}] No quedan leases pendientes. ---")
+        print_queue_status(queue)
+    finally:
+        quit_all_drivers()
+        if uploader is not None:
+            uploader.close()
+        checkpoint.close()
+        queue.close()
+        if sink is not None:
+            sink.close()
+
+def run_local_workers(processes, queue_file=QUEUE_FILE, sink_kind=OUTPUT_SINK, output_path=OUTPUT_PATH, use_sheets=True, autoscale=AUTOSCALE):
+    """Lanza varios procesos trabajadores en esta máquina sobre la misma cola."""
+    procs = [multiprocessing.Process(target=queue_worker, args=(queue_file, sink_kind, output_path, use_sheets, autoscale), name=f"worker-{i}")
+             for i in range(processes)]
+    for p in procs:
+        p.start()
+        time.sleep(WORKER_START_DELAY)
+    for p in procs:
+        p.join()
+    queue = LeaseQueue(queue_file)
+    print("\n--- Resumen de la cola ---")
+    print_queue_status(queue)
+    queue.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extractor de rangos de partidos de Nowgoal.")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--init-queue", action="store_true", help="Dividir EXTRACTION_RANGES en leases en la cola")
+    mode.add_argument("--worker", action="store_true", help="Procesar leases de la cola hasta vaciarla")
+    mode.add_argument("--status", action="store_true", help="Mostrar el estado agregado de la cola")
+    parser.add_argument("--queue", default=QUEUE_FILE, help=f"Fichero de la cola (por defecto {QUEUE_FILE})")
+    parser.add_argument("--lease-size", type=int, default=LEASE_SIZE, help="IDs por lease al inicializar la cola")
+    parser.add_argument("--processes", type=int, default=1, help="Procesos trabajadores locales en modo --worker")
+    parser.add_argument("--sink", choices=("csv", "parquet"), default=OUTPUT_SINK, help="Escribir las filas en streaming a CSV o Parquet")
+    parser.add_argument("--output", default=OUTPUT_PATH, help="Fichero CSV o directorio Parquet de salida")
+    parser.add_argument("--no-sheets", action="store_true", help="No subir a Google Sheets (solo salida local)")
+    parser.add_argument("--no-autoscale", action="store_true", help="Usar siempre MAX_WORKERS hilos")
+    args = parser.parse_args()
+    if args.no_sheets and not args.sink:
+        parser.error("--no-sheets requiere --sink csv|parquet")
+    outputs = (args.sink, args.output, not args.no_sheets, not args.no_autoscale)
+
+    if args.init_queue:
+        init_queue(args.queue, args.lease_size)
+    elif args.status:
+        queue = LeaseQueue(args.queue)
+        print_queue_status(queue)
+        queue.close()
+    elif args.worker:
+        if args.processes > 1:
+            run_local_workers(args.processes, args.queue, *outputs)
+        else:
+            queue_worker(args.queue, *outputs)
+    else:
+        main(*outputs)
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+# ==============================================================================
+#  AUTOESCALADO DE WORKERS SEGÚN MEMORIA, THROUGHPUT Y TASA DE ERRORES
+# ==============================================================================
+#  Cada worker de Scraper.py mantiene un Chrome abierto, así que la RAM real es
+#  la del árbol de procesos completo (Python + chromedriver + Chromium). Cada
+#  `interval` segundos el autoscaler decide:
+#  - Bajar un worker si el árbol supera el umbral alto de memoria o la memoria
+#    libre del sistema es baja (y reciclar antes los drivers, por las fugas).
+#  - Bajar un worker si la tasa de errores de carga/parseo se dispara (la web
+#    nos está limitando o la máquina no da abasto).
+#  - Deshacer la última subida si no mejoró el throughput.
+#  - Subir un worker si cabe otro Chrome bajo el umbral bajo de memoria y aún no
+#    se alcanza el throughput objetivo.
+#  Todas las decisiones se imprimen con su motivo y quedan en `decisions`.
+# ==============================================================================
+import collections
+import os
+import time
+
+import psutil
+
+ERROR_STATUSES = ('load_error', 'parse_error')
+
+
+def process_tree_rss_mb(pid=None):
+    """RSS (MB) del proceso y todos sus descendientes (chromedriver, Chromium y sus renderers)."""
+    try:
+        root = psutil.Process(pid or os.getpid())
+        procs = [root] + root.children(recursive=True)
+    except psutil.NoSuchProcess:
+        return 0.0
+    total = 0
+    for p in procs:
+        try:
+            total += p.memory_info().rss
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            pass
+    return total / 1024**2
+
+
+class WorkerAutoscaler:
+    def __init__(self, initial=4, min_workers=1, max_workers=8, memory_limit_mb=None,
+                 high_water=0.85, low_water=0.70, min_free_mb=512, max_error_rate=0.25,
+                 target_per_min=None, interval=20.0, window=50, driver_max_matches=200,
+                 min_driver_matches=25, min_worker_mb=250):
+        self.min_workers = min_workers
+        self.max_workers = max_workers
+        self.limit = max(min_workers, min(initial, max_workers))
+        # Por defecto el presupuesto es el 80% de la RAM total de la máquina
+        self.memory_limit_mb = memory_limit_mb or psutil.virtual_memory().total / 1024**2 * 0.8
+        self.high_water = high_water
+        self.low_water = low_water
+        self.min_free_mb = min_free_mb
+        self.max_error_rate = max_error_rate
+        self.target_per_min = target_per_min
+        self.interval = interval
+        self.driver_max_matches = driver_max_matches
+        self.min_driver_matches = min_driver_matches
+        self.min_worker_mb = min_worker_mb  # Estimación mínima de un Chrome hasta tener datos reales
+        self.decisions = []
+        self._recent = collections.deque(maxlen=window)
+        self._completed_in_period = 0
+        self._period_start = time.monotonic()
+        self._base_rss = process_tree_rss_mb()
+        self._last_throughput = None
+        self._last_action = None
+
+    def record(self, status, active_drivers=None):
+        """Registrar un partido terminado (llamar desde el hilo que recoge resultados)."""
+        self._recent.append(status in ERROR_STATUSES)
+        self._completed_in_period += 1
+        return self.maybe_adjust(active_drivers)
+
+    def error_rate(self):
+        return sum(self._recent) / len(self._recent) if self._recent else 0.0
+
+    def maybe_adjust(self, active_drivers=None):
+        now = time.monotonic()
+        elapsed = now - self._period_start
+        if elapsed < self.interval:
+            return self.limit
+        throughput = self._completed_in_period / elapsed * 60
+        rss = process_tree_rss_mb()
+        free_mb = psutil.virtual_memory().available / 1024**2
+        per_worker = max((rss - self._base_rss) / max(active_drivers or self.limit, 1), self.min_worker_mb)
+        err = self.error_rate()
+
+        if rss > self.memory_limit_mb * self.high_water or free_mb < self.min_free_mb:
+            self.driver_max_matches = max(self.min_driver_matches, self.driver_max_matches // 2)
+            self._change(-1, f"memoria alta (árbol {rss:.0f}MB / límite {self.memory_limit_mb:.0f}MB, libre {free_mb:.0f}MB); "
+                             f"reciclado de drivers cada {self.driver_max_matches} partidos", throughput)
+        elif len(self._recent) >= 10 and err > self.max_error_rate:
+            self._change(-1, f"tasa de errores {err:.0%} > {self.max_error_rate:.0%}", throughput)
+        elif self._last_action == +1 and self._last_throughput is not None and throughput <= self._last_throughput:
+            self._change(-1, f"la última subida no mejoró el throughput ({self._last_throughput:.1f} -> {throughput:.1f}/min)", throughput)
+        elif (self.target_per_min is None or throughput < self.target_per_min) \
+                and rss + per_worker < self.memory_limit_mb * self.low_water and self._last_action != -1:
+            self._change(+1, f"margen de memoria (árbol {rss:.0f}MB + ~{per_worker:.0f}MB/worker), "
+                             f"errores {err:.0%}, {throughput:.1f} partidos/min", throughput)
+        else:
+            # Tras una bajada se espera un periodo completo antes de volver a subir
+            self._last_action = None
+            self._last_throughput = throughput
+
+        self._completed_in_period = 0
+        self._period_start = now
+        return self.limit
+
+    def _change(self, delta, reason, throughput):
+        new_limit = max(self.min_workers, min(self.max_workers, self.limit + delta))
+        self._last_throughput = throughput
+        if new_limit == self.limit:
+            self._last_action = None
+            return
+        self._last_action = delta
+        action = "SUBIR" if delta > 0 else "BAJAR"
+        msg = f"{action} workers {self.limit} -> {new_limit}: {reason}"
+        self.decisions.append((time.time(), self.limit, new_limit, reason))
+        self.limit = new_limit
+        print(f"\n  [autoscaler] {msg}")
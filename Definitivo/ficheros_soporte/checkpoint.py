@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+# ==============================================================================
+#  CHECKPOINT LOCAL (SQLite) PARA EL EXTRACTOR DE RANGOS (Scraper.py)
+# ==============================================================================
+#  Guarda, por match_id, el estado del procesamiento, el número de intentos y la
+#  fila ya formateada. Permite relanzar el script y continuar exactamente donde
+#  se quedó, reintentar solo los IDs con errores y subir filas pendientes que no
+#  llegaron a Google Sheets (uploaded) o al sink local CSV/Parquet (written).
+# ==============================================================================
+import json
+import sqlite3
+import threading
+import time
+
+# Estados definitivos: no se vuelven a procesar
+FINAL_STATUSES = ('ok', 'not_found', 'skipped')
+# Estados que van a la cola de reintentos
+RETRY_STATUSES = ('load_error', 'parse_error')
+
+
+class ExtractionCheckpoint:
+    def __init__(self, path="scraper_checkpoint.sqlite3"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS processed (
+                match_id   INTEGER PRIMARY KEY,
+                status     TEXT NOT NULL,
+                attempts   INTEGER NOT NULL DEFAULT 0,
+                row_json   TEXT,
+                ah_num     REAL,
+                error      TEXT,
+                uploaded   INTEGER NOT NULL DEFAULT 0,
+                written    INTEGER NOT NULL DEFAULT 0,
+                updated_at REAL NOT NULL
+            )""")
+        columns = {r[1] for r in self._conn.execute("PRAGMA table_info(processed)")}
+        if "written" not in columns:
+            # Checkpoints anteriores: sus filas se dan por escritas (no se sabe en qué sink)
+            self._conn.execute("ALTER TABLE processed ADD COLUMN written INTEGER NOT NULL DEFAULT 1")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_processed_status ON processed(status)")
+
+    def record(self, mid, status, row=None, ah_num=None, error=None):
+        """Registra el resultado de un intento para mid (incrementa los intentos)."""
+        with self._lock:
+            self._conn.execute("""
+                INSERT INTO processed (match_id, status, attempts, row_json, ah_num, error, uploaded, written, updated_at)
+                VALUES (?, ?, 1, ?, ?, ?, 0, 0, ?)
+                ON CONFLICT(match_id) DO UPDATE SET
+                    status=excluded.status, attempts=processed.attempts + 1,
+                    row_json=excluded.row_json, ah_num=excluded.ah_num,
+                    error=excluded.error, uploaded=0, written=0, updated_at=excluded.updated_at
+            """, (int(mid), status, json.dumps(row, ensure_ascii=False) if row is not None else None,
+                  ah_num, error, time.time()))
+
+    def pending_ids(self, ids, max_attempts):
+        """Filtra ids dejando solo los no procesados o con error y con intentos disponibles."""
+        ids = [int(i) for i in ids]
+        if not ids:
+            return []
+        lo, hi = min(ids), max(ids)
+        with self._lock:
+            done = {mid: (status, attempts) for mid, status, attempts in self._conn.execute(
+                "SELECT match_id, status, attempts FROM processed WHERE match_id BETWEEN ? AND ?", (lo, hi))}
+        pending = []
+        for mid in ids:
+            state = done.get(mid)
+            if state is None or (state[0] not in FINAL_STATUSES and state[1] < max_attempts):
+                pending.append(mid)
+        return pending
+
+    def retry_ids(self, ids, max_attempts):
+        """IDs de ids que acabaron en load_error/parse_error y aún admiten reintento."""
+        ids = [int(i) for i in ids]
+        if not ids:
+            return []
+        placeholders = ",".join("?" * len(RETRY_STATUSES))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT match_id FROM processed WHERE match_id BETWEEN ? AND ? "
+                f"AND status IN ({placeholders}) AND attempts < ? ORDER BY match_id DESC",
+                (min(ids), max(ids), *RETRY_STATUSES, max_attempts)).fetchall()
+        return [r[0] for r in rows]
+
+    def rows_to_upload(self, ids):
+        """Filas OK del rango que aún no se han subido: [(match_id, row, ah_num), ...]."""
+        ids = [int(i) for i in ids]
+        if not ids:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT match_id, row_json, ah_num FROM processed WHERE match_id BETWEEN ? AND ? "
+                "AND status = 'ok' AND uploaded = 0 ORDER BY match_id DESC", (min(ids), max(ids))).fetchall()
+        return [(mid, json.loads(row_json), ah_num) for mid, row_json, ah_num in rows]
+
+    def mark_uploaded(self, mids):
+        mids = [int(m) for m in mids]
+        with self._lock:
+            self._conn.executemany("UPDATE processed SET uploaded = 1 WHERE match_id = ?", [(m,) for m in mids])
+
+    def rows_to_write(self, ids):
+        """Filas OK del rango que aún no se han volcado al sink local: [(match_id, row), ...]."""
+        ids = [int(i) for i in ids]
+        if not ids:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT match_id, row_json FROM processed WHERE match_id BETWEEN ? AND ? "
+                "AND status = 'ok' AND written = 0 ORDER BY match_id DESC", (min(ids), max(ids))).fetchall()
+        return [(mid, json.loads(row_json)) for mid, row_json in rows]
+
+    def mark_written(self, mids):
+        mids = [int(m) for m in mids]
+        with self._lock:
+            self._conn.executemany("UPDATE processed SET written = 1 WHERE match_id = ?", [(m,) for m in mids])
+
+    def failures(self, ids):
+        """Errores finales del rango agrupados por estado: {status: [(match_id, error), ...]}."""
+        ids = [int(i) for i in ids]
+        result = {}
+        if not ids:
+            return result
+        with self._lock:
+            for mid, status, error in self._conn.execute(
+                    "SELECT match_id, status, error FROM processed WHERE match_id BETWEEN ? AND ? "
+                    "AND status NOT IN ('ok', 'skipped')", (min(ids), max(ids))):
+                result.setdefault(status, []).append((mid, error))
+        return result
+
+    def status_counts(self, ids):
+        """Número de IDs del rango en cada estado final registrado."""
+        ids = [int(i) for i in ids]
+        if not ids:
+            return {}
+        with self._lock:
+            return dict(self._conn.execute(
+                "SELECT status, COUNT(*) FROM processed WHERE match_id BETWEEN ? AND ? GROUP BY status",
+                (min(ids), max(ids))).fetchall())
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+# ==============================================================================
+#  CLIENTE DE GOOGLE SHEETS EN MEMORIA (PRUEBAS LOCALES DE sheets_uploader.py)
+# ==============================================================================
+#  Imita la parte de gspread que usa SheetsUploader y permite inyectar errores de
+#  cuota (429) para comprobar el backoff sin tocar la API real.
+#
+#  Uso:  python fake_sheets.py   (ejecuta una comprobación rápida)
+# ==============================================================================
+import re
+import threading
+
+import gspread
+
+
+class _FakeResponse:
+    def __init__(self, code, message):
+        self.status_code = code
+        self.text = message
+        self._payload = {"error": {"code": code, "message": message, "status": "RESOURCE_EXHAUSTED"}}
+
+    def json(self):
+        return self._payload
+
+
+def quota_error():
+    return gspread.exceptions.APIError(_FakeResponse(429, "Quota exceeded for quota metric 'Write requests'"))
+
+
+class FakeWorksheet:
+    def __init__(self, title, rows=1000, cols=26, fail_every=0):
+        self.title = title
+        self.row_count = rows
+        self.col_count = cols
+        self.cells = {}  # fila (1-based) -> lista de valores
+        self.calls = {'get': 0, 'update': 0, 'append_rows': 0, 'col_values': 0, 'add_rows': 0, 'get_all_values': 0}
+        self.fail_every = fail_every  # Cada N escrituras (update/append_rows) lanza un 429
+        self._lock = threading.Lock()
+
+    def _maybe_fail(self):
+        if self.fail_every and (self.calls['update'] + self.calls['append_rows']) % self.fail_every == 0:
+            raise quota_error()
+
+    def get(self, range_name):
+        self.calls['get'] += 1
+        row = int(re.match(r"[A-Z]+(\d+)", range_name).group(1))
+        return [self.cells[row]] if row in self.cells else []
+
+    def update(self, values=None, range_name=None, value_input_option=None):
+        with self._lock:
+            self.calls['update'] += 1
+            self._maybe_fail()
+            start = int(re.match(r"[A-Z]+(\d+)", range_name).group(1))
+            if start + len(values) - 1 > self.row_count:
+                raise gspread.exceptions.APIError(_FakeResponse(400, f"Range ({self.title}!{range_name}) exceeds grid limits"))
+            for i, row in enumerate(values):
+                self.cells[start + i] = list(row)
+            return {"updatedRows": len(values)}
+
+    def append_rows(self, values, value_input_option=None, insert_data_option=None, table_range=None):
+        """values.append: las filas van tras la última ocupada, calculada en el 'servidor' en cada llamada."""
+        with self._lock:
+            self.calls['append_rows'] += 1
+            self._maybe_fail()
+            start = max(self.cells, default=0) + 1
+            if insert_data_option == 'INSERT_ROWS':
+                self.row_count = max(self.row_count, start + len(values) - 1)
+            elif start + len(values) - 1 > self.row_count:
+                raise gspread.exceptions.APIError(_FakeResponse(400, f"Range ({self.title}) exceeds grid limits"))
+            for i, row in enumerate(values):
+                self.cells[start + i] = list(row)
+            return {"updates": {"updatedRows": len(values)}}
+
+    def col_values(self, col):
+        self.calls['col_values'] += 1
+        last = max((r for r, vals in self.cells.items() if len(vals) >= col and vals[col - 1] != ''), default=0)
+        return [self.cells.get(r, [''] * col)[col - 1] if len(self.cells.get(r, [])) >= col else '' for r in range(1, last + 1)]
+
+    def add_rows(self, rows):
+        self.calls['add_rows'] += 1
+        self.row_count += rows
+
+    def get_all_values(self):
+        self.calls['get_all_values'] += 1
+        last = max(self.cells, default=0)
+        return [self.cells.get(r, []) for r in range(1, last + 1)]
+
+
+class FakeSpreadsheet:
+    def __init__(self, fail_every=0):
+        self.worksheets = {}
+        self.fail_every = fail_every
+
+    def worksheet(self, title):
+        if title not in self.worksheets:
+            raise gspread.exceptions.WorksheetNotFound(title)
+        return self.worksheets[title]
+
+    def add_worksheet(self, title, rows, cols):
+        ws = self.worksheets[title] = FakeWorksheet(title, rows, cols, self.fail_every)
+        return ws
+
+
+if __name__ == "__main__":
+    from sheets_uploader import SheetsUploader
+
+    cols = ["AH", "Res", "match_id"]
+    sh = FakeSpreadsheet(fail_every=4)
+    uploaded = []
+    uploader = SheetsUploader(sh, cols, batch_size=25, flush_interval=0.1, api_pause=0,
+                              on_uploaded=uploaded.extend, sleep=lambda s: None)
+    for mid in range(1000, 1500):
+        uploader.submit("Locales" if mid % 2 else "Visitantes", mid, ["'0,5", "1-0", str(mid)])
+    uploader.flush()
+    uploader.close()
+
+    for title, ws in sh.worksheets.items():
+        rows = ws.get_all_values()
+        assert rows[0] == cols, rows[0]
+        assert len(rows) == 251 and len({r[2] for r in rows[1:]}) == 250, len(rows)
+        print(f"{title}: {len(rows) - 1} filas, llamadas {ws.calls}")
+    assert sorted(uploaded) == list(range(1000, 1500))
+    print(f"OK ({uploader.stats})")
+
+    # Dos uploaders sobre la misma hoja (p. ej. --worker --processes 2): ninguna fila se pisa
+    sh = FakeSpreadsheet()
+    uploaders = [SheetsUploader(sh, cols, batch_size=7, flush_interval=0.05, api_pause=0, sleep=lambda s: None)
+                 for _ in range(2)]
+    for mid in range(2000, 2300):
+        uploaders[mid % 2].submit("Locales", mid, ["'0,5", "1-0", str(mid)])
+    for uploader in uploaders:
+        uploader.flush()
+        uploader.close()
+    rows = sh.worksheet("Locales").get_all_values()
+    assert len(rows) == 301 and {r[2] for r in rows[1:]} == {str(m) for m in range(2000, 2300)}, len(rows)
+    print("OK (2 uploaders, 300 filas sin pisarse)")
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+# ==============================================================================
+#  SUBIDA INCREMENTAL A GOOGLE SHEETS (HILO EN SEGUNDO PLANO)
+# ==============================================================================
+#  Las filas se encolan en cuanto se extraen y un único hilo las sube por lotes
+#  mientras los workers siguen trabajando:
+#  - Cada lote se añade con append_rows() (values.append con INSERT_ROWS): es la
+#    API la que coloca las filas tras la última ocupada e inserta las que falten,
+#    así que varios uploaders (--worker --processes N, varias máquinas) pueden
+#    escribir en la misma hoja sin pisarse. No se lleva ninguna fila localmente
+#    ni se descarga la hoja con get_all_values().
+#  - Errores de cuota (429) y 5xx se reintentan con backoff exponencial + jitter.
+#  - on_uploaded(match_ids) se llama tras cada lote subido (p. ej. para marcar
+#    las filas como subidas en el checkpoint).
+#
+#  Funciona con cualquier objeto con la interfaz de gspread.Spreadsheet
+#  (worksheet/add_worksheet) y Worksheet (get/update/append_rows); ver
+#  fake_sheets.py para un cliente local de pruebas.
+# ==============================================================================
+import queue
+import random
+import threading
+import time
+
+import gspread
+import requests
+
+RETRYABLE_CODES = (429, 500, 502, 503, 504)
+
+_FLUSH = object()
+_STOP = object()
+
+
+def is_retryable(exc):
+    """Cuota excedida, errores 5xx y fallos de red se reintentan; el resto no."""
+    if isinstance(exc, gspread.exceptions.APIError):
+        return exc.code in RETRYABLE_CODES
+    return isinstance(exc, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+
+
+def backoff_delay(attempt, base=1.0, cap=64.0):
+    """Backoff exponencial con 'full jitter': aleatorio en [0, min(cap, base * 2^attempt)]."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class SheetsUploader:
+    def __init__(self, sheet_handle, columns, batch_size=150, flush_interval=5.0, api_pause=0.3,
+                 max_retries=6, backoff_base=1.0, backoff_cap=64.0, on_uploaded=None, sleep=time.sleep):
+        self.sheet_handle = sheet_handle
+        self.columns = list(columns)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.api_pause = api_pause
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.on_uploaded = on_uploaded
+        self._sleep = sleep
+        self._worksheets = {}
+        self._buffers = {}
+        self._queue = queue.Queue()
+        self.stats = {'rows_uploaded': 0, 'batches': 0, 'retries': 0, 'rows_failed': 0}
+        self._thread = threading.Thread(target=self._run, name="sheets-uploader", daemon=True)
+        self._thread.start()
+
+    # --- API pública (llamada desde el hilo principal / workers) ---
+    def submit(self, worksheet_name, match_id, row):
+        self._queue.put((worksheet_name, match_id, row))
+
+    def flush(self):
+        """Bloquea hasta que todo lo encolado hasta ahora se haya intentado subir."""
+        done = threading.Event()
+        self._queue.put((_FLUSH, done))
+        done.wait()
+
+    def close(self):
+        self._queue.put((_STOP, None))
+        self._thread.join()
+
+    # --- Hilo de subida ---
+    def _run(self):
+        last_upload = time.monotonic()
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                item = None
+            if item is None or item[0] is _FLUSH or item[0] is _STOP:
+                self._upload_all()
+                last_upload = time.monotonic()
+                if item is not None:
+                    if item[0] is _STOP:
+                        return
+                    item[1].set()
+                continue
+            worksheet_name, match_id, row = item
+            buf = self._buffers.setdefault(worksheet_name, [])
+            buf.append((match_id, row))
+            if len(buf) >= self.batch_size:
+                self._upload(worksheet_name)
+            elif time.monotonic() - last_upload >= self.flush_interval:
+                self._upload_all()
+                last_upload = time.monotonic()
+
+    def _upload_all(self):
+        for worksheet_name in list(self._buffers):
+            self._upload(worksheet_name)
+
+    def _upload(self, worksheet_name):
+        items = self._buffers.pop(worksheet_name, [])
+        for i in range(0, len(items), self.batch_size):
+            batch = items[i:i + self.batch_size]
+            try:
+                self._write_batch(worksheet_name, [row for _, row in batch])
+            except Exception as e:
+                # Las filas siguen como no subidas en el checkpoint: se reintentarán en la próxima ejecución
+                self.stats['rows_failed'] += len(batch)
+                print(f"\n  ❌ Subida a '{worksheet_name}' fallida ({len(batch)} filas): {e}")
+                continue
+            self.stats['rows_uploaded'] += len(batch)
+            self.stats['batches'] += 1
+            if self.on_uploaded:
+                self.on_uploaded([mid for mid, _ in batch])
+
+    def _write_batch(self, worksheet_name, rows):
+        ws = self._with_retries(self._worksheet, worksheet_name)
+        self._with_retries(ws.append_rows, rows, value_input_option='USER_ENTERED',
+                           insert_data_option='INSERT_ROWS', table_range='A1')
+        self._sleep(self.api_pause)
+
+    def _worksheet(self, worksheet_name):
+        ws = self._worksheets.get(worksheet_name)
+        if ws is not None:
+            return ws
+        try:
+            ws = self.sheet_handle.worksheet(worksheet_name)
+        except gspread.exceptions.WorksheetNotFound:
+            print(f"  Hoja '{worksheet_name}' no encontrada. Creando...")
+            try:
+                ws = self.sheet_handle.add_worksheet(title=worksheet_name, rows=self.batch_size * 10, cols=len(self.columns))
+            except gspread.exceptions.APIError:
+                # Otro uploader sobre la misma hoja la acaba de crear
+                ws = self.sheet_handle.worksheet(worksheet_name)
+        header_in_sheet = ws.get('A1:Z1')
+        if not header_in_sheet or header_in_sheet[0] != self.columns:
+            ws.update(values=[self.columns], range_name='A1', value_input_option='USER_ENTERED')
+            self._sleep(self.api_pause)
+        self._worksheets[worksheet_name] = ws
+        return ws
+
+    def _with_retries(self, fn, *args, **kwargs):
+        attempt = 0
+        while True:
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                if not is_retryable(e) or attempt >= self.max_retries:
+                    raise
+                delay = backoff_delay(attempt, self.backoff_base, self.backoff_cap)
+                self.stats['retries'] += 1
+                print(f"\n  ⏳ API de Sheets: {e}. Reintento {attempt + 1}/{self.max_retries} en {delay:.1f}s")
+                self._sleep(delay)
+                attempt += 1
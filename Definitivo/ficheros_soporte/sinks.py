@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+# ==============================================================================
+#  SINKS DE SALIDA EN STREAMING PARA EL EXTRACTOR DE RANGOS (Scraper.py)
+# ==============================================================================
+#  Cada fila OK se escribe en el sink en cuanto se extrae, en lugar de esperar al
+#  final del rango. Los buffers se vuelcan cada `flush_every` partidos, así que la
+#  memoria se mantiene plana aunque el rango tenga cientos de miles de IDs.
+#  Tras cada vuelco se llama a on_written(match_ids): Scraper.py lo usa para
+#  marcar las filas como escritas en el checkpoint, de modo que las que estaban
+#  en el buffer al morir el proceso se vuelven a escribir al reanudar.
+#
+#  A diferencia de Google Sheets (strings con "'" y coma decimal), aquí las líneas
+#  AH/goles y el match_id se guardan como columnas numéricas.
+#
+#  - CsvSink: sin dependencias, añade al fichero si ya existe.
+#  - ParquetSink: requiere pyarrow (opcional). Cada vuelco es un row group y cada
+#    ejecución/proceso escribe su propio fichero "part-*.parquet" en el directorio
+#    de salida, que se puede leer como un único dataset.
+# ==============================================================================
+import csv
+import os
+import threading
+import time
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+# Columnas con líneas de hándicap/goles: se guardan como float (None si no hay línea)
+NUMERIC_COLS = ("AH_H2H_V", "AH_Act", "AH_L_H", "AH_V_A", "AH_H2H_G", "G_i")
+INT_COLS = ("match_id",)
+
+
+def parse_sheet_number(value):
+    """Convierte un valor formateado para Sheets ("'-0,25", "1.5", "-") a float o None."""
+    if value is None:
+        return None
+    s = str(value).strip().lstrip("'").replace(',', '.')
+    try:
+        return float(s)
+    except ValueError:
+        return None
+
+
+def typed_record(row, columns):
+    """Pasa una fila de Scraper.py (lista alineada con `columns`) a un dict con tipos reales."""
+    record = {}
+    for col, value in zip(columns, row):
+        if col in NUMERIC_COLS:
+            record[col] = parse_sheet_number(value)
+        elif col in INT_COLS:
+            num = parse_sheet_number(value)
+            record[col] = int(num) if num is not None else None
+        else:
+            record[col] = None if value is None else str(value)
+    return record
+
+
+class RowSink:
+    """Interfaz común: write() acumula filas tipadas y vuelca cada `flush_every` filas."""
+
+    def __init__(self, columns, flush_every=100, on_written=None):
+        self.columns = list(columns)
+        self.flush_every = max(1, int(flush_every))
+        self.on_written = on_written    # on_written([match_id, ...]) tras cada vuelco
+        self.rows_written = 0
+        self._buffer = []
+        self._lock = threading.Lock()
+
+    def write(self, row):
+        record = typed_record(row, self.columns)
+        with self._lock:
+            self._buffer.append(record)
+            if len(self._buffer) >= self.flush_every:
+                self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._buffer:
+            return
+        self._write_records(self._buffer)
+        self.rows_written += len(self._buffer)
+        records, self._buffer = self._buffer, []
+        if self.on_written is not None:
+            self.on_written([r["match_id"] for r in records if r.get("match_id") is not None])
+
+    def _write_records(self, records):
+        raise NotImplementedError
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+class CsvSink(RowSink):
+    def __init__(self, path, columns, flush_every=100, on_written=None):
+        super().__init__(columns, flush_every, on_written)
+        self.path = path
+        parent = os.path.dirname(path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        is_new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, 'a', newline='', encoding='utf-8')
+        self._writer = csv.DictWriter(self._file, fieldnames=self.columns)
+        if is_new:
+            self._writer.writeheader()
+            self._file.flush()
+
+    def _write_records(self, records):
+        self._writer.writerows(records)
+        self._file.flush()
+
+    def close(self):
+        super().close()
+        self._file.close()
+
+
+class ParquetSink(RowSink):
+    def __init__(self, directory, columns, flush_every=500, part_name=None, on_written=None):
+        if pa is None:
+            raise ImportError("ParquetSink requiere pyarrow (pip install pyarrow).")
+        super().__init__(columns, flush_every, on_written)
+        os.makedirs(directory, exist_ok=True)
+        part_name = part_name or f"part-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.parquet"
+        self.path = os.path.join(directory, part_name)
+        self.schema = pa.schema([
+            (col, pa.float64() if col in NUMERIC_COLS else pa.int64() if col in INT_COLS else pa.string())
+            for col in self.columns
+        ])
+        self._writer = None
+
+    def _write_records(self, records):
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self.path, self.schema, compression='zstd')
+        table = pa.Table.from_pylist(records, schema=self.schema)
+        self._writer.write_table(table)  # Un row group por vuelco
+
+    def close(self):
+        super().close()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+def make_sink(kind, path, columns, flush_every=None, on_written=None):
+    """Crea el sink indicado ('csv' o 'parquet'); None si no se pide ninguno."""
+    if not kind:
+        return None
+    if kind == 'csv':
+        return CsvSink(path, columns, flush_every or 100, on_written=on_written)
+    if kind == 'parquet':
+        return ParquetSink(path, columns, flush_every or 500, on_written=on_written)
+    raise ValueError(f"Sink desconocido: {kind!r} (usa 'csv' o 'parquet')")
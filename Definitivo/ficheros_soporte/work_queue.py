@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+# ==============================================================================
+#  COLA DE TRABAJO POR LEASES (SQLite) PARA EXTRACCIÓN DISTRIBUIDA DE RANGOS
+# ==============================================================================
+#  El coordinador divide EXTRACTION_RANGES en leases de LEASE_SIZE IDs. Cualquier
+#  número de procesos trabajadores (en esta máquina o en otras que compartan el
+#  fichero de la cola) reclama un lease, envía heartbeats mientras lo procesa y
+#  lo marca como completado con sus contadores. Un lease cuyo heartbeat caduca
+#  (trabajador caído) vuelve a estar disponible para otro trabajador.
+#
+#  Nota: con varias máquinas el fichero debe estar en un sistema de ficheros con
+#  bloqueos fiables (SQLite sobre NFS/SMB no lo garantiza en todos los casos).
+# ==============================================================================
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+COUNT_FIELDS = ('ok', 'skipped', 'not_found', 'load_error', 'parse_error')
+
+
+def default_owner():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def split_range(start_id, end_id, lease_size):
+    """Divide un rango descendente [start_id .. end_id] en tramos de como mucho lease_size IDs."""
+    leases = []
+    hi = start_id
+    while hi >= end_id:
+        lo = max(end_id, hi - lease_size + 1)
+        leases.append((hi, lo))
+        hi = lo - 1
+    return leases
+
+
+class LeaseQueue:
+    def __init__(self, path="scraper_queue.sqlite3"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS leases (
+                lease_id     INTEGER PRIMARY KEY AUTOINCREMENT,
+                label        TEXT NOT NULL,
+                start_id     INTEGER NOT NULL,
+                end_id       INTEGER NOT NULL,
+                status       TEXT NOT NULL DEFAULT 'pending',
+                owner        TEXT,
+                heartbeat_at REAL,
+                claims       INTEGER NOT NULL DEFAULT 0,
+                {", ".join(f"{f} INTEGER NOT NULL DEFAULT 0" for f in COUNT_FIELDS)},
+                completed_at REAL,
+                UNIQUE(start_id, end_id)
+            )""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_leases_status ON leases(status)")
+
+    def enqueue_ranges(self, ranges, lease_size):
+        """Crea los leases de cada rango. Es idempotente: los tramos ya existentes no se duplican."""
+        created = 0
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for r in ranges:
+                    for hi, lo in split_range(r['start_id'], r['end_id'], lease_size):
+                        cur = self._conn.execute(
+                            "INSERT OR IGNORE INTO leases (label, start_id, end_id) VALUES (?, ?, ?)",
+                            (r['label'], hi, lo))
+                        created += cur.rowcount
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return created
+
+    def claim(self, owner, lease_ttl):
+        """
+        Reclama atómicamente el siguiente lease pendiente (o uno cuyo heartbeat ha caducado).
+        Devuelve un dict con lease_id, label, start_id y end_id, o None si no queda trabajo.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT lease_id, label, start_id, end_id FROM leases "
+                    "WHERE status = 'pending' OR (status = 'claimed' AND heartbeat_at < ?) "
+                    "ORDER BY lease_id LIMIT 1", (now - lease_ttl,)).fetchone()
+                if row:
+                    self._conn.execute(
+                        "UPDATE leases SET status = 'claimed', owner = ?, heartbeat_at = ?, claims = claims + 1 "
+                        "WHERE lease_id = ?", (owner, now, row[0]))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        if not row:
+            return None
+        return {'lease_id': row[0], 'label': row[1], 'start_id': row[2], 'end_id': row[3]}
+
+    def heartbeat(self, lease_id, owner):
+        """Renueva el lease. Devuelve False si otro trabajador lo ha reclamado (lease perdido)."""
+        with self._lock:
+            cur = self._conn.execute(
+                "UPDATE leases SET heartbeat_at = ? WHERE lease_id = ? AND owner = ? AND status = 'claimed'",
+                (time.time(), lease_id, owner))
+        return cur.rowcount == 1
+
+    def complete(self, lease_id, owner, counts):
+        with self._lock:
+            cur = self._conn.execute(
+                f"UPDATE leases SET status = 'done', completed_at = ?, "
+                f"{', '.join(f'{f} = ?' for f in COUNT_FIELDS)} "
+                f"WHERE lease_id = ? AND owner = ?",
+                (time.time(), *[int(counts.get(f, 0)) for f in COUNT_FIELDS], lease_id, owner))
+        return cur.rowcount == 1
+
+    def release(self, lease_id, owner):
+        """Devuelve un lease a la cola sin completarlo (p. ej. al interrumpir el trabajador)."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE leases SET status = 'pending', owner = NULL, heartbeat_at = NULL "
+                "WHERE lease_id = ? AND owner = ? AND status = 'claimed'", (lease_id, owner))
+
+    def summary(self):
+        """Estado agregado de la cola: leases por estado y contadores totales de partidos."""
+        with self._lock:
+            by_status = dict(self._conn.execute("SELECT status, COUNT(*) FROM leases GROUP BY status").fetchall())
+            totals = self._conn.execute(
+                f"SELECT {', '.join(f'COALESCE(SUM({f}), 0)' for f in COUNT_FIELDS)} FROM leases").fetchone()
+            owners = self._conn.execute(
+                "SELECT owner, COUNT(*) FROM leases WHERE status = 'done' GROUP BY owner").fetchall()
+        return {'leases': by_status, 'counts': dict(zip(COUNT_FIELDS, totals)), 'done_by_owner': dict(owners)}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class LeaseHeartbeat:
+    """Hilo que renueva un lease periódicamente mientras se procesa."""
+
+    def __init__(self, queue, lease_id, owner, interval):
+        self.queue, self.lease_id, self.owner, self.interval = queue, lease_id, owner, interval
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            if not self.queue.heartbeat(self.lease_id, self.owner):
+                self.lost = True
+                return
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
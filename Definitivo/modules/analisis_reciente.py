@@ -3,8 +3,10 @@ import re
 import math
 from bs4 import BeautifulSoup
 from modules.utils import parse_ah_to_number_of, format_ah_as_decimal_string_of, check_handicap_cover
+from modules.opponent_index import get_opponent_index
+from modules.team_identity import row_team_ids, team_ref
 
-def analizar_rendimiento_reciente_con_handicap(soup, team_name, is_home_team=True):
+def analizar_rendimiento_reciente_con_handicap(soup, team_name, is_home_team=True, team_id=None):
     """
     Analiza el rendimiento reciente de un equipo con respecto al handicap.
     
@@ -12,6 +14,7 @@ def analizar_rendimiento_reciente_con_handicap(soup, team_name, is_home_team=Tru
         soup: BeautifulSoup object con el contenido de la página
         team_name: Nombre del equipo a analizar
         is_home_team: Booleano que indica si el equipo es local (True) o visitante (False)
+        team_id: ID de nowgoal del equipo (opcional; si no, se resuelve por el nombre)
     
     Returns:
         dict: Diccionario con el análisis del rendimiento reciente
@@ -25,6 +28,9 @@ def analizar_rendimiento_reciente_con_handicap(soup, team_name, is_home_team=Tru
     
     # Extraer los últimos 5 partidos del equipo
     matches = []
+    # Los nombres sin ID se resuelven con los alias de esta página, no con los de otros análisis
+    aliases = get_opponent_index(soup).aliases
+    team = team_ref(team_id, team_name, aliases)
     score_selector = 'fscore_1' if is_home_team else 'fscore_2'
     
     for row in table.find_all("tr", id=re.compile(rf"tr{table_id[-1]}_\d+")):
@@ -43,8 +49,9 @@ def analizar_rendimiento_reciente_con_handicap(soup, team_name, is_home_team=Tru
         home_team = home_team_cell.get_text(strip=True)
         away_team = away_team_cell.get_text(strip=True)
         
-        # Verificar si el equipo está en este partido
-        if team_name.lower() not in [home_team.lower(), away_team.lower()]:
+        # Verificar si el equipo está en este partido (por ID de equipo si la fila lo trae)
+        home_id, away_id = row_team_ids(row)
+        if team not in (team_ref(home_id, home_team, aliases), team_ref(away_id, away_team, aliases)):
             continue
             
         # Obtener resultado
@@ -119,7 +126,7 @@ def analizar_rendimiento_reciente_con_handicap(soup, team_name, is_home_team=Tru
     
     return analysis
 
-def comparar_lineas_handicap_recientes(soup, team_name, current_ah_line, is_home_team=True):
+def comparar_lineas_handicap_recientes(soup, team_name, current_ah_line, is_home_team=True, team_id=None):
     """
     Compara las líneas de handicap recientes con la línea actual.
     
@@ -133,7 +140,7 @@ def comparar_lineas_handicap_recientes(soup, team_name, current_ah_line, is_home
         dict: Diccionario con la comparación de líneas
     """
     # Obtener análisis de rendimiento reciente
-    rendimiento = analizar_rendimiento_reciente_con_handicap(soup, team_name, is_home_team)
+    rendimiento = analizar_rendimiento_reciente_con_handicap(soup, team_name, is_home_team, team_id)
     
     if 'error' in rendimiento:
         return rendimiento
@@ -1,9 +1,8 @@
 # modules/analisis_rivales.py
-import re
-from bs4 import BeautifulSoup
-from modules.utils import get_match_details_from_row_of
+from modules.opponent_index import get_opponent_index
+from modules.team_identity import team_arg
 
-def analizar_rivales_comunes(soup, team_a, team_b):
+def analizar_rivales_comunes(soup, team_a, team_b, team_a_id=None, team_b_id=None):
     """
     Analiza los rivales comunes entre dos equipos.
     
@@ -11,81 +10,54 @@ def analizar_rivales_comunes(soup, team_a, team_b):
         soup: BeautifulSoup object con el contenido de la página
         team_a: Nombre del primer equipo
         team_b: Nombre del segundo equipo
+        team_a_id, team_b_id: IDs de nowgoal de los equipos (opcionales; si no, se resuelven por el nombre)
     
     Returns:
         dict: Diccionario con el análisis de rivales comunes
     """
-    # Buscar tablas de partidos para ambos equipos
-    table_v1 = soup.find("table", id="table_v1")  # Partidos de team_a como local
-    table_v2 = soup.find("table", id="table_v2")  # Partidos de team_b como visitante
-    
-    if not table_v1 or not table_v2:
+    # Índice de filas por equipo, compartido con el resto del análisis (modules/opponent_index.py)
+    index = get_opponent_index(soup)
+    if not index.has_table("table_v1") or not index.has_table("table_v2"):
         return {"error": "No se encontraron las tablas de partidos"}
     
-    # Extraer rivales de team_a (como local)
-    rivals_a = set()
-    for row in table_v1.find_all("tr", id=re.compile(r"tr1_\d+")):
-        details = get_match_details_from_row_of(row, score_class_selector='fscore_1', source_table_type='hist')
-        if details and team_a.lower() in details['home'].lower():
-            rivals_a.add(details['away'].lower())
-    
-    # Extraer rivales de team_b (como visitante)
-    rivals_b = set()
-    for row in table_v2.find_all("tr", id=re.compile(r"tr2_\d+")):
-        details = get_match_details_from_row_of(row, score_class_selector='fscore_2', source_table_type='hist')
-        if details and team_b.lower() in details['away'].lower():
-            rivals_b.add(details['home'].lower())
+    # Rivales de team_a como local (table_v1) y de team_b como visitante (table_v2)
+    rivals_a = index.opponents("table_v1", team_arg(team_a_id, team_a), as_home=True)
+    rivals_b = index.opponents("table_v2", team_arg(team_b_id, team_b), as_home=False)
     
-    # Encontrar rivales comunes
-    common_rivals = rivals_a.intersection(rivals_b)
+    # Encontrar rivales comunes: intersección de las claves
+    common_keys = rivals_a.keys() & rivals_b.keys()
     
     # Obtener detalles de partidos contra rivales comunes
     common_matches = []
-    
-    # Partidos de team_a contra rivales comunes
-    for row in table_v1.find_all("tr", id=re.compile(r"tr1_\d+")):
-        details = get_match_details_from_row_of(row, score_class_selector='fscore_1', source_table_type='hist')
-        if details and details['away'].lower() in common_rivals:
-            common_matches.append({
-                'team': team_a,
-                'opponent': details['away'],
-                'home_team': details['home'],
-                'away_team': details['away'],
-                'score': details['score'],
-                'score_raw': details['score_raw'],
-                'ah_line': details['ahLine'],
-                'ah_line_raw': details['ahLine_raw'],
-                'date': details['date']
-            })
-    
-    # Partidos de team_b contra rivales comunes
-    for row in table_v2.find_all("tr", id=re.compile(r"tr2_\d+")):
-        details = get_match_details_from_row_of(row, score_class_selector='fscore_2', source_table_type='hist')
-        if details and details['home'].lower() in common_rivals:
-            common_matches.append({
-                'team': team_b,
-                'opponent': details['home'],
-                'home_team': details['home'],
-                'away_team': details['away'],
-                'score': details['score'],
-                'score_raw': details['score_raw'],
-                'ah_line': details['ahLine'],
-                'ah_line_raw': details['ahLine_raw'],
-                'date': details['date']
-            })
+    for team, rivals, opponent_field in ((team_a, rivals_a, 'away'), (team_b, rivals_b, 'home')):
+        for key in common_keys:
+            for details in rivals[key]:
+                common_matches.append({
+                    'team': team,
+                    'opponent': details[opponent_field],
+                    'home_team': details['home'],
+                    'away_team': details['away'],
+                    'score': details['score'],
+                    'score_raw': details['score_raw'],
+                    'ah_line': details['ahLine'],
+                    'ah_line_raw': details['ahLine_raw'],
+                    'date': details['date']
+                })
     
     # Ordenar por fecha
     common_matches.sort(key=lambda x: x['date'], reverse=True)
+    common_rivals = [rivals_a[key][0]['away'].lower() for key in common_keys]
     
     return {
         'team_a': team_a,
         'team_b': team_b,
-        'common_rivals': list(common_rivals),
+        'common_rivals': common_rivals,
         'common_rivals_count': len(common_rivals),
         'matches': common_matches[:10]  # Limitar a 10 partidos más recientes
     }
 
-def analizar_contra_rival_del_rival(soup, team_a, team_b, rival_a_rival, rival_b_rival):
+def analizar_contra_rival_del_rival(soup, team_a, team_b, rival_a_rival, rival_b_rival,
+                                    team_a_id=None, team_b_id=None, rival_a_rival_id=None, rival_b_rival_id=None):
     """
     Analiza el rendimiento de cada equipo contra el rival del otro equipo.
     
@@ -95,54 +67,30 @@ def analizar_contra_rival_del_rival(soup, team_a, team_b, rival_a_rival, rival_b
         team_b: Nombre del segundo equipo
         rival_a_rival: Rival del equipo A
         rival_b_rival: Rival del equipo B
+        team_a_id, team_b_id, rival_a_rival_id, rival_b_rival_id: IDs de nowgoal (opcionales)
     
     Returns:
         dict: Diccionario con el análisis contra el rival del rival
     """
-    # Buscar tablas de partidos
-    table_v1 = soup.find("table", id="table_v1")  # Partidos de team_a como local
-    table_v2 = soup.find("table", id="table_v2")  # Partidos de team_b como visitante
-    
-    if not table_v1 or not table_v2:
+    index = get_opponent_index(soup)
+    if not index.has_table("table_v1") or not index.has_table("table_v2"):
         return {"error": "No se encontraron las tablas de partidos"}
     
-    # Buscar partidos de team_a contra rival_b_rival
-    matches_a_vs_rival_b_rival = []
-    for row in table_v1.find_all("tr", id=re.compile(r"tr1_\d+")):
-        details = get_match_details_from_row_of(row, score_class_selector='fscore_1', source_table_type='hist')
-        if details and (
-            (team_a.lower() in details['home'].lower() and rival_b_rival.lower() in details['away'].lower()) or
-            (team_a.lower() in details['away'].lower() and rival_b_rival.lower() in details['home'].lower())
-        ):
-            matches_a_vs_rival_b_rival.append({
-                'team': team_a,
-                'home_team': details['home'],
-                'away_team': details['away'],
-                'score': details['score'],
-                'score_raw': details['score_raw'],
-                'ah_line': details['ahLine'],
-                'ah_line_raw': details['ahLine_raw'],
-                'date': details['date']
-            })
-    
-    # Buscar partidos de team_b contra rival_a_rival
-    matches_b_vs_rival_a_rival = []
-    for row in table_v2.find_all("tr", id=re.compile(r"tr2_\d+")):
-        details = get_match_details_from_row_of(row, score_class_selector='fscore_2', source_table_type='hist')
-        if details and (
-            (team_b.lower() in details['home'].lower() and rival_a_rival.lower() in details['away'].lower()) or
-            (team_b.lower() in details['away'].lower() and rival_a_rival.lower() in details['home'].lower())
-        ):
-            matches_b_vs_rival_a_rival.append({
-                'team': team_b,
-                'home_team': details['home'],
-                'away_team': details['away'],
-                'score': details['score'],
-                'score_raw': details['score_raw'],
-                'ah_line': details['ahLine'],
-                'ah_line_raw': details['ahLine_raw'],
-                'date': details['date']
-            })
+    def _partidos(table_id, team, team_key, rival_key):
+        return [{
+            'team': team,
+            'home_team': details['home'],
+            'away_team': details['away'],
+            'score': details['score'],
+            'score_raw': details['score_raw'],
+            'ah_line': details['ahLine'],
+            'ah_line_raw': details['ahLine_raw'],
+            'date': details['date']
+        } for details in index.pair_rows(table_id, team_key, rival_key)]
+    
+    # Partidos de team_a contra rival_b_rival y de team_b contra rival_a_rival
+    matches_a_vs_rival_b_rival = _partidos("table_v1", team_a, team_arg(team_a_id, team_a), team_arg(rival_b_rival_id, rival_b_rival))
+    matches_b_vs_rival_a_rival = _partidos("table_v2", team_b, team_arg(team_b_id, team_b), team_arg(rival_a_rival_id, rival_a_rival))
     
     return {
         'team_a': team_a,
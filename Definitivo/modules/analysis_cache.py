@@ -0,0 +1,286 @@
+# modules/analysis_cache.py
+"""
+Caché de análisis completos con invalidación por cambios de cuotas/historial.
+
+Cada entrada guarda el AnalysisResult serializado junto con una huella (fingerprint)
+de lo que puede cambiar antes del partido:
+  - la fila de cuotas iniciales de Bet365 (earlyOdds),
+  - los partidos más recientes del historial de local y visitante (table_v1/v2).
+
+Flujo de obtener_resultado_cacheado:
+  - Dentro del TTL -> se sirve directamente ('hit').
+  - TTL vencido -> se descarga solo la página H2H con requests (sin Selenium) y se
+    recalcula la huella: si coincide se renueva la entrada ('revalidated'); si no,
+    se invalida y se rehace el análisis ('invalidated').
+  - Sin entrada -> análisis completo ('miss').
+El TTL se acorta a medida que se acerca el inicio del partido (ttl_for_kickoff).
+Los resultados parciales no se guardan. Los errores deterministas (partido
+inexistente, página que no se puede parsear) van a una caché negativa de TTL
+corto (NEGATIVE_TTL) para que los reintentos no relancen Chrome ('negative').
+
+La caché es un fichero SQLite para compartirla entre los workers de gunicorn.
+Configuración por variables de entorno:
+    ANALYSIS_CACHE_FILE=ruta       (por defecto 'analysis_cache.sqlite3'; vacío = desactivada)
+"""
+import datetime
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+
+from bs4 import BeautifulSoup
+
+from modules.analysis_model import AnalysisResult
+
+ANALYSIS_CACHE_FILE = os.environ.get("ANALYSIS_CACHE_FILE", "analysis_cache.sqlite3")
+FINGERPRINT_HISTORY_ROWS = 3
+
+# Segundos que se recuerda cada tipo de error (los fallos del origen no se cachean:
+# de eso se encarga el circuit breaker)
+NEGATIVE_TTL = {"not_found": 10 * 60, "parse_error": 2 * 60}
+
+
+def ttl_for_kickoff(kickoff_ts, now=None):
+    """Segundos de validez de una entrada según lo que falte para el inicio del partido."""
+    now = now or time.time()
+    if kickoff_ts is None:
+        return 10 * 60
+    to_kickoff = kickoff_ts - now
+    if to_kickoff > 24 * 3600:
+        return 2 * 3600
+    if to_kickoff > 6 * 3600:
+        return 30 * 60
+    if to_kickoff > 3600:
+        return 10 * 60
+    if to_kickoff > 0:
+        return 2 * 60
+    if to_kickoff > -3 * 3600:
+        return 60  # En juego: las cuotas se mueven constantemente
+    return 24 * 3600  # Partido terminado: el análisis ya no cambia
+
+
+def parse_kickoff(soup):
+    """Hora de inicio (timestamp UTC) desde _matchInfo.matchTime ('9/9/2025 5:00:00 PM')."""
+    script_tag = soup.find("script", string=re.compile(r"var _matchInfo = "))
+    if not (script_tag and script_tag.string):
+        return None
+    match = re.search(r"matchTime:\s*'([^']+)'", script_tag.string)
+    if not match:
+        return None
+    try:
+        kickoff = datetime.datetime.strptime(match.group(1), "%m/%d/%Y %I:%M:%S %p")
+    except ValueError:
+        return None
+    return kickoff.replace(tzinfo=datetime.timezone.utc).timestamp()
+
+
+def compute_fingerprint(soup):
+    """Huella de la fila earlyOdds de Bet365 y de los últimos partidos de cada equipo."""
+    parts = []
+    bet365_row = soup.select_one("tr#tr_o_1_8[name='earlyOdds'], tr#tr_o_1_31[name='earlyOdds']")
+    if bet365_row:
+        parts.append("|".join((td.get("data-o") or td.get_text(strip=True)) for td in bet365_row.find_all("td")))
+    for table_id, row_prefix in (("table_v1", "tr1_"), ("table_v2", "tr2_")):
+        table = soup.find("table", id=table_id)
+        rows = table.find_all("tr", id=re.compile(rf"{row_prefix}\d+"), limit=FINGERPRINT_HISTORY_ROWS) if table else []
+        parts.append(",".join(row.get("index", "") for row in rows))
+    return hashlib.sha1("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+def fetch_fingerprint(match_id, timeout=5):
+    """Descarga ligera (requests) de la página H2H -> (huella, kickoff_ts) o (None, None)."""
+    from modules.estudio_scraper import BASE_URL_OF, get_http_session
+    from modules.circuit_breaker import get_breaker, CircuitOpenError
+    breaker = get_breaker(BASE_URL_OF)
+    try:
+        breaker.before_call()
+        response = get_http_session().get(f"{BASE_URL_OF}/match/h2h-{match_id}", timeout=timeout)
+    except CircuitOpenError:
+        return None, None
+    except Exception:
+        breaker.record_failure()
+        return None, None
+    if response.status_code >= 500:
+        breaker.record_failure()
+        return None, None
+    breaker.record_success()
+    if not response.ok:
+        return None, None
+    soup = BeautifulSoup(response.text, "lxml")
+    return compute_fingerprint(soup), parse_kickoff(soup)
+
+
+class AnalysisCache:
+    def __init__(self, path=ANALYSIS_CACHE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS analysis_cache (
+                match_id       TEXT PRIMARY KEY,
+                fingerprint    TEXT,
+                kickoff_ts     REAL,
+                schema_version INTEGER NOT NULL,
+                payload        BLOB NOT NULL,
+                validated_at   REAL NOT NULL
+            )""")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS negative_cache (
+                match_id   TEXT PRIMARY KEY,
+                kind       TEXT NOT NULL,
+                error      TEXT,
+                expires_at REAL NOT NULL
+            )""")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS warm_claims (
+                match_id   TEXT PRIMARY KEY,
+                owner      TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )""")
+        self.stats = {"hit": 0, "revalidated": 0, "invalidated": 0, "miss": 0, "bypass": 0, "negative": 0}
+
+    def get(self, match_id):
+        """Devuelve (AnalysisResult, fingerprint, kickoff_ts, validated_at) o None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT fingerprint, kickoff_ts, payload, validated_at FROM analysis_cache WHERE match_id = ?",
+                (str(match_id),)).fetchone()
+        if row is None:
+            return None
+        fingerprint, kickoff_ts, payload, validated_at = row
+        try:
+            result = AnalysisResult.loads(zlib.decompress(payload))
+        except (ValueError, zlib.error):
+            # Esquema antiguo o entrada corrupta: se trata como fallo de caché
+            self.invalidate(match_id)
+            return None
+        return result, fingerprint, kickoff_ts, validated_at
+
+    def put(self, result, fingerprint, kickoff_ts):
+        payload = zlib.compress(result.dumps("json"), 6)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO analysis_cache (match_id, fingerprint, kickoff_ts, schema_version, payload, validated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (str(result.match_id), fingerprint, kickoff_ts, result.schema_version, payload, time.time()))
+
+    def touch(self, match_id):
+        with self._lock:
+            self._conn.execute("UPDATE analysis_cache SET validated_at = ? WHERE match_id = ?", (time.time(), str(match_id)))
+
+    def invalidate(self, match_id):
+        with self._lock:
+            self._conn.execute("DELETE FROM analysis_cache WHERE match_id = ?", (str(match_id),))
+
+    def is_fresh(self, match_id, now=None):
+        """True si hay una entrada dentro de su TTL (se serviría como 'hit')."""
+        now = now or time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT kickoff_ts, validated_at FROM analysis_cache WHERE match_id = ?",
+                                     (str(match_id),)).fetchone()
+        return row is not None and now - row[1] < ttl_for_kickoff(row[0], now)
+
+    def try_claim(self, match_id, owner, ttl):
+        """Reserva un partido para precalentarlo (evita que dos workers lo analicen a la vez)."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("DELETE FROM warm_claims WHERE match_id = ? AND expires_at < ?", (str(match_id), now))
+            cur = self._conn.execute("INSERT OR IGNORE INTO warm_claims (match_id, owner, expires_at) VALUES (?, ?, ?)",
+                                     (str(match_id), owner, now + ttl))
+        return cur.rowcount == 1
+
+    def release_claim(self, match_id, owner):
+        with self._lock:
+            self._conn.execute("DELETE FROM warm_claims WHERE match_id = ? AND owner = ?", (str(match_id), owner))
+
+    def get_negative(self, match_id, now=None):
+        """AnalysisResult fallido si hay un error reciente registrado para el partido, si no None."""
+        now = now or time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT kind, error FROM negative_cache WHERE match_id = ? AND expires_at > ?",
+                                     (str(match_id), now)).fetchone()
+        if row is None:
+            return None
+        return AnalysisResult.failed(str(match_id), row[1], row[0])
+
+    def put_negative(self, result, ttl):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO negative_cache (match_id, kind, error, expires_at) VALUES (?, ?, ?, ?)",
+                (str(result.match_id), result.error_kind, result.error, time.time() + ttl))
+
+    def purge_expired(self, now=None):
+        """Borra las entradas que no se han validado en los últimos dos días y los errores vencidos."""
+        now = now or time.time()
+        with self._lock:
+            cur = self._conn.execute("DELETE FROM analysis_cache WHERE validated_at < ?", (now - 2 * 24 * 3600,))
+            self._conn.execute("DELETE FROM negative_cache WHERE expires_at < ?", (now,))
+        return cur.rowcount
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_analysis_cache():
+    """Caché compartida del proceso (None si ANALYSIS_CACHE_FILE está vacío)."""
+    global _cache
+    if not ANALYSIS_CACHE_FILE:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = AnalysisCache(ANALYSIS_CACHE_FILE)
+    return _cache
+
+
+def obtener_resultado_cacheado(match_id, compute, cache=None, refresh=False, now=None):
+    """
+    Devuelve (AnalysisResult, estado) usando la caché. compute() hace el análisis completo
+    (su resultado trae la huella y la hora de inicio, tomadas durante el análisis con fetch_fingerprint).
+    estado: 'hit', 'revalidated', 'invalidated', 'miss', 'negative' (error reciente
+    en caché negativa) o 'bypass' (sin caché / refresh).
+    """
+    cache = cache if cache is not None else get_analysis_cache()
+    if cache is None:
+        return compute(), "bypass"
+    now = now or time.time()
+
+    negative = None if refresh else cache.get_negative(match_id, now)
+    if negative is not None:
+        cache.stats["negative"] += 1
+        return negative, "negative"
+
+    status = "bypass" if refresh else "miss"
+    entry = None if refresh else cache.get(match_id)
+    if entry is not None:
+        result, fingerprint, kickoff_ts, validated_at = entry
+        if now - validated_at < ttl_for_kickoff(kickoff_ts, now):
+            cache.stats["hit"] += 1
+            return result, "hit"
+        new_fingerprint, new_kickoff = fetch_fingerprint(match_id)
+        if new_fingerprint is not None and new_fingerprint == fingerprint:
+            cache.touch(match_id)
+            cache.stats["revalidated"] += 1
+            return result, "revalidated"
+        cache.invalidate(match_id)
+        status = "invalidated"
+
+    cache.stats[status] += 1
+    result = compute()
+    if result.error:
+        if result.error_kind in NEGATIVE_TTL:
+            cache.put_negative(result, NEGATIVE_TTL[result.error_kind])
+    elif not result.partial and result.fingerprint is not None:
+        # La huella la tomó el propio análisis con fetch_fingerprint (misma fuente que la revalidación)
+        cache.put(result, result.fingerprint, result.kickoff_ts)
+    return result, status
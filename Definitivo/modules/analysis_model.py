@@ -0,0 +1,208 @@
+# modules/analysis_model.py
+"""
+Modelo tipado y versionado del resultado de un análisis de partido.
+
+El dict `datos` original mezclaba DataFrames de pandas (estadísticas de progresión),
+HTML pre-renderizado y objetos función, por lo que no se podía cachear, enviar entre
+procesos ni devolver como JSON sin conversiones ad hoc. AnalysisResult contiene solo
+tipos simples (str, números, listas, dicts) más StatRow/MatchStats/MatchBlock, y se
+serializa sin pérdidas a JSON o msgpack (opcional).
+
+    resultado.to_dict() / AnalysisResult.from_dict(d)
+    resultado.dumps("json" | "msgpack") / AnalysisResult.loads(blob, fmt)
+    resultado.to_template_data()   -> dict con la forma que esperan las plantillas
+                                      (con los textos ya formateados en <bloque>.display)
+
+SCHEMA_VERSION se incrementa con cualquier cambio incompatible; from_dict rechaza
+otras versiones con ValueError (una caché debe tratarlo como fallo de caché).
+"""
+import json
+from dataclasses import dataclass, field
+
+from modules.utils import format_ah_as_decimal_string_of
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+SCHEMA_VERSION = 1
+
+# Partidos de referencia con detalles + estadísticas de progresión
+MATCH_BLOCKS = ("last_home_match", "last_away_match", "h2h_col3", "comp_L_vs_UV_A",
+                "comp_V_vs_UL_H", "h2h_stadium", "h2h_general")
+
+# Secciones de análisis opcionales (pueden faltar según los datos del partido)
+ANALYSIS_SECTIONS = ("rendimiento_local_handicap", "rendimiento_visitante_handicap",
+                     "comparacion_lineas_local", "comparacion_lineas_visitante",
+                     "rivales_comunes", "analisis_contra_rival_del_rival", "resumen_rendimiento_reciente")
+
+
+# Traducción de las etiquetas de estadísticas de progresión (en orden: 'Shots' va después de 'Shots on Goal')
+_STAT_LABELS_ES = (("Shots on Goal", "Tiros a Puerta"), ("Shots", "Tiros"),
+                   ("Dangerous Attacks", "Ataques Peligrosos"), ("Attacks", "Ataques"))
+
+
+@dataclass
+class StatRow:
+    label: str
+    home: str
+    away: str
+
+    @property
+    def label_es(self):
+        label = self.label
+        for en, es in _STAT_LABELS_ES:
+            label = label.replace(en, es)
+        return label
+
+
+@dataclass
+class MatchStats:
+    """Estadísticas de progresión de un partido (Corners, Tiros, Ataques...)."""
+    rows: list = field(default_factory=list)
+
+    # Compatibilidad con la plantilla que antes recibía un DataFrame
+    columns = ("Casa", "Fuera")
+
+    @property
+    def empty(self):
+        return not self.rows
+
+    @classmethod
+    def from_dataframe(cls, df):
+        """Convierte el DataFrame de get_match_progression_stats_data (índice = estadística)."""
+        if df is None:
+            return None
+        rows = []
+        for idx, row in df.iterrows():
+            rows.append(StatRow(str(idx), str(row.get("Casa", "") or ""), str(row.get("Fuera", "") or "")))
+        return cls(rows)
+
+    def to_list(self):
+        return [[r.label, r.home, r.away] for r in self.rows]
+
+    @classmethod
+    def from_list(cls, data):
+        if data is None:
+            return None
+        return cls([StatRow(*item) for item in data])
+
+
+@dataclass
+class MatchBlock:
+    details: dict = None
+    stats: MatchStats = None
+
+    def to_dict(self):
+        return {"details": self.details, "stats": self.stats.to_list() if self.stats is not None else None}
+
+    @classmethod
+    def from_dict(cls, data):
+        data = data or {}
+        return cls(data.get("details"), MatchStats.from_list(data.get("stats")))
+
+
+def display_strings(name, details):
+    """Textos de presentación de un bloque (marcador con espacios y AH decimal), calculados una vez."""
+    details = details or {}
+    score = details.get({"h2h_stadium": "res1", "h2h_general": "res6"}.get(name, "score"))
+    ah_raw = details.get("handicap_line_raw") or details.get("ah_line") or details.get("handicap")
+    return {
+        "score": score.replace(":", " : ") if isinstance(score, str) else "",
+        "ah": format_ah_as_decimal_string_of(ah_raw),
+    }
+
+
+@dataclass
+class AnalysisResult:
+    match_id: str
+    home_name: str = ""
+    away_name: str = ""
+    league_name: str = ""
+    main_match_odds: dict = field(default_factory=dict)
+    home_standings: dict = field(default_factory=dict)
+    away_standings: dict = field(default_factory=dict)
+    home_ou_stats: dict = field(default_factory=dict)
+    away_ou_stats: dict = field(default_factory=dict)
+    market_analysis_html: str = ""
+    advanced_analysis_html: str = ""
+    blocks: dict = field(default_factory=dict)      # nombre de MATCH_BLOCKS -> MatchBlock
+    analyses: dict = field(default_factory=dict)    # nombre de ANALYSIS_SECTIONS -> datos JSON
+    partial: bool = False
+    partial_stages: list = field(default_factory=list)
+    elapsed_s: float = None
+    error: str = None                               # Mensaje si el análisis falló
+    error_kind: str = None                          # invalid | not_found | load_error | parse_error | upstream_error | upstream_unavailable
+    fingerprint: str = None                         # Huella de la página H2H (analysis_cache.fetch_fingerprint)
+    kickoff_ts: float = None                        # Hora de inicio (timestamp UTC) leída de esa misma descarga
+    schema_version: int = SCHEMA_VERSION
+
+    _SIMPLE_FIELDS = ("match_id", "home_name", "away_name", "league_name", "main_match_odds",
+                      "home_standings", "away_standings", "home_ou_stats", "away_ou_stats",
+                      "market_analysis_html", "advanced_analysis_html", "partial", "partial_stages",
+                      "elapsed_s", "error", "error_kind", "fingerprint", "kickoff_ts")
+
+    @classmethod
+    def from_datos(cls, datos):
+        """Construye el resultado a partir del dict de obtener_datos_completos_partido (stats como DataFrame)."""
+        result = cls(**{k: datos[k] for k in cls._SIMPLE_FIELDS if datos.get(k) is not None})
+        for name in MATCH_BLOCKS:
+            block = datos.get(name) or {}
+            stats = block.get("stats")
+            if stats is not None and not isinstance(stats, MatchStats):
+                stats = MatchStats.from_dataframe(stats)
+            result.blocks[name] = MatchBlock(block.get("details"), stats)
+        result.analyses = {k: datos[k] for k in ANALYSIS_SECTIONS if k in datos}
+        return result
+
+    # --- Serialización ---
+    def to_dict(self):
+        data = {k: getattr(self, k) for k in self._SIMPLE_FIELDS}
+        data["schema_version"] = self.schema_version
+        data["blocks"] = {name: block.to_dict() for name, block in self.blocks.items()}
+        data["analyses"] = self.analyses
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        version = data.get("schema_version")
+        if version != SCHEMA_VERSION:
+            raise ValueError(f"Versión de esquema {version!r} no soportada (se esperaba {SCHEMA_VERSION}).")
+        result = cls(**{k: data[k] for k in cls._SIMPLE_FIELDS if k in data})
+        result.blocks = {name: MatchBlock.from_dict(block) for name, block in (data.get("blocks") or {}).items()}
+        result.analyses = dict(data.get("analyses") or {})
+        return result
+
+    def dumps(self, fmt="json"):
+        if fmt == "msgpack":
+            if msgpack is None:
+                raise ImportError("El formato msgpack requiere el paquete 'msgpack'.")
+            return msgpack.packb(self.to_dict(), use_bin_type=True)
+        return json.dumps(self.to_dict(), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    @classmethod
+    def loads(cls, blob, fmt="json"):
+        if fmt == "msgpack":
+            if msgpack is None:
+                raise ImportError("El formato msgpack requiere el paquete 'msgpack'.")
+            return cls.from_dict(msgpack.unpackb(blob, raw=False))
+        return cls.from_dict(json.loads(blob))
+
+    @classmethod
+    def failed(cls, match_id, error, error_kind=None):
+        return cls(match_id=match_id, error=error, error_kind=error_kind)
+
+    # --- Vistas ---
+    def to_template_data(self):
+        """Dict plano con las claves que usan estudio.html y /api/analisis ('error' solo si falló)."""
+        if self.error:
+            return {"match_id": self.match_id, "error": self.error, "error_kind": self.error_kind}
+        data = {k: getattr(self, k) for k in self._SIMPLE_FIELDS
+                if k not in ("error", "error_kind", "fingerprint", "kickoff_ts")}
+        for name in MATCH_BLOCKS:
+            block = self.blocks.get(name) or MatchBlock()
+            data[name] = {"details": block.details, "stats": block.stats,
+                          "display": display_strings(name, block.details)}
+        data.update(self.analyses)
+        return data
@@ -0,0 +1,242 @@
+# modules/async_runtime.py
+"""
+Bucle de eventos persistente por proceso y pool de navegador Playwright.
+
+Las rutas de Flask hacían asyncio.run(...) en cada petición: un bucle de eventos
+nuevo y un Chromium nuevo (async_playwright + launch) por petición, cerrados al
+terminar. Aquí cada worker tiene:
+  - un único bucle de eventos en un hilo propio (AsyncRuntime), arrancado la
+    primera vez que se usa; run_async() le envía corrutinas desde cualquier hilo
+    (vistas de Flask, precalentamiento) y await_on_runtime() desde otro bucle
+    (modo ASGI, ver asgi.py). Todas las corrutinas de scraping comparten así el
+    mismo bucle y se multiplexan en él;
+  - un Chromium persistente (BrowserPool) del que cada descarga toma una página
+    en un contexto aislado. Como mucho BROWSER_POOL_PAGES páginas a la vez; el
+    navegador se relanza si se cae o tras BROWSER_POOL_MAX_USES páginas (para
+    contener la memoria que va acumulando Chromium). Para relanzarlo el pool se
+    drena: las páginas nuevas esperan a que terminen las abiertas (como mucho
+    BROWSER_POOL_DRAIN_TIMEOUT s), así bajo carga constante también se recicla.
+
+run_async() espera como mucho RUN_ASYNC_TIMEOUT s (por debajo del `-t 180` de
+gunicorn en el Dockerfile): la petición falla y se cancela la corrutina antes de
+que gunicorn mate el worker entero.
+
+    async with get_browser_pool().page() as page:
+        await page.goto(url)
+
+Configuración por variables de entorno:
+    BROWSER_POOL_PAGES=N       (por defecto 4)
+    BROWSER_POOL_MAX_USES=N    (por defecto 200)
+    BROWSER_POOL_DRAIN_TIMEOUT=s   (por defecto 60)
+    RUN_ASYNC_TIMEOUT=s        (por defecto 170)
+"""
+import asyncio
+import atexit
+import os
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from contextlib import asynccontextmanager
+
+from playwright.async_api import async_playwright
+
+BROWSER_POOL_PAGES = int(os.environ.get("BROWSER_POOL_PAGES", "4"))
+BROWSER_POOL_MAX_USES = int(os.environ.get("BROWSER_POOL_MAX_USES", "200"))
+BROWSER_POOL_DRAIN_TIMEOUT = float(os.environ.get("BROWSER_POOL_DRAIN_TIMEOUT", "60"))
+RUN_ASYNC_TIMEOUT = float(os.environ.get("RUN_ASYNC_TIMEOUT", "170"))
+
+CHROMIUM_ARGS = ['--no-sandbox', '--disable-setuid-sandbox', '--disable-dev-shm-usage']
+
+
+class AsyncRuntime:
+    """Un bucle de eventos de larga vida en un hilo daemon (uno por proceso)."""
+
+    def __init__(self):
+        self._loop = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def loop(self):
+        with self._lock:
+            # Tras un fork (gunicorn) el hilo del padre no existe en el hijo
+            if self._loop is None or self._pid != os.getpid() or self._loop.is_closed():
+                self._loop = self._start()
+                self._pid = os.getpid()
+            return self._loop
+
+    def _start(self):
+        loop = asyncio.new_event_loop()
+        ready = threading.Event()
+
+        def _run():
+            asyncio.set_event_loop(loop)
+            loop.call_soon(ready.set)
+            loop.run_forever()
+
+        threading.Thread(target=_run, name="async-runtime", daemon=True).start()
+        ready.wait()
+        return loop
+
+    def started(self):
+        return self._loop is not None and self._pid == os.getpid() and self._loop.is_running()
+
+    def run(self, coro, timeout=RUN_ASYNC_TIMEOUT):
+        """
+        Ejecuta la corrutina en el bucle persistente y espera su resultado (desde un hilo).
+        Si no termina en `timeout` segundos se cancela y se lanza TimeoutError.
+        """
+        loop = self.loop()
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            coro.close()
+            raise RuntimeError("run_async() bloquearía el propio bucle del runtime; usa await.")
+        future = asyncio.run_coroutine_threadsafe(coro, loop)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise
+
+    async def run_from_loop(self, coro):
+        """Igual que run() pero esperando desde otro bucle de eventos sin bloquearlo."""
+        loop = self.loop()
+        if asyncio.get_running_loop() is loop:
+            return await coro
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+
+class BrowserPool:
+    """Chromium compartido; cada page() abre y cierra un contexto aislado."""
+
+    def __init__(self, max_pages=BROWSER_POOL_PAGES, max_uses=BROWSER_POOL_MAX_USES,
+                 drain_timeout=BROWSER_POOL_DRAIN_TIMEOUT):
+        self.max_pages = max_pages
+        self.max_uses = max_uses
+        self.drain_timeout = drain_timeout
+        self._playwright = None
+        self._browser = None
+        self._launch_lock = None    # Primitivas de asyncio creadas ya dentro del bucle
+        self._slots = None
+        self._idle = None           # Puesto cuando no hay páginas abiertas
+        self._active = 0
+        self._uses = 0
+        self._draining = False
+        self.stats = {"launches": 0, "pages": 0, "crashes": 0, "recycles": 0, "last_launch": None}
+
+    async def _acquire(self):
+        """Navegador para una página nueva; la cuenta como abierta hasta _release()."""
+        if self._launch_lock is None:
+            self._launch_lock = asyncio.Lock()
+            self._idle = asyncio.Event()
+            self._idle.set()
+        async with self._launch_lock:
+            if self._browser is not None and not self._browser.is_connected():
+                self.stats["crashes"] += 1
+                self._browser = None
+            elif self._browser is not None and self._uses >= self.max_uses:
+                # Drenaje: mientras se tiene el lock nadie más abre páginas, y las abiertas terminan
+                self._draining = True
+                try:
+                    await asyncio.wait_for(self._idle.wait(), self.drain_timeout)
+                except asyncio.TimeoutError:
+                    print(f"[browser] {self._active} página(s) siguen abiertas tras {self.drain_timeout:.0f}s; "
+                          "se recicla igualmente")
+                finally:
+                    self._draining = False
+                await self._close_browser()
+                self.stats["recycles"] += 1
+            if self._browser is None:
+                if self._playwright is None:
+                    self._playwright = await async_playwright().start()
+                self._browser = await self._playwright.chromium.launch(headless=True, args=CHROMIUM_ARGS)
+                self._uses = 0
+                self.stats["launches"] += 1
+                self.stats["last_launch"] = time.time()
+            self._active += 1
+            self._uses += 1
+            self._idle.clear()
+            self.stats["pages"] += 1
+            return self._browser
+
+    def _release(self):
+        self._active -= 1
+        if self._active == 0:
+            self._idle.set()
+
+    async def _close_browser(self):
+        browser, self._browser = self._browser, None
+        if browser is not None:
+            try:
+                await browser.close()
+            except Exception:
+                pass
+
+    @asynccontextmanager
+    async def page(self):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_pages)
+        async with self._slots:
+            browser = await self._acquire()
+            try:
+                context = await browser.new_context()
+                try:
+                    yield await context.new_page()
+                finally:
+                    try:
+                        await context.close()
+                    except Exception:
+                        pass
+            finally:
+                self._release()
+
+    def warm(self):
+        """True si hay un Chromium lanzado y conectado."""
+        return self._browser is not None and self._browser.is_connected()
+
+    def snapshot(self):
+        return dict(self.stats, warm=self.warm(), active_pages=self._active, max_pages=self.max_pages,
+                    draining=self._draining)
+
+    async def close(self):
+        await self._close_browser()
+        if self._playwright is not None:
+            playwright, self._playwright = self._playwright, None
+            try:
+                await playwright.stop()
+            except Exception:
+                pass
+
+
+runtime = AsyncRuntime()
+_browser_pool = None
+_browser_pool_pid = None
+
+
+def get_browser_pool():
+    """Pool del proceso (uno nuevo tras un fork: los objetos de Playwright no se heredan)."""
+    global _browser_pool, _browser_pool_pid
+    if _browser_pool is None or _browser_pool_pid != os.getpid():
+        _browser_pool, _browser_pool_pid = BrowserPool(), os.getpid()
+    return _browser_pool
+
+
+def run_async(coro, timeout=RUN_ASYNC_TIMEOUT):
+    """Sustituto de asyncio.run() para código síncrono: usa el bucle persistente del proceso."""
+    return runtime.run(coro, timeout)
+
+
+async def await_on_runtime(coro):
+    """Espera desde otro bucle (p. ej. el del servidor ASGI) una corrutina del runtime."""
+    return await runtime.run_from_loop(coro)
+
+
+@atexit.register
+def _shutdown():
+    if runtime.started():
+        try:
+            runtime.run(get_browser_pool().close(), timeout=10)
+        except Exception:
+            pass
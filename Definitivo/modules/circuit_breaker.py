@@ -0,0 +1,119 @@
+# modules/circuit_breaker.py
+"""
+Circuit breaker por host de origen (nowgoal).
+
+Durante una caída de nowgoal cada petición esperaba sus timeouts completos,
+ocupando hilos de gunicorn y castigando aún más al origen. El breaker cuenta los
+fallos consecutivos de red/5xx de cada host:
+  - closed:    funcionamiento normal.
+  - open:      tras FAILURE_THRESHOLD fallos seguidos; las llamadas fallan al
+               instante con CircuitOpenError durante RESET_TIMEOUT segundos.
+  - half_open: pasado ese tiempo se deja pasar una única llamada de prueba; si
+               va bien se cierra, si falla se vuelve a abrir.
+Una prueba que termina sin veredicto (Chrome no arranca, modo replay, un error
+propio del parseo...) se libera con release_probe(); y si aun así se queda
+colgada, caduca a los RESET_TIMEOUT segundos y se deja pasar otra.
+Un 404 o una página de "partido no encontrado" no es un fallo del host.
+
+El estado es por proceso (cada worker de gunicorn tiene el suyo).
+Configuración por variables de entorno:
+    BREAKER_FAILURE_THRESHOLD=N    (por defecto 5)
+    BREAKER_RESET_TIMEOUT=s        (por defecto 30)
+"""
+import os
+import threading
+import time
+from urllib.parse import urlparse
+
+BREAKER_FAILURE_THRESHOLD = int(os.environ.get("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_TIMEOUT = float(os.environ.get("BREAKER_RESET_TIMEOUT", "30"))
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, host, retry_after):
+        self.host = host
+        self.retry_after = max(1, int(retry_after + 0.999))
+        super().__init__(f"{host} no disponible temporalmente (circuito abierto, reintentar en {self.retry_after}s)")
+
+
+class CircuitBreaker:
+    def __init__(self, host, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_timeout=BREAKER_RESET_TIMEOUT):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._probe_started = 0.0
+        self._probe_id = 0
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """
+        Lanza CircuitOpenError si el circuito está abierto (o ya hay una prueba en curso).
+        Devuelve el id de la prueba si esta llamada es la de half_open (para release_probe) o None.
+        """
+        with self._lock:
+            if self.state == "closed":
+                return None
+            now = time.monotonic()
+            waited = now - self.opened_at
+            if self.state == "open" and waited >= self.reset_timeout:
+                self.state = "half_open"
+            if self._probe_in_flight and now - self._probe_started >= self.reset_timeout:
+                print(f"[breaker] {self.host}: la llamada de prueba no respondió en {self.reset_timeout:.0f}s; se permite otra")
+                self._probe_in_flight = False
+            if self.state == "half_open" and not self._probe_in_flight:
+                self._probe_in_flight = True
+                self._probe_started = now
+                self._probe_id += 1
+                return self._probe_id
+            raise CircuitOpenError(self.host, max(self.reset_timeout - waited, self.reset_timeout - (now - self._probe_started)))
+
+    def release_probe(self, probe_id):
+        """Libera la prueba `probe_id` si terminó sin record_success/record_failure (no cambia el estado)."""
+        with self._lock:
+            if probe_id is not None and probe_id == self._probe_id and self._probe_in_flight:
+                self._probe_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != "closed":
+                print(f"[breaker] {self.host}: circuito cerrado (origen recuperado)")
+            self.state = "closed"
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probe_in_flight = False
+            if self.state == "half_open" or (self.state == "closed" and self.failures >= self.failure_threshold):
+                self.state = "open"
+                self.opened_at = time.monotonic()
+                print(f"[breaker] {self.host}: circuito ABIERTO tras {self.failures} fallos consecutivos")
+
+    def snapshot(self):
+        with self._lock:
+            return {"state": self.state, "failures": self.failures}
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(url_or_host):
+    """Breaker compartido para el host de la URL (o el host indicado)."""
+    host = urlparse(url_or_host).netloc or url_or_host
+    with _breakers_lock:
+        breaker = _breakers.get(host)
+        if breaker is None:
+            breaker = _breakers[host] = CircuitBreaker(host)
+        return breaker
+
+
+def breakers_snapshot():
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {b.host: b.snapshot() for b in breakers}
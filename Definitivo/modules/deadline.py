@@ -0,0 +1,58 @@
+# modules/deadline.py
+"""
+Presupuesto de tiempo por petición para el análisis de un partido.
+
+Cada etapa (carga de la página H2H, H2H Col3, estadísticas de progresión...) tenía
+su propio timeout fijo y ningún límite global, así que la suma podía superar el
+timeout de gunicorn (180 s). Un Deadline se crea al recibir la petición y se pasa
+a los fetchers: cada espera usa min(timeout propio, tiempo restante) y las etapas
+que no caben en lo que queda se omiten y se anotan en `skipped`, para devolver un
+resultado parcial (marcado con `partial`) en lugar de un 502.
+
+Configuración por variable de entorno:
+    ANALYSIS_DEADLINE_SECONDS=N    (por defecto 150, por debajo de los 180 s de gunicorn)
+"""
+import os
+import threading
+import time
+
+ANALYSIS_DEADLINE_SECONDS = float(os.environ.get("ANALYSIS_DEADLINE_SECONDS", "150"))
+
+
+class Deadline:
+    def __init__(self, budget_seconds=None):
+        self.budget = ANALYSIS_DEADLINE_SECONDS if budget_seconds is None else float(budget_seconds)
+        self.started = time.monotonic()
+        self.expires_at = self.started + self.budget
+        self.skipped = []
+        self._lock = threading.Lock()
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def can_afford(self, seconds):
+        """True si quedan al menos `seconds` segundos de presupuesto."""
+        return self.remaining() >= seconds
+
+    def timeout(self, cap, floor=0.1):
+        """Timeout para una espera: el propio de la etapa, recortado al tiempo restante."""
+        return max(floor, min(cap, self.remaining()))
+
+    def skip(self, stage):
+        """Anota una etapa omitida (o cortada) por falta de tiempo."""
+        with self._lock:
+            if stage not in self.skipped:
+                self.skipped.append(stage)
+
+    @property
+    def partial(self):
+        return bool(self.skipped)
+
+    def __repr__(self):
+        return f"Deadline(budget={self.budget:.1f}s, remaining={self.remaining():.1f}s, skipped={self.skipped})"
@@ -6,10 +6,12 @@ from modules.funciones_resumen import generar_resumen_rendimiento_reciente
 from modules.funciones_auxiliares import _calcular_estadisticas_contra_rival, _analizar_over_under, _analizar_ah_cubierto, _analizar_desempeno_casa_fuera
 import time
 import re
+import html as html_lib
 import math
+import threading
 from bs4 import BeautifulSoup
 import pandas as pd
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, Future, TimeoutError as FutureTimeoutError
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options as ChromeOptions
 from selenium.webdriver.common.by import By
@@ -20,9 +22,22 @@ import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 from modules.utils import parse_ah_to_number_of, format_ah_as_decimal_string_of, check_handicap_cover, check_goal_line_cover, get_match_details_from_row_of
+from modules import parse_pool
+from modules.shared_fetch import fetch as shared_fetch
+from modules.deadline import Deadline
+from modules.analysis_model import AnalysisResult
+from modules.circuit_breaker import get_breaker, CircuitOpenError
+from modules.analysis_cache import fetch_fingerprint
+from modules.team_history import extract_history_rows, get_team_history_store
+from modules.opponent_index import get_opponent_index
+from modules.team_identity import get_team_registry, row_team_ids, same_team, team_arg
+from modules import html_archive
 
 BASE_URL_OF = "https://live18.nowgoal25.com"
 SELENIUM_TIMEOUT_SECONDS_OF = 10
+# Presupuesto mínimo (s) para intentar cada etapa secundaria; si no queda, se omite
+COL3_MIN_BUDGET_SECONDS = 12
+STATS_MIN_BUDGET_SECONDS = 3
 PLACEHOLDER_NODATA = "*(No disponible)*"
 
 def parse_ah_to_number_of(ah_line_str: str):
@@ -256,11 +271,15 @@ def get_match_details_from_row_of(row_element, score_class_selector='score', sou
         ah_cell = cells[ah_idx]
         ah_line_raw = (ah_cell.get('data-o') or ah_cell.text).strip()
         ah_line_fmt = format_ah_as_decimal_string_of(ah_line_raw) if ah_line_raw not in ['', '-'] else '-'
+        home_id, away_id = row_team_ids(row_element)
+        get_team_registry().learn(home_id, home)
+        get_team_registry().learn(away_id, away)
         return {
             'date': date_txt, 'home': home, 'away': away, 'score': score_fmt,
             'score_raw': score_raw, 'ahLine': ah_line_fmt, 'ahLine_raw': ah_line_raw or '-',
             'matchIndex': row_element.get('index'), 'vs': row_element.get('vs'),
-            'league_id_hist': row_element.get('name')
+            'league_id_hist': row_element.get('name'),
+            'home_id': home_id, 'away_id': away_id
         }
     except Exception:
         return None
@@ -281,17 +300,46 @@ def _colorear_stats(val1_str, val2_str):
         # Si no se pueden convertir a números (ej. texto), devolver los originales
         return val1_str, val2_str
 
-def get_match_progression_stats_data(match_id: str) -> pd.DataFrame | None:
+_http_session = None
+_http_session_lock = threading.Lock()
+
+def get_http_session() -> requests.Session:
+    """Sesión HTTP compartida (keep-alive y pool de conexiones) para todas las peticiones ligeras."""
+    global _http_session
+    if html_archive.replaying():
+        return html_archive.ReplaySession()
+    if _http_session is None:
+        with _http_session_lock:
+            if _http_session is None:
+                # En modo record cada GET queda archivado bajo la URL pedida (la que busca el replay)
+                recording = html_archive.HTML_ARCHIVE_MODE == "record"
+                session = html_archive.RecordingSession() if recording else requests.Session()
+                retries = Retry(total=3, backoff_factor=0.5, status_forcelist=[500, 502, 503, 504])
+                adapter = HTTPAdapter(max_retries=retries, pool_connections=4, pool_maxsize=32)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers.update({"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 Chrome/116.0.0.0 Safari/537.36"})
+                _http_session = session
+    return _http_session
+
+def get_match_progression_stats_data(match_id: str, deadline: Deadline | None = None) -> pd.DataFrame | None:
     if not match_id or not match_id.isdigit(): return None
+    if deadline is not None and not deadline.can_afford(STATS_MIN_BUDGET_SECONDS):
+        deadline.skip("stats")
+        return None
     url = f"{BASE_URL_OF}/match/live-{match_id}"
+    breaker = get_breaker(BASE_URL_OF)
     try:
-        session = requests.Session()
-        retries = Retry(total=3, backoff_factor=0.5, status_forcelist=[500, 502, 503, 504])
-        adapter = HTTPAdapter(max_retries=retries)
-        session.mount("https://", adapter)
-        session.mount("http://", adapter)
-        session.headers.update({"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 Chrome/116.0.0.0 Safari/537.36"})
-        response = session.get(url, timeout=10)
+        probe = breaker.before_call()
+    except CircuitOpenError:
+        return None
+    try:
+        session = get_http_session()
+        response = session.get(url, timeout=deadline.timeout(10) if deadline else 10)
+        if response.status_code >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
         response.raise_for_status()
         soup = BeautifulSoup(response.text, 'lxml')
         
@@ -343,8 +391,13 @@ def get_match_progression_stats_data(match_id: str) -> pd.DataFrame | None:
         
         df = pd.DataFrame(table_rows)
         return df.set_index("Estadistica_EN") if not df.empty else df
+    except (requests.ConnectionError, requests.Timeout, requests.exceptions.RetryError):
+        breaker.record_failure()
+        return None
     except requests.RequestException:
         return None
+    finally:
+        breaker.release_probe(probe)
 
 def get_rival_a_for_original_h2h_of(soup, league_id=None):
     if not soup or not (table := soup.find("table", id="table_v1")): return None, None, None
@@ -368,21 +421,75 @@ def get_rival_b_for_original_h2h_of(soup, league_id=None):
                 return key_id, rival_id_match.group(1), rival_tag.text.strip()
     return None, None, None
 
-def get_h2h_details_for_original_logic_of(driver, key_match_id, rival_a_id, rival_b_id, rival_a_name="Rival A", rival_b_name="Rival B"):
-    if not all([driver, key_match_id, rival_a_id, rival_b_id]):
+# Extracción de los rivales del H2H Col3 con expresiones regulares sobre el HTML crudo: se hace en el
+# proceso del servidor antes de que termine (o empiece) el parseo completo, así que no se usa BeautifulSoup
+_COL3_LEAGUE_RE = re.compile(r"sclassId:\s*parseInt\('(\d+)'\)")
+_COL3_ROW_RE = re.compile(r"<tr\b([^>]*)>(.*?)</tr>", re.S)
+_COL3_ATTR_RE = re.compile(r'([\w-]+)="([^"]*)"')
+_COL3_LINK_RE = re.compile(r'<a\b[^>]*\bonclick="([^"]*)"[^>]*>(.*?)</a>', re.S)
+_COL3_TAG_RE = re.compile(r"<[^>]+>")
+
+def _rival_col3_desde_html(html_completo, table_id, link_pos, league_id):
+    """Como get_rival_a/b_for_original_h2h_of: (key_id, rival_id, rival_name) del primer partido vs=1 de la liga."""
+    table = re.search(rf'<table\b[^>]*\bid="{table_id}".*?</table>', html_completo, re.S)
+    if not table:
+        return None, None, None
+    row_id_re = re.compile(rf"tr{table_id[-1]}_\d+")
+    for row_attrs, row_html in _COL3_ROW_RE.findall(table.group(0)):
+        attrs = dict(_COL3_ATTR_RE.findall(row_attrs))
+        if not row_id_re.fullmatch(attrs.get("id", "")):
+            continue
+        if league_id and attrs.get("name") != str(league_id):
+            continue
+        if attrs.get("vs") == "1" and (key_id := attrs.get("index")):
+            links = _COL3_LINK_RE.findall(row_html)
+            if len(links) > link_pos and (rival_id_match := re.search(r"team\((\d+)\)", links[link_pos][0])):
+                return key_id, rival_id_match.group(1), html_lib.unescape(_COL3_TAG_RE.sub("", links[link_pos][1])).strip()
+    return None, None, None
+
+def get_rivales_col3_desde_html(html_completo):
+    """(rival_a, rival_b) del H2H Col3 a partir del HTML crudo (tablas de historial y liga de _matchInfo)."""
+    league_match = _COL3_LEAGUE_RE.search(html_completo)
+    league_id = league_match.group(1) if league_match else None
+    return (_rival_col3_desde_html(html_completo, "table_v1", 1, league_id),
+            _rival_col3_desde_html(html_completo, "table_v2", 0, league_id))
+
+def get_h2h_details_for_original_logic_of(driver, key_match_id, rival_a_id, rival_b_id, rival_a_name="Rival A", rival_b_name="Rival B", deadline=None):
+    if not all([driver or html_archive.replaying(), key_match_id, rival_a_id, rival_b_id]):
         return {"status": "error", "resultado": "N/A (Datos incompletos para H2H)"}
+    if deadline is not None and not deadline.can_afford(COL3_MIN_BUDGET_SECONDS):
+        deadline.skip("h2h_col3")
+        return {"status": "skipped", "resultado": "N/A (Omitido por falta de tiempo)"}
     url = f"{BASE_URL_OF}/match/h2h-{key_match_id}"
+    wait_for = deadline.timeout if deadline else (lambda cap: cap)
     try:
-        driver.get(url)
-        WebDriverWait(driver, SELENIUM_TIMEOUT_SECONDS_OF).until(EC.presence_of_element_located((By.ID, "table_v2")))
-        try:
-            select = Select(WebDriverWait(driver, 5).until(EC.presence_of_element_located((By.ID, "hSelect_2"))))
-            select.select_by_value("8")
-            time.sleep(0.5)
-        except TimeoutException: pass
-        soup = BeautifulSoup(driver.page_source, "lxml")
+        if html_archive.replaying():
+            if (html := html_archive.replay_page(url, "h2h_col3", "h2h")) is None:
+                return {"status": "error", "resultado": "N/A (H2H Col3 no está en el archivo HTML)"}
+            soup = BeautifulSoup(html, "lxml")
+        else:
+            soup = _cargar_h2h_col3(driver, url, wait_for, deadline)
     except Exception as e:
         return {"status": "error", "resultado": f"N/A (Error Selenium en H2H Col3: {type(e).__name__})"}
+    _guardar_historial(extract_history_rows(soup))
+    return _h2h_col3_desde_soup(soup, rival_a_id, rival_b_id, rival_a_name, rival_b_name)
+
+def _cargar_h2h_col3(driver, url, wait_for, deadline=None):
+    """Carga con Selenium la página H2H del partido clave (historial 'All' en hSelect_2)."""
+    if deadline is not None:
+        driver.set_page_load_timeout(deadline.timeout(30))
+    driver.get(url)
+    WebDriverWait(driver, wait_for(SELENIUM_TIMEOUT_SECONDS_OF)).until(EC.presence_of_element_located((By.ID, "table_v2")))
+    try:
+        select = Select(WebDriverWait(driver, wait_for(5)).until(EC.presence_of_element_located((By.ID, "hSelect_2"))))
+        select.select_by_value("8")
+        time.sleep(0.5)
+    except TimeoutException: pass
+    html = driver.page_source
+    html_archive.archive_page(url, html, "h2h_col3")
+    return BeautifulSoup(html, "lxml")
+
+def _h2h_col3_desde_soup(soup, rival_a_id, rival_b_id, rival_a_name, rival_b_name):
     if not (table := soup.find("table", id="table_v2")):
         return {"status": "error", "resultado": "N/A (Tabla H2H Col3 no encontrada)"}
     for row in table.find_all("tr", id=re.compile(r"tr2_\d+")):
@@ -407,6 +514,17 @@ def get_h2h_details_for_original_logic_of(driver, key_match_id, rival_a_id, riva
             }
     return {"status": "not_found", "resultado": f"H2H directo no encontrado para {rival_a_name} vs {rival_b_name}."}
 
+def _guardar_historial(extracted):
+    """Añade al almacén de historial por equipo las filas nuevas (no interrumpe el análisis si falla)."""
+    store = get_team_history_store()
+    if store is None:
+        return 0
+    try:
+        return store.ingest(extracted)
+    except Exception as e:
+        print(f"[team_history] No se pudo actualizar el historial: {e}")
+        return 0
+
 def get_team_league_info_from_script_of(soup):
     script_tag = soup.find("script", string=re.compile(r"var _matchInfo = "))
     if not (script_tag and script_tag.string): return (None,) * 3 + ("N/A",) * 3
@@ -426,18 +544,18 @@ def _parse_date_ddmmyyyy(d: str) -> tuple:
     m = re.search(r'(\d{2})-(\d{2})-(\d{4})', d or '')
     return (int(m.group(3)), int(m.group(2)), int(m.group(1))) if m else (1900, 1, 1)
 
-def extract_last_match_in_league_of(soup, table_id, team_name, league_id, is_home_game):
+def extract_last_match_in_league_of(soup, table_id, team_name, league_id, is_home_game, team_id=None):
     if not soup or not (table := soup.find("table", id=table_id)): return None
     candidate_matches = []
     score_selector = 'fscore_1' if is_home_game else 'fscore_2'
+    aliases = get_opponent_index(soup).aliases
     for row in table.find_all("tr", id=re.compile(rf"tr{table_id[-1]}_\d+")):
         if not (details := get_match_details_from_row_of(row, score_class_selector=score_selector, source_table_type='hist')):
             continue
         if league_id and details.get("league_id_hist") != str(league_id):
             continue
-        is_team_home = team_name.lower() in details.get('home', '').lower()
-        is_team_away = team_name.lower() in details.get('away', '').lower()
-        if (is_home_game and is_team_home) or (not is_home_game and is_team_away):
+        # Por ID de equipo (modules/team_identity.py): "FC X" no coincide con "FC X U21"
+        if same_team(details, 'home' if is_home_game else 'away', team_id, team_name, aliases):
             candidate_matches.append(details)
     if not candidate_matches: return None
     candidate_matches.sort(key=lambda x: _parse_date_ddmmyyyy(x.get('date', '')), reverse=True)
@@ -445,7 +563,8 @@ def extract_last_match_in_league_of(soup, table_id, team_name, league_id, is_hom
     return {
         "date": last_match.get('date', 'N/A'), "home_team": last_match.get('home'),
         "away_team": last_match.get('away'), "score": last_match.get('score_raw', 'N/A').replace('-', ':'),
-        "handicap_line_raw": last_match.get('ahLine_raw', 'N/A'), "match_id": last_match.get('matchIndex')
+        "handicap_line_raw": last_match.get('ahLine_raw', 'N/A'), "match_id": last_match.get('matchIndex'),
+        "home_id": last_match.get('home_id'), "away_id": last_match.get('away_id')
     }
 
 def extract_bet365_initial_odds_of(soup):
@@ -555,7 +674,7 @@ def extract_over_under_stats_from_div_of(soup, team_type: str):
         return default_stats
     return default_stats
 
-def extract_h2h_data_of(soup, home_name, away_name, league_id=None):
+def extract_h2h_data_of(soup, home_name, away_name, league_id=None, home_id=None, away_id=None):
     results = {'ah1': '-', 'res1': '?:?', 'res1_raw': '?-?', 'match1_id': None, 'ah6': '-', 'res6': '?:?', 'res6_raw': '?-?', 'match6_id': None, 'h2h_gen_home': "Local (H2H Gen)", 'h2h_gen_away': "Visitante (H2H Gen)"}
     if not soup or not home_name or not away_name or not (h2h_table := soup.find("table", id="table_v3")): return results
     all_matches = []
@@ -567,23 +686,22 @@ def extract_h2h_data_of(soup, home_name, away_name, league_id=None):
     all_matches.sort(key=lambda x: _parse_date_ddmmyyyy(x.get('date', '')), reverse=True)
     most_recent = all_matches[0]
     results.update({'ah6': most_recent.get('ahLine', '-'), 'res6': most_recent.get('score', '?:?'), 'res6_raw': most_recent.get('score_raw', '?-?'), 'match6_id': most_recent.get('matchIndex'), 'h2h_gen_home': most_recent.get('home'), 'h2h_gen_away': most_recent.get('away')})
+    aliases = get_opponent_index(soup).aliases
     for d in all_matches:
-        if d['home'].lower() == home_name.lower() and d['away'].lower() == away_name.lower():
+        if same_team(d, 'home', home_id, home_name, aliases) and same_team(d, 'away', away_id, away_name, aliases):
             results.update({'ah1': d.get('ahLine', '-'), 'res1': d.get('score', '?:?'), 'res1_raw': d.get('score_raw', '?-?'), 'match1_id': d.get('matchIndex')})
             break
     return results
 
-def extract_comparative_match_of(soup, table_id, main_team, opponent, league_id, is_home_table):
-    if not opponent or opponent == "N/A" or not main_team or not (table := soup.find("table", id=table_id)): return None
-    score_selector = 'fscore_1' if is_home_table else 'fscore_2'
-    for row in table.find_all("tr", id=re.compile(rf"tr{table_id[-1]}_\d+")):
-        if not (details := get_match_details_from_row_of(row, score_class_selector=score_selector, source_table_type='hist')): continue
-        if league_id and details.get('league_id_hist') and details.get('league_id_hist') != str(league_id): continue
-        h, a = details.get('home','').lower(), details.get('away','').lower()
-        main, opp = main_team.lower(), opponent.lower()
-        if (main == h and opp == a) or (main == a and opp == h):
-            return {"score": details.get('score', '?:?'), "ah_line": details.get('ahLine', '-'), "localia": 'H' if main == h else 'A', "home_team": details.get('home'), "away_team": details.get('away'), "match_id": details.get('matchIndex')}
-    return None
+def extract_comparative_match_of(soup, table_id, main_team, opponent, league_id, is_home_table, main_team_id=None, opponent_id=None):
+    if not opponent or opponent == "N/A" or not main_team: return None
+    # Primer partido (el más reciente) entre ambos en la tabla, vía el índice de rivales (por ID si se conoce)
+    index = get_opponent_index(soup)
+    matches = index.pair_rows(table_id, team_arg(main_team_id, main_team), team_arg(opponent_id, opponent), league_id)
+    if not matches: return None
+    details = matches[0]
+    localia = 'H' if same_team(details, 'home', main_team_id, main_team, index.aliases) else 'A'
+    return {"score": details.get('score', '?:?'), "ah_line": details.get('ahLine', '-'), "localia": localia, "home_team": details.get('home'), "away_team": details.get('away'), "match_id": details.get('matchIndex')}
 
 def extract_indirect_comparison_data(soup):
     """
@@ -645,16 +763,177 @@ def extract_indirect_comparison_data(soup):
 
     return data
 
+# --- EXTRACCIÓN DE SECCIONES DE LA PÁGINA H2H (SOLO CPU) ---
+
+def _ejecutar_inline(fn, *args):
+    """Ejecuta fn en el hilo actual y devuelve un Future ya resuelto."""
+    future = Future()
+    try:
+        future.set_result(fn(*args))
+    except BaseException as e:
+        future.set_exception(e)
+    return future
+
+def extraer_secciones_h2h(soup_completo, executor=None):
+    """
+    Extrae todas las secciones que dependen únicamente del HTML de la página H2H
+    (clasificación, O/U, cuotas, H2H, últimos partidos, comparativas y análisis).
+    No hace peticiones de red, por lo que puede ejecutarse en otro proceso.
+    Si se pasa un executor, las extracciones independientes se envían a él.
+    """
+    submit = executor.submit if executor else _ejecutar_inline
+
+    home_id, away_id, league_id, home_name, away_name, league_name = get_team_league_info_from_script_of(soup_completo)
+    # Caché ID -> nombre del proceso; los nombres se resuelven a ID solo con los alias de esta página
+    get_team_registry().learn(home_id, home_name)
+    get_team_registry().learn(away_id, away_name)
+    secciones = {
+        "home_id": home_id, "away_id": away_id, "league_id": league_id,
+        "home_name": home_name, "away_name": away_name, "league_name": league_name
+    }
+
+    future_home_standings = submit(extract_standings_data_from_h2h_page_of, soup_completo, home_name)
+    future_away_standings = submit(extract_standings_data_from_h2h_page_of, soup_completo, away_name)
+    future_home_ou = submit(extract_over_under_stats_from_div_of, soup_completo, 'home')
+    future_away_ou = submit(extract_over_under_stats_from_div_of, soup_completo, 'away')
+    future_main_odds = submit(extract_bet365_initial_odds_of, soup_completo)
+    future_h2h_data = submit(extract_h2h_data_of, soup_completo, home_name, away_name, None, home_id, away_id)
+    future_last_home = submit(extract_last_match_in_league_of, soup_completo, "table_v1", home_name, league_id, True, home_id)
+    future_last_away = submit(extract_last_match_in_league_of, soup_completo, "table_v2", away_name, league_id, False, away_id)
+
+    secciones["home_standings"] = future_home_standings.result()
+    secciones["away_standings"] = future_away_standings.result()
+    secciones["home_ou_stats"] = future_home_ou.result()
+    secciones["away_ou_stats"] = future_away_ou.result()
+    main_match_odds_data = secciones["main_odds"] = future_main_odds.result()
+    h2h_data = secciones["h2h_data"] = future_h2h_data.result()
+    last_home_match = secciones["last_home"] = future_last_home.result()
+    last_away_match = secciones["last_away"] = future_last_away.result()
+
+    # --- Comparativas (dependen de los resultados anteriores) ---
+    secciones["comp_L_vs_UV_A"] = extract_comparative_match_of(soup_completo, "table_v1", home_name, (last_away_match or {}).get('home_team'), league_id, True,
+                                                               home_id, (last_away_match or {}).get('home_id'))
+    secciones["comp_V_vs_UL_H"] = extract_comparative_match_of(soup_completo, "table_v2", away_name, (last_home_match or {}).get('away_team'), league_id, False,
+                                                               away_id, (last_home_match or {}).get('away_id'))
+
+    # --- Análisis de Mercado y Comparativas Indirectas ---
+    secciones["market_analysis_html"] = generar_analisis_completo_mercado(main_match_odds_data, h2h_data, home_name, away_name)
+    secciones["advanced_analysis_html"] = generar_analisis_comparativas_indirectas(extract_indirect_comparison_data(soup_completo))
+
+    # --- ANÁLISIS RECIENTE CON HANDICAP ---
+    current_ah_line = parse_ah_to_number_of(main_match_odds_data.get('ah_linea_raw', '0'))
+    secciones["current_ah_line"] = current_ah_line
+    secciones["rendimiento_local_handicap"] = analizar_rendimiento_reciente_con_handicap(soup_completo, home_name, True, home_id)
+    secciones["rendimiento_visitante_handicap"] = analizar_rendimiento_reciente_con_handicap(soup_completo, away_name, False, away_id)
+    if current_ah_line is not None:
+        secciones["comparacion_lineas_local"] = comparar_lineas_handicap_recientes(soup_completo, home_name, current_ah_line, True, home_id)
+        secciones["comparacion_lineas_visitante"] = comparar_lineas_handicap_recientes(soup_completo, away_name, current_ah_line, False, away_id)
+
+    # --- ANÁLISIS DE RIVALES COMUNES Y CONTRA RIVAL DEL RIVAL ---
+    secciones["rivales_comunes"] = analizar_rivales_comunes(soup_completo, home_name, away_name, home_id, away_id)
+    rival_local_rival = (last_away_match or {}).get('home_team', 'N/A')
+    rival_visitante_rival = (last_home_match or {}).get('away_team', 'N/A')
+    if rival_local_rival != 'N/A' and rival_visitante_rival != 'N/A':
+        secciones["analisis_contra_rival_del_rival"] = analizar_contra_rival_del_rival(
+            soup_completo, home_name, away_name, rival_local_rival, rival_visitante_rival,
+            home_id, away_id, (last_away_match or {}).get('home_id'), (last_home_match or {}).get('away_id')
+        )
+
+    # --- RESUMEN DE RENDIMIENTO RECIENTE Y COMPARATIVAS INDIRECTAS ---
+    secciones["resumen_rendimiento_reciente"] = generar_resumen_rendimiento_reciente(soup_completo, home_name, away_name, current_ah_line)
+
+    # Filas de historial por ID de equipo para el almacén incremental (modules/team_history.py)
+    secciones["history_rows"] = extract_history_rows(soup_completo)
+    return secciones
+
+def extraer_secciones_h2h_desde_html(html):
+    """Punto de entrada para el pool de procesos: parsea el HTML y extrae las secciones."""
+    return extraer_secciones_h2h(BeautifulSoup(html, "lxml"))
+
 # --- FUNCIÓN PRINCIPAL DE EXTRACCIÓN ---
 
-def obtener_datos_completos_partido(match_id: str):
+_MARCADORES_BLOQUEO = ("Just a moment", "Attention Required", "cf-browser-verification", "502 Bad Gateway",
+                       "503 Service", "504 Gateway")
+
+def _clasificar_fallo_carga(page_source):
+    """
+    Tipo de error cuando la tabla principal no aparece: 'not_found' si el origen
+    respondió con una página sin partido, 'load_error' si el partido existe pero
+    no terminó de cargar y 'upstream_error' si el origen está caído o bloqueando.
+    """
+    if not page_source or len(page_source) < 200 or any(m in page_source for m in _MARCADORES_BLOQUEO):
+        return "upstream_error"
+    if "_matchInfo" in page_source:
+        return "load_error"
+    return "not_found"
+
+def _cargar_html_principal(driver, match_id, main_page_url, breaker, deadline):
+    """Carga con Selenium la página H2H principal con los historiales en 'All' -> (html, None) o (None, AnalysisResult con error)."""
+    try:
+        driver.set_page_load_timeout(deadline.timeout(30))
+        driver.get(main_page_url)
+        WebDriverWait(driver, deadline.timeout(15)).until(EC.presence_of_element_located((By.ID, "table_v1")))
+    except WebDriverException as e:
+        try:
+            page_source = driver.page_source
+        except WebDriverException:
+            page_source = ""
+        kind = _clasificar_fallo_carga(page_source)
+        if kind == "upstream_error":
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        mensajes = {"not_found": "Partido no encontrado en el origen.",
+                    "load_error": "La página del partido no terminó de cargar a tiempo.",
+                    "upstream_error": "El origen no responde correctamente."}
+        return None, AnalysisResult.failed(match_id, f"{mensajes[kind]} ({type(e).__name__})", kind)
+    breaker.record_success()
+    for select_id in ["hSelect_1", "hSelect_2", "hSelect_3"]:
+        if not deadline.can_afford(COL3_MIN_BUDGET_SECONDS):
+            deadline.skip("selectores_historial")
+            break
+        try:
+            Select(WebDriverWait(driver, 3).until(EC.presence_of_element_located((By.ID, select_id)))).select_by_value("8")
+            # Usamos una espera explícita más eficiente en lugar de time.sleep
+            WebDriverWait(driver, 1).until(EC.text_to_be_present_in_element((By.ID, select_id), "8"))
+        except TimeoutException:
+            continue
+    return driver.page_source, None
+
+def obtener_datos_completos_partido(match_id: str, shared_fetches=None, deadline: Deadline | None = None):
+    """
+    Devuelve el análisis como diccionario con las claves que usa la plantilla HTML
+    (o {"error": ...}). Ver obtener_resultado_analisis para el resultado tipado.
+    """
+    return obtener_resultado_analisis(match_id, shared_fetches, deadline).to_template_data()
+
+def obtener_resultado_analisis(match_id: str, shared_fetches=None, deadline: Deadline | None = None) -> AnalysisResult:
     """
     Función principal que orquesta todo el scraping y análisis para un ID de partido.
-    Devuelve un diccionario con todos los datos necesarios para la plantilla HTML.
+    Devuelve un AnalysisResult serializable (con `error` relleno si algo falla).
+    shared_fetches (SharedFetches, opcional) permite compartir las páginas secundarias
+    (estadísticas de progresión, H2H Col3) entre varios análisis de un mismo lote.
+    deadline (Deadline, opcional) acota el tiempo total; las etapas secundarias que no
+    caben se omiten y el resultado lleva partial=True y partial_stages con su lista.
     """
     if not match_id or not match_id.isdigit():
-        return {"error": "ID de partido inválido."}
+        return AnalysisResult.failed(match_id, "ID de partido inválido.", "invalid")
+    deadline = deadline or Deadline()
+    breaker = get_breaker(BASE_URL_OF)
+    try:
+        probe = breaker.before_call()
+    except CircuitOpenError as e:
+        return AnalysisResult.failed(match_id, str(e), "upstream_unavailable")
+    try:
+        return _analizar_partido(match_id, shared_fetches, deadline, breaker)
+    finally:
+        # Si era la llamada de prueba del breaker y no llegó a dar veredicto (Chrome no arrancó,
+        # modo replay, error de parseo...), se libera para que el circuito no se quede bloqueado
+        breaker.release_probe(probe)
+
 
+def _analizar_partido(match_id, shared_fetches, deadline, breaker):
+    """Cuerpo de obtener_resultado_analisis, ya admitido por el circuit breaker."""
     # --- Inicialización de Selenium ---
     options = ChromeOptions()
     options.add_argument("--headless")
@@ -663,173 +942,147 @@ def obtener_datos_completos_partido(match_id: str):
     options.add_argument("--disable-gpu")
     options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 Chrome/116.0.0.0 Safari/537.36")
     options.add_argument('--blink-settings=imagesEnabled=false')
-    driver = webdriver.Chrome(options=options)
+    # En modo replay del archivo HTML no se abre Chrome: las páginas salen del archivo
+    driver = None if html_archive.replaying() else webdriver.Chrome(options=options)
     
     main_page_url = f"{BASE_URL_OF}/match/h2h-{match_id}"
     datos = {"match_id": match_id}
+    executor = ThreadPoolExecutor(max_workers=8)
+    # Huella para la caché de análisis con la misma descarga ligera (requests) con la que se revalida
+    # después, en paralelo con Selenium: la página renderizada puede diferir del HTML crudo
+    future_huella = executor.submit(fetch_fingerprint, match_id)
 
     try:
-        # --- Carga y Parseo de la Página Principal ---
-        driver.get(main_page_url)
-        WebDriverWait(driver, 15).until(EC.presence_of_element_located((By.ID, "table_v1")))
-        for select_id in ["hSelect_1", "hSelect_2", "hSelect_3"]:
-            try:
-                Select(WebDriverWait(driver, 3).until(EC.presence_of_element_located((By.ID, select_id)))).select_by_value("8")
-                # Usamos una espera explícita más eficiente en lugar de time.sleep
-                WebDriverWait(driver, 1).until(EC.text_to_be_present_in_element((By.ID, select_id), "8"))
-            except TimeoutException:
-                continue
-        soup_completo = BeautifulSoup(driver.page_source, "lxml")
-
-        # --- Extracción de Datos Primarios ---
-        home_id, away_id, league_id, home_name, away_name, league_name = get_team_league_info_from_script_of(soup_completo)
-        datos.update({"home_name": home_name, "away_name": away_name, "league_name": league_name})
+        # --- Carga de la Página Principal (sin ella no hay análisis posible) ---
+        if driver is None:
+            html_completo = html_archive.replay_page(main_page_url, "h2h")
+            if html_completo is None:
+                return AnalysisResult.failed(match_id, "La página del partido no está en el archivo HTML.", "not_found")
+        else:
+            html_completo, fallo = _cargar_html_principal(driver, match_id, main_page_url, breaker, deadline)
+            if fallo is not None:
+                return fallo
+            html_archive.archive_page(main_page_url, html_completo, "h2h")
 
         # --- Recopilación de todos los datos en paralelo (donde sea posible) ---
-        with ThreadPoolExecutor(max_workers=8) as executor:
-            # Tareas síncronas (dependen del soup_completo)
-            future_home_standings = executor.submit(extract_standings_data_from_h2h_page_of, soup_completo, home_name)
-            future_away_standings = executor.submit(extract_standings_data_from_h2h_page_of, soup_completo, away_name)
-            future_home_ou = executor.submit(extract_over_under_stats_from_div_of, soup_completo, 'home')
-            future_away_ou = executor.submit(extract_over_under_stats_from_div_of, soup_completo, 'away')
-            future_main_odds = executor.submit(extract_bet365_initial_odds_of, soup_completo)
-            future_h2h_data = executor.submit(extract_h2h_data_of, soup_completo, home_name, away_name, None)
-            future_last_home = executor.submit(extract_last_match_in_league_of, soup_completo, "table_v1", home_name, league_id, True)
-            future_last_away = executor.submit(extract_last_match_in_league_of, soup_completo, "table_v2", away_name, league_id, False)
-            
-            # Tarea H2H Col3 (requiere una nueva llamada de Selenium)
-            key_id_a, rival_a_id, rival_a_name = get_rival_a_for_original_h2h_of(soup_completo, league_id)
-            _, rival_b_id, rival_b_name = get_rival_b_for_original_h2h_of(soup_completo, league_id)
-            # Usar el driver principal ya creado en lugar de crear uno nuevo
-            future_h2h_col3 = executor.submit(get_h2h_details_for_original_logic_of, driver, key_id_a, rival_a_id, rival_b_id, rival_a_name, rival_b_name)
-            
-            # Obtener resultados
-            datos["home_standings"] = future_home_standings.result()
-            datos["away_standings"] = future_away_standings.result()
-            datos["home_ou_stats"] = future_home_ou.result()
-            datos["away_ou_stats"] = future_away_ou.result()
-            main_match_odds_data = future_main_odds.result()
-            h2h_data = future_h2h_data.result()
-            last_home_match = future_last_home.result()
-            last_away_match = future_last_away.result()
-            details_h2h_col3 = future_h2h_col3.result()
-
-            # --- Comparativas (dependen de los resultados anteriores) ---
-            comp_L_vs_UV_A = extract_comparative_match_of(soup_completo, "table_v1", home_name, (last_away_match or {}).get('home_team'), league_id, True)
-            comp_V_vs_UL_H = extract_comparative_match_of(soup_completo, "table_v2", away_name, (last_home_match or {}).get('away_team'), league_id, False)
-
-            # --- Generar Análisis de Mercado ---
-            datos["market_analysis_html"] = generar_analisis_completo_mercado(main_match_odds_data, h2h_data, home_name, away_name)
-
-            # --- Estructurar datos para la plantilla ---
-            datos["main_match_odds"] = {
-                "ah_linea": format_ah_as_decimal_string_of(main_match_odds_data.get('ah_linea_raw', '?')),
-                "goals_linea": format_ah_as_decimal_string_of(main_match_odds_data.get('goals_linea_raw', '?'))
-            }
-            
-            # Recopilar todos los IDs de partidos históricos para obtener sus estadísticas de progresión
-            match_ids_to_fetch_stats = {
-                'last_home': (last_home_match or {}).get('match_id'),
-                'last_away': (last_away_match or {}).get('match_id'),
-                'h2h_col3': (details_h2h_col3 or {}).get('match_id'),
-                'comp_L_vs_UV_A': (comp_L_vs_UV_A or {}).get('match_id'),
-                'comp_V_vs_UL_H': (comp_V_vs_UL_H or {}).get('match_id'),
-                'h2h_stadium': h2h_data.get('match1_id'),
-                'h2h_general': h2h_data.get('match6_id')
-            }
-            
-            # Obtener estadísticas de progresión en paralelo
-            stats_futures = {key: executor.submit(get_match_progression_stats_data, match_id)
+        # Parseo y extracción (CPU): en este proceso o en el pool de procesos según PARSE_MODE
+        future_secciones = None
+        if parse_pool.PARSE_MODE == "process":
+            future_secciones = parse_pool.submit_to_process_pool(extraer_secciones_h2h_desde_html, html_completo)
+
+        # Tarea H2H Col3 (requiere una nueva llamada de Selenium): se lanza antes del parseo y la extracción,
+        # que son la parte lenta de CPU, para que la navegación se solape con ellos. Los rivales salen del
+        # HTML crudo con expresiones regulares para no parsear la página en este proceso en modo 'process'
+        (key_id_a, rival_a_id, rival_a_name), (_, rival_b_id, rival_b_name) = get_rivales_col3_desde_html(html_completo)
+        # Usar el driver principal ya creado en lugar de crear uno nuevo
+        details_h2h_col3 = {"status": "skipped", "resultado": "N/A (Omitido por falta de tiempo)"}
+        future_h2h_col3 = None
+        # Si el historial de alguno de los rivales está sincronizado, el H2H sale del almacén sin navegar
+        store = get_team_history_store()
+        h2h_col3_store = store.find_h2h(rival_a_id, rival_b_id) if store is not None else None
+        if h2h_col3_store is not None:
+            details_h2h_col3 = h2h_col3_store
+        elif deadline.can_afford(COL3_MIN_BUDGET_SECONDS):
+            future_h2h_col3 = executor.submit(shared_fetch, shared_fetches, ('h2h_col3', key_id_a, rival_a_id, rival_b_id),
+                                              get_h2h_details_for_original_logic_of, driver, key_id_a, rival_a_id, rival_b_id,
+                                              rival_a_name, rival_b_name, deadline)
+        else:
+            deadline.skip("h2h_col3")
+
+        if future_secciones is not None:
+            try:
+                secciones = parse_pool.process_pool_result(future_secciones, extraer_secciones_h2h_desde_html, html_completo,
+                                                           timeout=deadline.timeout(60, floor=5))
+            except FutureTimeoutError:
+                # Pool saturado o lento: es transitorio, no un error de la página (no va a la caché negativa)
+                return AnalysisResult.failed(match_id, "El análisis de la página no terminó a tiempo.", "load_error")
+        else:
+            secciones = extraer_secciones_h2h(BeautifulSoup(html_completo, "lxml"), executor)
+
+        _guardar_historial(secciones.get("history_rows"))
+        home_name, away_name = secciones["home_name"], secciones["away_name"]
+        datos.update({"home_name": home_name, "away_name": away_name, "league_name": secciones["league_name"]})
+        for key in ("home_standings", "away_standings", "home_ou_stats", "away_ou_stats",
+                    "market_analysis_html", "advanced_analysis_html",
+                    "rendimiento_local_handicap", "rendimiento_visitante_handicap",
+                    "comparacion_lineas_local", "comparacion_lineas_visitante",
+                    "rivales_comunes", "analisis_contra_rival_del_rival", "resumen_rendimiento_reciente"):
+            if key in secciones:
+                datos[key] = secciones[key]
+
+        main_match_odds_data = secciones["main_odds"]
+        h2h_data = secciones["h2h_data"]
+        last_home_match = secciones["last_home"]
+        last_away_match = secciones["last_away"]
+        comp_L_vs_UV_A = secciones["comp_L_vs_UV_A"]
+        comp_V_vs_UL_H = secciones["comp_V_vs_UL_H"]
+
+        if future_h2h_col3 is not None:
+            try:
+                details_h2h_col3 = future_h2h_col3.result(timeout=deadline.remaining())
+            except FutureTimeoutError:
+                deadline.skip("h2h_col3")
+
+        # --- Estructurar datos para la plantilla ---
+        datos["main_match_odds"] = {
+            "ah_linea": format_ah_as_decimal_string_of(main_match_odds_data.get('ah_linea_raw', '?')),
+            "goals_linea": format_ah_as_decimal_string_of(main_match_odds_data.get('goals_linea_raw', '?'))
+        }
+        
+        # Recopilar todos los IDs de partidos históricos para obtener sus estadísticas de progresión
+        match_ids_to_fetch_stats = {
+            'last_home': (last_home_match or {}).get('match_id'),
+            'last_away': (last_away_match or {}).get('match_id'),
+            'h2h_col3': (details_h2h_col3 or {}).get('match_id'),
+            'comp_L_vs_UV_A': (comp_L_vs_UV_A or {}).get('match_id'),
+            'comp_V_vs_UL_H': (comp_V_vs_UL_H or {}).get('match_id'),
+            'h2h_stadium': h2h_data.get('match1_id'),
+            'h2h_general': h2h_data.get('match6_id')
+        }
+        
+        # Obtener estadísticas de progresión en paralelo (solo si queda presupuesto)
+        stats_futures = {}
+        if deadline.can_afford(STATS_MIN_BUDGET_SECONDS):
+            stats_futures = {key: executor.submit(shared_fetch, shared_fetches, ('stats', match_id), get_match_progression_stats_data, match_id, deadline)
                              for key, match_id in match_ids_to_fetch_stats.items() if match_id}
-                             
-            stats_results = {key: future.result() for key, future in stats_futures.items()}
-
-            # Empaquetar todo en el diccionario de datos final
-            datos['last_home_match'] = {'details': last_home_match, 'stats': stats_results.get('last_home')}
-            datos['last_away_match'] = {'details': last_away_match, 'stats': stats_results.get('last_away')}
-            datos['h2h_col3'] = {'details': details_h2h_col3, 'stats': stats_results.get('h2h_col3')}
-            datos['comp_L_vs_UV_A'] = {'details': comp_L_vs_UV_A, 'stats': stats_results.get('comp_L_vs_UV_A')}
-            datos['comp_V_vs_UL_H'] = {'details': comp_V_vs_UL_H, 'stats': stats_results.get('comp_V_vs_UL_H')}
-            datos['h2h_stadium'] = {'details': h2h_data, 'stats': stats_results.get('h2h_stadium')}
-            datos['h2h_general'] = {'details': h2h_data, 'stats': stats_results.get('h2h_general')}
-
-            # --- ANÁLISIS AVANZADO DE COMPARATIVAS INDIRECTAS ---
-            # Extraer los datos de las comparativas indirectas
-            indirect_comparison_data = extract_indirect_comparison_data(soup_completo)
-            
-            # Generar la nota de análisis
-            datos["advanced_analysis_html"] = generar_analisis_comparativas_indirectas(indirect_comparison_data)
-            
-            # --- ANÁLISIS RECIENTE CON HANDICAP ---
-            # Obtener la línea de handicap actual
-            current_ah_line = parse_ah_to_number_of(main_match_odds_data.get('ah_linea_raw', '0'))
-            
-            # Analizar rendimiento reciente con handicap para equipo local
-            rendimiento_local = analizar_rendimiento_reciente_con_handicap(soup_completo, home_name, True)
-            datos["rendimiento_local_handicap"] = rendimiento_local
-            
-            # Analizar rendimiento reciente con handicap para equipo visitante
-            rendimiento_visitante = analizar_rendimiento_reciente_con_handicap(soup_completo, away_name, False)
-            datos["rendimiento_visitante_handicap"] = rendimiento_visitante
-            
-            # Comparar líneas de handicap recientes con la línea actual
-            if current_ah_line is not None:
-                comparacion_local = comparar_lineas_handicap_recientes(soup_completo, home_name, current_ah_line, True)
-                datos["comparacion_lineas_local"] = comparacion_local
-                
-                comparacion_visitante = comparar_lineas_handicap_recientes(soup_completo, away_name, current_ah_line, False)
-                datos["comparacion_lineas_visitante"] = comparacion_visitante
-            
-            # --- ANÁLISIS DE RIVALES COMUNES ---
-            rivales_comunes = analizar_rivales_comunes(soup_completo, home_name, away_name)
-            datos["rivales_comunes"] = rivales_comunes
-            
-            # --- ANÁLISIS CONTRA RIVAL DEL RIVAL ---
-            # Obtener información de los rivales de los rivales
-            rival_local_rival = (last_away_match or {}).get('home_team', 'N/A')
-            rival_visitante_rival = (last_home_match or {}).get('away_team', 'N/A')
-            
-            if rival_local_rival != 'N/A' and rival_visitante_rival != 'N/A':
-                analisis_contra_rival = analizar_contra_rival_del_rival(
-                    soup_completo, home_name, away_name, rival_local_rival, rival_visitante_rival
-                )
-                datos["analisis_contra_rival_del_rival"] = analisis_contra_rival
-            
-            # --- ANÁLISIS DE RENDIMIENTO RECIENTE Y COMPARATIVAS INDIRECTAS ---
-            # Generar resumen gráfico de rendimiento reciente y comparativas indirectas
-            resumen_rendimiento = generar_resumen_rendimiento_reciente(soup_completo, home_name, away_name, current_ah_line)
-            datos["resumen_rendimiento_reciente"] = resumen_rendimiento
-            
-            # --- FUNCIONES AUXILIARES PARA LA PLANTILLA ---
-            # Añadir funciones auxiliares para el análisis gráfico
-            from modules.funciones_auxiliares import (
-                _calcular_estadisticas_contra_rival, 
-                _analizar_over_under, 
-                _analizar_ah_cubierto, 
-                _analizar_desempeno_casa_fuera,
-                _contar_victorias_h2h,
-                _analizar_over_under_h2h,
-                _contar_over_h2h,
-                _contar_victorias_h2h_general
-            )
-            
-            datos["_calcular_estadisticas_contra_rival"] = _calcular_estadisticas_contra_rival
-            datos["_analizar_over_under"] = _analizar_over_under
-            datos["_analizar_ah_cubierto"] = _analizar_ah_cubierto
-            datos["_analizar_desempeno_casa_fuera"] = _analizar_desempeno_casa_fuera
-            datos["_contar_victorias_h2h"] = _contar_victorias_h2h
-            datos["_analizar_over_under_h2h"] = _analizar_over_under_h2h
-            datos["_contar_over_h2h"] = _contar_over_h2h
-            datos["_contar_victorias_h2h_general"] = _contar_victorias_h2h_general
+        elif any(match_ids_to_fetch_stats.values()):
+            deadline.skip("stats")
+
+        stats_results = {}
+        for key, future in stats_futures.items():
+            try:
+                stats_results[key] = future.result(timeout=deadline.remaining())
+            except FutureTimeoutError:
+                deadline.skip("stats")
+                stats_results[key] = None
+
+        # Empaquetar todo en el diccionario de datos final
+        datos['last_home_match'] = {'details': last_home_match, 'stats': stats_results.get('last_home')}
+        datos['last_away_match'] = {'details': last_away_match, 'stats': stats_results.get('last_away')}
+        datos['h2h_col3'] = {'details': details_h2h_col3, 'stats': stats_results.get('h2h_col3')}
+        datos['comp_L_vs_UV_A'] = {'details': comp_L_vs_UV_A, 'stats': stats_results.get('comp_L_vs_UV_A')}
+        datos['comp_V_vs_UL_H'] = {'details': comp_V_vs_UL_H, 'stats': stats_results.get('comp_V_vs_UL_H')}
+        datos['h2h_stadium'] = {'details': h2h_data, 'stats': stats_results.get('h2h_stadium')}
+        datos['h2h_general'] = {'details': h2h_data, 'stats': stats_results.get('h2h_general')}
         
-        return datos
+        # Resultado parcial si alguna etapa se omitió o se cortó por el deadline
+        datos["partial"] = deadline.partial
+        datos["partial_stages"] = list(deadline.skipped)
+        try:
+            datos["fingerprint"], datos["kickoff_ts"] = future_huella.result(timeout=deadline.remaining())
+        except Exception:
+            pass  # Sin huella (timeout o fallo de la descarga) el resultado no se guarda en la caché de análisis
+        datos["elapsed_s"] = round(deadline.elapsed(), 2)
+        return AnalysisResult.from_datos(datos)
 
     except Exception as e:
         print(f"ERROR CRÍTICO en el scraper: {e}")
-        return {"error": f"Error durante el scraping: {e}"}
+        return AnalysisResult.failed(match_id, f"Error durante el scraping: {e}", "parse_error")
     finally:
+        # Sin esperar a tareas cortadas por el deadline: la respuesta no se retiene
+        executor.shutdown(wait=False, cancel_futures=True)
         # Asegurar que el driver se cierra correctamente incluso si ocurre un error
-        if 'driver' in locals():
+        if driver is not None:
             try:
                 driver.quit()
             except:
@@ -0,0 +1,91 @@
+# modules/fragment_cache.py
+"""
+Caché de fragmentos HTML renderizados de estudio.html.
+
+La página de estudio se renderizaba entera en cada visita aunque la mayoría de
+sus secciones no cambian entre dos visitas al mismo partido (ni entre partidos
+que comparten datos). Cada sección es ahora una plantilla parcial en
+templates/estudio/ que solo usa unas claves de `data`; su HTML se guarda en un
+LRU en memoria con clave = plantilla + hash de esas claves, así que una sección
+solo se vuelve a renderizar cuando cambian sus datos de entrada.
+
+render_fragments() devuelve un generador, pensado para stream_template: el
+navegador recibe la cabecera y las primeras secciones mientras se renderizan
+las siguientes.
+
+Configuración por variable de entorno:
+    FRAGMENT_CACHE_SIZE=N     (por defecto 512 fragmentos; 0 = desactivada)
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from markupsafe import Markup
+
+FRAGMENT_CACHE_SIZE = int(os.environ.get("FRAGMENT_CACHE_SIZE", "512"))
+
+# (plantilla parcial, claves de `data` que usa)
+ESTUDIO_FRAGMENTS = (
+    ("estudio/_cabecera.html", ("home_name", "away_name", "partial", "partial_stages")),
+    ("estudio/_clasificacion.html", ("home_name", "away_name", "home_standings", "away_standings",
+                                     "home_ou_stats", "away_ou_stats")),
+    ("estudio/_mercado.html", ("main_match_odds", "market_analysis_html")),
+    ("estudio/_rendimiento_reciente.html", ("home_name", "away_name", "last_home_match", "last_away_match", "h2h_col3")),
+    ("estudio/_comparativas.html", ("home_name", "away_name", "comp_L_vs_UV_A", "comp_V_vs_UL_H")),
+    ("analisis_rival_rival.html", ("home_name", "away_name", "analisis_contra_rival_del_rival")),
+    ("analisis_h2h_directo.html", ("home_name", "away_name", "h2h_stadium", "h2h_general")),
+    ("estudio/_nota_analista.html", ("advanced_analysis_html",)),
+    ("estudio/_h2h_directo.html", ("home_name", "away_name", "h2h_stadium", "h2h_general")),
+)
+
+
+def _json_default(obj):
+    # MatchStats y similares del modelo de resultado
+    if hasattr(obj, "to_list"):
+        return obj.to_list()
+    return str(obj)
+
+
+def fragment_key(template_name, subset):
+    payload = json.dumps(subset, sort_keys=True, ensure_ascii=False, default=_json_default)
+    return template_name + ":" + hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class FragmentCache:
+    def __init__(self, max_entries=FRAGMENT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_render(self, key, render):
+        if self.max_entries <= 0:
+            return render()
+        with self._lock:
+            html = self._entries.get(key)
+            if html is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return html
+        html = render()
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = html
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return html
+
+
+_fragment_cache = FragmentCache()
+
+
+def render_fragments(data, render_template, fragments=ESTUDIO_FRAGMENTS, cache=None):
+    """Genera el HTML (Markup) de cada sección, reutilizando el de la caché si sus datos no cambiaron."""
+    cache = cache or _fragment_cache
+    for template_name, keys in fragments:
+        subset = {k: data.get(k) for k in keys}
+        key = fragment_key(template_name, subset)
+        yield Markup(cache.get_or_render(key, lambda: render_template(template_name, data=subset)))
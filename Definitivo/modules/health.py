@@ -0,0 +1,66 @@
+# modules/health.py
+"""
+Estado de salud y de preparación del worker, solo a partir de memoria.
+
+render.yaml usaba healthCheckPath: / y cada sonda de Render lanzaba Chromium y
+descargaba la portada de nowgoal. /healthz y /readyz (app.py) responden con lo
+que ya saben los demás módulos, sin red, sin navegador y sin consultas:
+  - liveness():  el proceso responde (y desde cuándo).
+  - readiness(): circuito del origen no abierto, caché de análisis abierta (si
+    está configurada), estado del Chromium persistente y antigüedad de la
+    última lista de partidos descargada.
+
+Configuración por variable de entorno:
+    READY_MAX_SNAPSHOT_AGE=s    (por defecto 0 = la antigüedad de la lista no
+                                 afecta a la preparación; solo se informa)
+"""
+import os
+import time
+
+from modules import analysis_cache
+from modules.async_runtime import get_browser_pool, runtime
+from modules.circuit_breaker import breakers_snapshot
+
+READY_MAX_SNAPSHOT_AGE = float(os.environ.get("READY_MAX_SNAPSHOT_AGE", "0"))
+
+STARTED_AT = time.time()
+_snapshot = {"at": None, "matches": 0}
+
+
+def note_snapshot(matches):
+    """Anota una descarga correcta de la lista de partidos."""
+    _snapshot["at"] = time.time()
+    _snapshot["matches"] = len(matches)
+
+
+def liveness():
+    return {"status": "ok", "pid": os.getpid(), "uptime_s": round(time.time() - STARTED_AT, 1)}
+
+
+def readiness(origin_host):
+    """(preparado, detalle) sin tocar la red ni el navegador."""
+    now = time.time()
+    checks = {}
+
+    breaker = breakers_snapshot().get(origin_host, {"state": "closed", "failures": 0})
+    checks["origin"] = dict(breaker, ok=breaker["state"] != "open")
+
+    # La primera llamada abre la caché (una vez por proceso); después es un singleton en memoria
+    if not analysis_cache.ANALYSIS_CACHE_FILE:
+        checks["cache"] = {"ok": True, "enabled": False}
+    else:
+        try:
+            checks["cache"] = {"ok": analysis_cache.get_analysis_cache() is not None, "enabled": True}
+        except Exception as e:
+            checks["cache"] = {"ok": False, "enabled": True, "error": str(e)}
+
+    pool = get_browser_pool().snapshot()
+    checks["browser"] = {"ok": True, "warm": pool["warm"], "active_pages": pool["active_pages"],
+                         "launches": pool["launches"], "crashes": pool["crashes"],
+                         "event_loop": runtime.started()}
+
+    age = round(now - _snapshot["at"], 1) if _snapshot["at"] else None
+    checks["snapshot"] = {"age_s": age, "matches": _snapshot["matches"],
+                          "ok": not READY_MAX_SNAPSHOT_AGE or (age is not None and age <= READY_MAX_SNAPSHOT_AGE)}
+
+    return all(c["ok"] for c in checks.values()), checks
@@ -0,0 +1,281 @@
+# modules/html_archive.py
+"""
+Archivo de las páginas HTML descargadas, comprimido y deduplicado, con modo replay.
+
+No quedaba constancia de cómo era una página cuando se hizo un análisis (en
+HTML_extraer/ solo hay volcados manuales). Con el archivo activado cada página que
+se descarga (H2H principal, H2H Col3, estadísticas en directo, portada) se guarda:
+  - blobs/<sha256[:2]>/<sha256>.<codec>: el HTML comprimido, direccionado por su
+    contenido (la misma página descargada dos veces ocupa un solo blob). Se usa
+    zstd si está instalado 'zstandard' y zlib si no; el códec queda en el índice.
+  - index.sqlite3: (url, fetched_at, sha256, kind) para cada descarga.
+
+Modos (variable de entorno HTML_ARCHIVE_MODE):
+  - off     (por defecto): nada.
+  - record: además de descargar, archiva cada página.
+  - replay: no hay red ni Selenium; las páginas salen del archivo (la última
+            anterior a HTML_ARCHIVE_REPLAY_AT si se indica, epoch o ISO 8601).
+            Sirve para reanalizar de forma reproducible, medir sin red y
+            re-parsear tras cambiar los extractores.
+            Cada lectura pide el tipo (kind) que archivó el camino en vivo: la
+            URL /match/h2h-<id> está a la vez como página renderizada por Selenium
+            ('h2h', 'h2h_col3') y como GET plano de requests ('http', la huella
+            de la caché), y el replay no debe servir una en lugar de la otra.
+
+Uso desde línea de comandos:
+    python -m modules.html_archive stats
+    python -m modules.html_archive list <url>
+    python -m modules.html_archive replay <match_id> [<match_id> ...]   (análisis sin red, cronometrado)
+
+Configuración:
+    HTML_ARCHIVE_MODE=off|record|replay
+    HTML_ARCHIVE_DIR=ruta            (por defecto 'html_archive')
+    HTML_ARCHIVE_REPLAY_AT=instante  (opcional, solo en replay)
+"""
+import datetime
+import hashlib
+import os
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+
+import requests
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+HTML_ARCHIVE_MODE = os.environ.get("HTML_ARCHIVE_MODE", "off")
+HTML_ARCHIVE_DIR = os.environ.get("HTML_ARCHIVE_DIR", "html_archive")
+HTML_ARCHIVE_REPLAY_AT = os.environ.get("HTML_ARCHIVE_REPLAY_AT", "")
+
+
+def _parse_instant(value):
+    """Epoch o ISO 8601 (sin zona = UTC) -> timestamp; None si está vacío."""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        instant = datetime.datetime.fromisoformat(value)
+        if instant.tzinfo is None:
+            instant = instant.replace(tzinfo=datetime.timezone.utc)
+        return instant.timestamp()
+
+
+def _compress(data):
+    if zstandard is not None:
+        return "zst", zstandard.ZstdCompressor(level=10).compress(data)
+    return "zz", zlib.compress(data, 9)
+
+
+def _decompress(codec, blob):
+    if codec == "zst":
+        if zstandard is None:
+            raise ImportError("Este archivo contiene blobs zstd: instala el paquete 'zstandard'.")
+        return zstandard.ZstdDecompressor().decompress(blob)
+    return zlib.decompress(blob)
+
+
+class HtmlArchive:
+    def __init__(self, root=HTML_ARCHIVE_DIR):
+        self.root = root
+        os.makedirs(os.path.join(root, "blobs"), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(root, "index.sqlite3"), timeout=10,
+                                     check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS snapshots (
+                url        TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                sha256     TEXT NOT NULL,
+                kind       TEXT
+            )""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_url_time ON snapshots (url, fetched_at)")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS blobs (
+                sha256     TEXT PRIMARY KEY,
+                codec      TEXT NOT NULL,
+                raw_size   INTEGER NOT NULL,
+                disk_size  INTEGER NOT NULL
+            )""")
+
+    def _blob_path(self, sha, codec):
+        return os.path.join(self.root, "blobs", sha[:2], f"{sha}.{codec}")
+
+    def store(self, url, html, kind=None, fetched_at=None):
+        """Archiva una descarga; devuelve el sha256 del contenido."""
+        raw = html.encode("utf-8")
+        sha = hashlib.sha256(raw).hexdigest()
+        with self._lock:
+            known = self._conn.execute("SELECT 1 FROM blobs WHERE sha256 = ?", (sha,)).fetchone()
+        if not known:
+            codec, blob = _compress(raw)
+            path = self._blob_path(sha, codec)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(blob)
+            os.replace(tmp, path)
+            with self._lock:
+                self._conn.execute("INSERT OR IGNORE INTO blobs (sha256, codec, raw_size, disk_size) VALUES (?, ?, ?, ?)",
+                                   (sha, codec, len(raw), len(blob)))
+        with self._lock:
+            self._conn.execute("INSERT INTO snapshots (url, fetched_at, sha256, kind) VALUES (?, ?, ?, ?)",
+                               (url, fetched_at or time.time(), sha, kind))
+        return sha
+
+    def load(self, url, at=None, kinds=None):
+        """
+        HTML de la última descarga de `url` (anterior o igual a `at` si se indica) o None.
+        kinds: tipos de descarga admitidos (p. ej. ('h2h',)); None = cualquiera.
+        """
+        sql = ("SELECT s.sha256, b.codec FROM snapshots s JOIN blobs b ON b.sha256 = s.sha256 "
+               "WHERE s.url = ?")
+        params = [url]
+        if kinds:
+            sql += f" AND s.kind IN ({', '.join('?' * len(kinds))})"
+            params.extend(kinds)
+        if at is not None:
+            sql += " AND s.fetched_at <= ?"
+            params.append(at)
+        sql += " ORDER BY s.fetched_at DESC LIMIT 1"
+        with self._lock:
+            row = self._conn.execute(sql, params).fetchone()
+        if row is None:
+            return None
+        sha, codec = row
+        with open(self._blob_path(sha, codec), "rb") as f:
+            return _decompress(codec, f.read()).decode("utf-8")
+
+    def history(self, url):
+        """[(fetched_at, sha256, kind)] de todas las descargas de una URL."""
+        with self._lock:
+            return self._conn.execute("SELECT fetched_at, sha256, kind FROM snapshots WHERE url = ? ORDER BY fetched_at",
+                                      (url,)).fetchall()
+
+    def stats(self):
+        with self._lock:
+            snapshots, urls = self._conn.execute("SELECT COUNT(*), COUNT(DISTINCT url) FROM snapshots").fetchone()
+            blobs, raw, disk = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(raw_size), 0), COALESCE(SUM(disk_size), 0) FROM blobs").fetchone()
+            logical = self._conn.execute(
+                "SELECT COALESCE(SUM(b.raw_size), 0) FROM snapshots s JOIN blobs b ON b.sha256 = s.sha256").fetchone()[0]
+        return {"snapshots": snapshots, "urls": urls, "blobs": blobs, "logical_mb": logical / 1024**2,
+                "unique_mb": raw / 1024**2, "disk_mb": disk / 1024**2}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_archive = None
+_archive_lock = threading.Lock()
+
+
+def get_archive():
+    """Archivo compartido del proceso (None con HTML_ARCHIVE_MODE=off)."""
+    global _archive
+    if HTML_ARCHIVE_MODE not in ("record", "replay"):
+        return None
+    if _archive is None:
+        with _archive_lock:
+            if _archive is None:
+                _archive = HtmlArchive(HTML_ARCHIVE_DIR)
+    return _archive
+
+
+def replaying():
+    return HTML_ARCHIVE_MODE == "replay"
+
+
+def archive_page(url, html, kind=None):
+    """Archiva la página en modo record (no interrumpe la descarga si falla)."""
+    if HTML_ARCHIVE_MODE != "record" or not html:
+        return
+    try:
+        get_archive().store(url, html, kind)
+    except Exception as e:
+        print(f"[html_archive] No se pudo archivar {url}: {e}")
+
+
+def replay_page(url, *kinds):
+    """HTML archivado para la URL (de alguno de los tipos `kinds`) según HTML_ARCHIVE_REPLAY_AT (None si no está)."""
+    return get_archive().load(url, _parse_instant(HTML_ARCHIVE_REPLAY_AT), kinds or None)
+
+
+# --- Backend HTTP para requests ---
+class ReplayResponse:
+    """Lo mínimo de requests.Response que usan los fetchers."""
+
+    def __init__(self, url, text):
+        self.url = url
+        self.text = text or ""
+        self.status_code = 200 if text is not None else 404
+        self.ok = text is not None
+        self.content = self.text.encode("utf-8")
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise requests.HTTPError(f"{self.url} no está en el archivo HTML", response=self)
+
+
+class ReplaySession:
+    """Sustituto de requests.Session que sirve las páginas desde el archivo."""
+
+    headers = {}
+
+    def get(self, url, **kwargs):
+        return ReplayResponse(url, replay_page(url, "http"))
+
+
+class RecordingSession(requests.Session):
+    """
+    requests.Session que en modo record archiva cada GET HTML correcto bajo la URL
+    pedida, que es la que busca ReplaySession.get(). Si hubo redirecciones se
+    archiva también bajo la URL final. (Un hook de respuesta no sirve: requests lo
+    llama con la respuesta de la redirección antes de rellenar `history`, sin la
+    URL original.)
+    """
+
+    def request(self, method, url, *args, **kwargs):
+        response = super().request(method, url, *args, **kwargs)
+        if method.upper() == "GET" and response.status_code == 200 \
+                and "html" in response.headers.get("Content-Type", "html"):
+            archive_page(url, response.text, "http")
+            if response.url != url:
+                archive_page(response.url, response.text, "http")
+        return response
+
+
+def _main(argv):
+    if not argv or argv[0] not in ("stats", "list", "replay"):
+        print(__doc__)
+        return 1
+    archive = HtmlArchive(HTML_ARCHIVE_DIR)
+    if argv[0] == "stats":
+        s = archive.stats()
+        print(f"{s['snapshots']} descargas de {s['urls']} URLs en {s['blobs']} blobs únicos: "
+              f"{s['logical_mb']:.1f} MB lógicos, {s['unique_mb']:.1f} MB únicos, {s['disk_mb']:.1f} MB en disco")
+    elif argv[0] == "list":
+        for fetched_at, sha, kind in archive.history(argv[1]):
+            print(f"{datetime.datetime.fromtimestamp(fetched_at, datetime.timezone.utc):%Y-%m-%d %H:%M:%S}  {sha[:12]}  {kind}")
+    else:
+        # Se ejecuta como __main__: el modo se cambia en el módulo que importa el scraper
+        from modules import html_archive
+        from modules.estudio_scraper import obtener_resultado_analisis
+        html_archive.HTML_ARCHIVE_MODE = "replay"
+        for match_id in argv[1:]:
+            start = time.perf_counter()
+            result = obtener_resultado_analisis(match_id)
+            status = f"error ({result.error_kind}): {result.error}" if result.error else f"{result.home_name} vs {result.away_name}"
+            print(f"{match_id}: {time.perf_counter() - start:.2f}s  {status}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(_main(sys.argv[1:]))
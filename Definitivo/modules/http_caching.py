@@ -0,0 +1,115 @@
+# modules/http_caching.py
+"""
+Cabeceras de caché HTTP y compresión para las respuestas de Flask.
+
+/api/matches, /api/preview y /api/analisis devolvían JSON sin comprimir y sin
+ETag ni Cache-Control, así que index.html volvía a descargar cargas idénticas.
+init_app() registra un after_request que, para cada respuesta GET:
+  1. Si la vista no puso ETag y es JSON con código 200, añade uno fuerte con el
+     hash del cuerpo. Las vistas pueden poner uno propio más barato (p. ej. a
+     partir de la huella de la caché de análisis) y responder 304 sin serializar
+     nada con not_modified().
+  2. Si el If-None-Match del cliente coincide con el ETag -> 304 sin cuerpo.
+  3. Comprime con brotli (si está instalado el paquete 'brotli' y el cliente lo
+     acepta) o gzip las respuestas de texto de más de COMPRESS_MIN_BYTES. La
+     variante comprimida lleva el ETag con sufijo '-br'/'-gzip' (un ETag fuerte
+     identifica bytes exactos) y Vary: Accept-Encoding.
+Las respuestas en streaming (estudio.html) no se tocan.
+
+Configuración por variables de entorno:
+    COMPRESS_MIN_BYTES=N     (por defecto 500)
+    COMPRESS_LEVEL=N         (gzip, por defecto 6)
+"""
+import gzip
+import hashlib
+import os
+
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", "500"))
+COMPRESS_LEVEL = int(os.environ.get("COMPRESS_LEVEL", "6"))
+
+COMPRESSIBLE_TYPES = ("application/json", "text/html", "text/plain", "text/css", "application/javascript")
+ENCODING_SUFFIXES = ("", "-gzip", "-br")
+
+# Cache-Control por tipo de recurso
+CACHE_MATCH_LIST = "public, max-age=60, stale-while-revalidate=300"
+CACHE_PREVIEW = "private, max-age=300"
+CACHE_ANALYSIS = "private, max-age=60"
+CACHE_NONE = "no-store"
+
+
+def make_etag(*parts):
+    """ETag fuerte (sin comillas) a partir de varias piezas (huella, formato, versión...)."""
+    return hashlib.sha1("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()[:32]
+
+
+def etag_matches(etag):
+    """True si el If-None-Match de la petición coincide con `etag` (o su variante comprimida)."""
+    inm = request.if_none_match
+    if not inm or not etag:
+        return False
+    return inm.star_tag or any(inm.contains_weak(etag + suffix) for suffix in ENCODING_SUFFIXES)
+
+
+def not_modified(etag, cache_control, headers=None):
+    """Respuesta 304 con las cabeceras de validación."""
+    response = current_app.response_class(status=304)
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = cache_control
+    response.headers["Vary"] = "Accept-Encoding"
+    for key, value in (headers or {}).items():
+        response.headers[key] = value
+    return response
+
+
+def _negotiate_encoding():
+    accepted = request.accept_encodings
+    if brotli is not None and accepted["br"]:
+        return "br"
+    if accepted["gzip"]:
+        return "gzip"
+    return None
+
+
+def _compress(data, encoding):
+    if encoding == "br":
+        return brotli.compress(data, quality=5)
+    return gzip.compress(data, compresslevel=COMPRESS_LEVEL)
+
+
+def finalize_response(response):
+    if request.method not in ("GET", "HEAD") or response.direct_passthrough or response.is_streamed:
+        return response
+
+    mimetype = response.mimetype or ""
+    if response.status_code == 200 and mimetype == "application/json" and "ETag" not in response.headers \
+            and CACHE_NONE not in response.headers.get("Cache-Control", ""):
+        response.add_etag()
+
+    etag, _ = response.get_etag()
+    if response.status_code == 200 and etag_matches(etag):
+        extra = {k: v for k, v in response.headers.items() if k.startswith("X-")}
+        return not_modified(etag, response.headers.get("Cache-Control", "no-cache"), extra)
+
+    if response.status_code >= 300 or mimetype not in COMPRESSIBLE_TYPES or "Content-Encoding" in response.headers:
+        return response
+    response.vary.add("Accept-Encoding")
+    encoding = _negotiate_encoding()
+    data = response.get_data()
+    if encoding is None or len(data) < COMPRESS_MIN_BYTES:
+        return response
+    response.set_data(_compress(data, encoding))
+    response.headers["Content-Encoding"] = encoding
+    if etag:
+        response.set_etag(f"{etag}-{encoding}")
+    return response
+
+
+def init_app(app):
+    app.after_request(finalize_response)
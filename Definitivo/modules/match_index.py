@@ -0,0 +1,232 @@
+# modules/match_index.py
+"""
+Índice en memoria de los próximos partidos con filtros y paginación por cursor.
+
+'/' calculaba normalize_handicap_to_half_bucket_str dos veces por partido para
+las opciones del filtro, el filtro volvía a parsear cada hándicap y cada página
+de /api/matches ("Cargar 5 partidos más") descargaba y parseaba la portada
+entera para devolver 5 filas. Ahora la portada se parsea una vez por
+MATCH_INDEX_TTL segundos y UpcomingIndex guarda los partidos ordenados por
+(hora, id) con índices invertidos por tramo de hándicap (pasos de 0.5), tramo de
+línea de goles y liga, y las horas en una lista ordenada para la ventana de
+inicio:
+
+    index = get_upcoming_store(bucket).get(lambda: descargar_partidos())
+    page, next_cursor = index.query(handicap="0.25", goal_line="2.5", limit=5)
+    page, next_cursor = index.query(handicap="0.25", goal_line="2.5", limit=5, cursor=next_cursor)
+
+Cada página cuesta O(log n + página) y no O(scrape). El cursor es la clave
+(hora, id) del último partido devuelto, no una posición, así que sigue siendo
+válido aunque entre una página y otra se reconstruya el índice o empiecen
+partidos (los ya empezados se saltan con la hora actual, sin reconstruir).
+
+Configuración por variable de entorno:
+    MATCH_INDEX_TTL=s      (por defecto 120; antigüedad máxima de la portada indexada)
+"""
+import base64
+import bisect
+import datetime
+import os
+import threading
+import time
+
+MATCH_INDEX_TTL = float(os.environ.get("MATCH_INDEX_TTL", "120"))
+MAX_PAGE_SIZE = 100
+TIME_FORMAT = "%Y-%m-%d %H:%M"
+
+
+def encode_cursor(key):
+    return base64.urlsafe_b64encode(f"{key[0]}|{key[1]}".encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    """(hora, id) del cursor; ValueError si no es válido."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        kickoff, match_id = raw.split("|", 1)
+        datetime.datetime.strptime(kickoff, TIME_FORMAT)
+    except Exception:
+        raise ValueError(f"Cursor no válido: {cursor!r}")
+    return kickoff, match_id
+
+
+def _valid_time(value, name):
+    try:
+        datetime.datetime.strptime(value, TIME_FORMAT)
+    except (TypeError, ValueError):
+        raise ValueError(f"'{name}' debe tener el formato AAAA-MM-DD HH:MM (UTC)")
+    return value
+
+
+def parse_query(args):
+    """kwargs de UpcomingIndex.query a partir de los parámetros de la petición (request.args)."""
+    query = {}
+    for name in ("handicap", "goal_line", "league", "cursor"):
+        value = (args.get(name) or "").strip()
+        if value:
+            query[name] = value
+    if "cursor" in query:
+        decode_cursor(query["cursor"])
+    for name, key in (("from", "start"), ("to", "end")):
+        value = (args.get(name) or "").strip()
+        if value:
+            query[key] = _valid_time(value, name)
+    for name in ("limit", "offset"):
+        if args.get(name):
+            query[name] = int(args.get(name))
+    return query
+
+
+class UpcomingIndex:
+    def __init__(self, matches, bucket, built_at=None):
+        """
+        matches: partidos como los de parse_main_page_matches (con 'time', 'id',
+        'handicap', 'goal_line' y opcionalmente 'league').
+        bucket: función texto de línea -> tramo de 0.5 en texto (o None).
+        """
+        self.bucket = bucket
+        self.built_at = built_at or time.time()
+        self.matches = sorted(matches, key=lambda m: (m["time"], str(m["id"])))
+        self.keys = [(m["time"], str(m["id"])) for m in self.matches]
+        # Índices invertidos (valor -> [posición], en orden) y el valor de cada posición
+        self._by = {"handicap": {}, "goal_line": {}, "league": {}}
+        self._values = {"handicap": [], "goal_line": [], "league": []}
+        for pos, match in enumerate(self.matches):
+            values = {"handicap": bucket(match.get("handicap")),
+                      "goal_line": bucket(match.get("goal_line")),
+                      "league": (match.get("league") or "").strip().lower() or None}
+            for field, value in values.items():
+                self._values[field].append(value)
+                if value is not None:
+                    self._by[field].setdefault(value, []).append(pos)
+        self.handicap_options = sorted(self._by["handicap"], key=float)
+        self.goal_line_options = sorted(self._by["goal_line"], key=float)
+        self.league_options = sorted({m["league"] for m in self.matches if m.get("league")})
+
+    def __len__(self):
+        return len(self.matches)
+
+    def age(self, now=None):
+        return (now or time.time()) - self.built_at
+
+    def _filters(self, handicap, goal_line, league):
+        """[(campo, valor buscado)] de los filtros activos; un hándicap o línea no válidos no filtran."""
+        filters = []
+        for field, value in (("handicap", handicap), ("goal_line", goal_line)):
+            target = self.bucket(value) if value else None
+            if target is not None:
+                filters.append((field, target))
+        if league and league.strip():
+            filters.append(("league", league.strip().lower()))
+        return filters
+
+    def query(self, handicap=None, goal_line=None, league=None, start=None, end=None,
+              cursor=None, limit=20, offset=0, now=None):
+        """
+        (partidos de la página, cursor de la siguiente o None). Solo partidos que
+        aún no han empezado, con inicio en [start, end] si se indican. 'offset'
+        (saltar N partidos) se mantiene para los clientes antiguos de /api/matches.
+        """
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        now_key = datetime.datetime.fromtimestamp(now or time.time(), datetime.timezone.utc).strftime(TIME_FORMAT)
+        # Primera posición: después del cursor, no antes de ahora ni de 'start'
+        first = bisect.bisect_left(self.keys, (max(now_key, start or ""),))
+        if cursor:
+            first = max(first, bisect.bisect_right(self.keys, decode_cursor(cursor)))
+        stop = bisect.bisect_right(self.keys, (end, "\uffff")) if end else len(self.keys)
+
+        filters = self._filters(handicap, goal_line, league)
+        if not filters:
+            positions = range(first, stop)
+        else:
+            # Se recorre el índice del filtro más selectivo y los demás se comprueban por posición
+            filters.sort(key=lambda f: len(self._by[f[0]].get(f[1], ())))
+            (field, target), rest = filters[0], [(self._values[f], t) for f, t in filters[1:]]
+            candidates = self._by[field].get(target, [])
+            positions = (p for p in candidates[bisect.bisect_left(candidates, first):]
+                         if all(values[p] == t for values, t in rest))
+
+        page = []
+        last = None
+        for pos in positions:
+            if pos >= stop:
+                break
+            if offset > 0:
+                offset -= 1
+                continue
+            if len(page) == limit:
+                return page, encode_cursor(self.keys[last])
+            page.append(self.matches[pos])
+            last = pos
+        return page, None
+
+
+class UpcomingStore:
+    """El último UpcomingIndex del proceso; se reconstruye como mucho una vez a la vez."""
+
+    def __init__(self, bucket, ttl=MATCH_INDEX_TTL):
+        self.bucket = bucket
+        self.ttl = ttl
+        self._index = None
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    def add_listener(self, listener):
+        """listener(matches, built_at) tras cada foto nueva (p. ej. el historial de cuotas)."""
+        self._listeners.append(listener)
+
+    def current(self):
+        return self._index
+
+    def fresh(self, now=None):
+        index = self._index
+        return index is not None and index.age(now) < self.ttl
+
+    def publish(self, matches):
+        index = UpcomingIndex(matches, self.bucket)
+        with self._lock:
+            self._index = index
+        for listener in self._listeners:
+            try:
+                listener(matches, index.built_at)
+            except Exception as e:
+                print(f"[match_index] Error en el listener {listener!r}: {e}")
+        return index
+
+    def get(self, fetch):
+        """Índice vigente; si ha caducado lo reconstruye con fetch() (un solo hilo a la vez)."""
+        if self.fresh():
+            return self._index
+        with self._refresh_lock:
+            if self.fresh():
+                return self._index
+            try:
+                return self.publish(fetch())
+            except Exception as e:
+                # Mejor una portada algo antigua que un error en la lista de partidos
+                if self._index is None:
+                    raise
+                print(f"[match_index] No se pudo actualizar la portada ({e}); se sirve la de hace "
+                      f"{self._index.age():.0f}s")
+                return self._index
+
+    def snapshot(self):
+        index = self._index
+        if index is None:
+            return {"matches": 0, "age_s": None}
+        return {"matches": len(index), "age_s": round(index.age(), 1),
+                "handicaps": len(index.handicap_options), "leagues": len(index.league_options)}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_upcoming_store(bucket):
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = UpcomingStore(bucket)
+    return _store
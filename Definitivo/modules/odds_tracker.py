@@ -0,0 +1,318 @@
+# modules/odds_tracker.py
+"""
+Historial de movimientos de cuotas de los próximos partidos.
+
+El atributo 'odds' de cada fila de la portada (línea AH en la posición 2, línea
+de goles en la 10 y sus cuotas) se parseaba y se tiraba, y el movimiento de la
+línea es justo lo que se analiza. OddsTracker recibe cada foto de próximos
+partidos que se indexa (modules/match_index.py) y guarda por partido y por
+campo solo los cambios:
+
+    odds_changes: (match_id, campo, instante, valor nuevo)   NULL = sin cuota
+    odds_last:    último valor y número de valores guardados de cada campo
+    odds_matches: equipos, hora de inicio y primera/última foto de cada partido
+
+Como la caché de análisis y el almacén de historiales, es un fichero SQLite
+compartido por los workers de gunicorn: /api/odds_history y /api/odds_movers
+devuelven la misma serie responda el worker que responda, y un cambio que ven
+dos workers en sus fotos se guarda una sola vez (las fotos más antiguas que la
+última guardada de un partido no cuentan). Cuando un partido empieza se borra su
+historial, y cada campo guarda como mucho ODDS_MAX_CHANGES valores (siempre el de
+apertura).
+
+    tracker.observe(matches, now)          # una foto de parse_main_page_matches
+    tracker.history("2796572")             # {campo: [[timestamp, valor], ...]}
+    tracker.summary("2796572")             # apertura, actual, mín., máx., cambios
+    tracker.movers(limit=20)               # partidos cuya línea se ha movido
+
+El sondeo propio de la portada es opcional (ODDS_POLL_INTERVAL > 0) y solo lo
+hace un worker (modules/process_lock.py); sin él se registran las fotos que ya
+descarga la app.
+
+Configuración por variables de entorno:
+    ODDS_TRACKER_ENABLED=1|0     (por defecto 1)
+    ODDS_HISTORY_FILE=ruta       (por defecto 'odds_history.sqlite3'; vacío = desactivado)
+    ODDS_POLL_INTERVAL=s         (por defecto 0 = sin sondeo propio)
+    ODDS_MAX_CHANGES=N           (por defecto 256 por campo y partido)
+    ODDS_MAX_MATCHES=N           (por defecto 3000)
+"""
+import math
+import os
+import sqlite3
+import threading
+import time
+
+from modules.prewarm import kickoff_timestamp
+from modules.process_lock import try_acquire
+
+ODDS_TRACKER_ENABLED = os.environ.get("ODDS_TRACKER_ENABLED", "1") == "1"
+ODDS_HISTORY_FILE = os.environ.get("ODDS_HISTORY_FILE", "odds_history.sqlite3")
+ODDS_POLL_INTERVAL = float(os.environ.get("ODDS_POLL_INTERVAL", "0"))
+ODDS_MAX_CHANGES = int(os.environ.get("ODDS_MAX_CHANGES", "256"))
+ODDS_MAX_MATCHES = int(os.environ.get("ODDS_MAX_MATCHES", "3000"))
+
+# Campo del historial -> clave del partido en parse_main_page_matches
+FIELDS = {
+    "ah_line": "handicap",
+    "ah_home": "ah_home_odds",
+    "ah_away": "ah_away_odds",
+    "goal_line": "goal_line",
+    "over": "over_odds",
+    "under": "under_odds",
+}
+LINE_FIELDS = ("ah_line", "goal_line")
+
+
+def _to_float(value):
+    try:
+        value = float(str(value).strip().replace(",", "."))
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(value) else value
+
+
+def _same(a, b):
+    # None = sin cuota
+    if a is None or b is None:
+        return a is None and b is None
+    return abs(a - b) < 1e-4
+
+
+def _out(value):
+    return None if value is None else round(value, 3)
+
+
+def odds_point(match):
+    """{campo: float} de un partido de parse_main_page_matches (None si falta)."""
+    return {field: _to_float(match.get(key)) for field, key in FIELDS.items()}
+
+
+def summarize(changes):
+    """Resumen de los cambios [(instante, valor)] de un campo (None si nunca tuvo cuota)."""
+    values = [v for _, v in changes if v is not None]
+    if not values:
+        return None
+    opening, current = values[0], values[-1]
+    return {"open": _out(opening), "current": _out(current), "min": _out(min(values)),
+            "max": _out(max(values)), "move": _out(current - opening),
+            "changes": len(changes) - 1,
+            "last_change_at": changes[-1][0]}
+
+
+class OddsTracker:
+    def __init__(self, path=ODDS_HISTORY_FILE, max_changes=ODDS_MAX_CHANGES, max_matches=ODDS_MAX_MATCHES):
+        self.path = path
+        self.max_changes = max_changes
+        self.max_matches = max_matches
+        self.stats = {"snapshots": 0, "changes": 0, "pruned": 0}   # De este proceso
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS odds_matches (
+                match_id   TEXT PRIMARY KEY,
+                home_team  TEXT,
+                away_team  TEXT,
+                kickoff    REAL,
+                first_seen INTEGER NOT NULL,
+                last_seen  REAL NOT NULL
+            )""")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS odds_changes (
+                match_id TEXT NOT NULL,
+                field    TEXT NOT NULL,
+                t        INTEGER NOT NULL,
+                value    REAL
+            )""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_odds_changes ON odds_changes (match_id, field, t)")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS odds_last (
+                match_id TEXT NOT NULL,
+                field    TEXT NOT NULL,
+                value    REAL,
+                stored   INTEGER NOT NULL,
+                PRIMARY KEY (match_id, field)
+            )""")
+        self._stop = threading.Event()
+        self._thread = None
+
+    def observe(self, matches, now=None):
+        """Registra una foto de próximos partidos y poda los que ya empezaron."""
+        now = now or time.time()
+        snapshot = {}
+        for match in matches:
+            match_id = str(match.get("id", ""))
+            if match_id:
+                snapshot[match_id] = match
+        with self._lock:
+            # IMMEDIATE: otro worker no puede intercalar su foto entre la lectura y la escritura
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                seen = dict(self._conn.execute("SELECT match_id, last_seen FROM odds_matches"))
+                last = {(mid, field): (value, stored) for mid, field, value, stored
+                        in self._conn.execute("SELECT match_id, field, value, stored FROM odds_last")}
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO odds_matches (match_id, home_team, away_team, kickoff, first_seen, last_seen) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    [(mid, m.get("home_team"), m.get("away_team"), kickoff_timestamp(m), int(now), now)
+                     for mid, m in snapshot.items() if mid not in seen])
+                inserts, updates, trims = [], [], []
+                for match_id, match in snapshot.items():
+                    if seen.get(match_id, 0) > now:
+                        continue  # Otro worker ya guardó una foto más reciente de este partido
+                    for field, value in odds_point(match).items():
+                        previous = last.get((match_id, field))
+                        if previous is not None and _same(previous[0], value):
+                            continue
+                        stored = previous[1] if previous is not None else 0
+                        inserts.append((match_id, field, int(now), value))
+                        if stored >= self.max_changes:
+                            # Se conserva la apertura y se descarta el cambio más antiguo después de ella
+                            trims.append((match_id, field))
+                        else:
+                            stored += 1
+                        updates.append((match_id, field, value, stored))
+                self._conn.executemany("UPDATE odds_matches SET last_seen = MAX(last_seen, ?) WHERE match_id = ?",
+                                       [(now, mid) for mid in snapshot])
+                self._conn.executemany("INSERT INTO odds_changes (match_id, field, t, value) VALUES (?, ?, ?, ?)", inserts)
+                self._conn.executemany(
+                    "DELETE FROM odds_changes WHERE rowid = (SELECT rowid FROM odds_changes "
+                    "WHERE match_id = ? AND field = ? ORDER BY t, rowid LIMIT 1 OFFSET 1)", trims)
+                self._conn.executemany("INSERT OR REPLACE INTO odds_last (match_id, field, value, stored) VALUES (?, ?, ?, ?)",
+                                       updates)
+                pruned = self._prune(now)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        self.stats["snapshots"] += 1
+        self.stats["changes"] += len(inserts)
+        self.stats["pruned"] += pruned
+
+    def _prune(self, now):
+        started = [mid for (mid,) in self._conn.execute(
+            "SELECT match_id FROM odds_matches WHERE kickoff IS NOT NULL AND kickoff <= ?", (now,))]
+        total = self._conn.execute("SELECT COUNT(*) FROM odds_matches").fetchone()[0]
+        excess = total - len(started) - self.max_matches
+        if excess > 0:
+            # Se descartan los que llevan más tiempo sin aparecer en la portada
+            started += [mid for (mid,) in self._conn.execute(
+                "SELECT match_id FROM odds_matches WHERE kickoff IS NULL OR kickoff > ? ORDER BY last_seen LIMIT ?",
+                (now, excess))]
+        for table in ("odds_changes", "odds_last", "odds_matches"):
+            self._conn.executemany(f"DELETE FROM {table} WHERE match_id = ?", [(mid,) for mid in started])
+        return len(started)
+
+    def _series(self, match_id):
+        """{campo: [(instante, valor)]} del partido, en orden."""
+        with self._lock:
+            rows = self._conn.execute("SELECT field, t, value FROM odds_changes WHERE match_id = ? ORDER BY t, rowid",
+                                      (str(match_id),)).fetchall()
+        series = {field: [] for field in FIELDS}
+        for field, t, value in rows:
+            series.setdefault(field, []).append((t, value))
+        return series
+
+    def history(self, match_id):
+        """Historial completo del partido, o None si no se está siguiendo."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT home_team, away_team, kickoff, first_seen, last_seen FROM odds_matches WHERE match_id = ?",
+                (str(match_id),)).fetchone()
+        if row is None:
+            return None
+        home, away, kickoff, first_seen, last_seen = row
+        series = self._series(match_id)
+        return {
+            "match_id": str(match_id),
+            "home_team": home,
+            "away_team": away,
+            "kickoff": kickoff,
+            "first_seen": first_seen,
+            "last_seen": int(last_seen),
+            "series": {field: [[t, _out(v)] for t, v in series[field]] for field in FIELDS},
+            "summary": {field: summarize(series[field]) for field in FIELDS},
+        }
+
+    def summary(self, match_id):
+        with self._lock:
+            known = self._conn.execute("SELECT 1 FROM odds_matches WHERE match_id = ?", (str(match_id),)).fetchone()
+        if known is None:
+            return None
+        series = self._series(match_id)
+        return {field: summarize(series[field]) for field in FIELDS}
+
+    def movers(self, limit=20):
+        """Partidos cuya línea AH o de goles ha cambiado: primero el mayor movimiento neto, después el mayor rango."""
+        lines = ", ".join("?" * len(LINE_FIELDS))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT match_id, field, t, value FROM odds_changes WHERE field IN ({lines}) AND match_id IN "
+                f"(SELECT match_id FROM odds_last WHERE stored > 1 AND field IN ({lines})) "
+                "ORDER BY match_id, field, t, rowid", LINE_FIELDS * 2).fetchall()
+            matches = {mid: (home, away, kickoff) for mid, home, away, kickoff in self._conn.execute(
+                "SELECT match_id, home_team, away_team, kickoff FROM odds_matches")}
+        series = {}
+        for match_id, field, t, value in rows:
+            series.setdefault(match_id, {}).setdefault(field, []).append((t, value))
+        ranked = []
+        for match_id, fields in series.items():
+            moves = {f: summarize(fields.get(f, [])) for f in LINE_FIELDS}
+            lines = [m for m in moves.values() if m and m["changes"]]
+            if not lines:
+                continue
+            net = max(abs(m["move"]) for m in lines)
+            spread = max(m["max"] - m["min"] for m in lines)
+            home, away, kickoff = matches.get(match_id, (None, None, None))
+            ranked.append((net, spread, {"match_id": match_id, "home_team": home, "away_team": away,
+                                         "kickoff": kickoff, **moves}))
+        ranked.sort(key=lambda r: (-r[0], -r[1]))
+        return [r[2] for r in ranked[:limit]]
+
+    def snapshot(self):
+        with self._lock:
+            matches = self._conn.execute("SELECT COUNT(*) FROM odds_matches").fetchone()[0]
+            rows = self._conn.execute("SELECT COUNT(*) FROM odds_changes").fetchone()[0]
+        return dict(self.stats, matches=matches, rows=rows)
+
+    # --- Sondeo de la portada ---
+    def start_polling(self, refresh, interval=ODDS_POLL_INTERVAL):
+        """
+        Llama a refresh() (que descarga e indexa la portada si ha caducado) cada `interval`
+        segundos, solo en el worker que gana el lock 'odds_poll'. Con interval=0 no sondea.
+        """
+        if self._thread is None and interval > 0 and try_acquire("odds_poll"):
+            self._thread = threading.Thread(target=self._poll, args=(refresh, interval),
+                                            name="odds-tracker", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _poll(self, refresh, interval):
+        while not self._stop.wait(interval):
+            try:
+                refresh()
+            except Exception as e:
+                print(f"[odds] No se pudo actualizar la portada: {e}")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_tracker = None
+_tracker_lock = threading.Lock()
+
+
+def get_odds_tracker():
+    """Tracker compartido del proceso (None si está desactivado o ODDS_HISTORY_FILE está vacío)."""
+    global _tracker
+    if not ODDS_TRACKER_ENABLED or not ODDS_HISTORY_FILE:
+        return None
+    with _tracker_lock:
+        if _tracker is None:
+            _tracker = OddsTracker(ODDS_HISTORY_FILE)
+    return _tracker
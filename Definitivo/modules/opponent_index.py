@@ -0,0 +1,90 @@
+# modules/opponent_index.py
+"""
+Índice de rivales de las tablas de historial (table_v1 / table_v2) de la página H2H.
+
+analizar_rivales_comunes, analizar_contra_rival_del_rival y
+extract_comparative_match_of recorrían cada tabla (a veces dos veces) llamando a
+get_match_details_from_row_of por fila y comparando nombres con 'in' para cada
+pareja de equipos. OpponentIndex parsea cada fila una sola vez por análisis y la
+indexa por (equipo local, equipo visitante), con el ID numérico de cada equipo
+(modules/team_identity.py) o su nombre normalizado si la fila no trae IDs. Los
+nombres se resuelven a ID con los alias de esta misma página (index.aliases),
+no con una tabla global, de modo que:
+
+    index = get_opponent_index(soup)          # se construye una vez por soup
+    index.pair_rows("table_v1", "Singapore U23", "Vietnam U23")   # ambos sentidos
+    index.pair_rows("table_v1", 5144, 5190)                       # o por ID
+    index.opponents("table_v1", "Singapore U23", as_home=True)    # {rival: [filas]}
+
+son búsquedas en diccionario. Las filas se devuelven en el orden de la tabla
+(más reciente primero), como las devolvía el recorrido original.
+"""
+import re
+
+from modules.team_identity import TeamAliases, row_side_ref, team_ref
+from modules.utils import get_match_details_from_row_of
+
+HISTORY_TABLES = {"table_v1": "fscore_1", "table_v2": "fscore_2"}
+
+
+class OpponentIndex:
+    def __init__(self, soup, tables=HISTORY_TABLES):
+        self.aliases = TeamAliases()
+        self.rows = {}          # table_id -> [details] en orden de la tabla
+        self._pairs = {}        # table_id -> {(local, visitante): [posición]}
+        self._home = {}         # table_id -> {local: {visitante: [posición]}}
+        self._away = {}         # table_id -> {visitante: {local: [posición]}}
+        for table_id, score_selector in tables.items():
+            rows = []
+            table = soup.find("table", id=table_id)
+            if table is not None:
+                for row in table.find_all("tr", id=re.compile(rf"tr{table_id[-1]}_\d+")):
+                    details = get_match_details_from_row_of(row, score_class_selector=score_selector,
+                                                            source_table_type='hist')
+                    if details:
+                        rows.append(details)
+                        self.aliases.learn_row(details)
+            self.rows[table_id] = rows
+        # Segunda pasada, con los alias de todas las filas ya aprendidos
+        for table_id, rows in self.rows.items():
+            pairs, by_home, by_away = {}, {}, {}
+            for pos, details in enumerate(rows):
+                h, a = row_side_ref(details, 'home', self.aliases), row_side_ref(details, 'away', self.aliases)
+                pairs.setdefault((h, a), []).append(pos)
+                by_home.setdefault(h, {}).setdefault(a, []).append(pos)
+                by_away.setdefault(a, {}).setdefault(h, []).append(pos)
+            self._pairs[table_id] = pairs
+            self._home[table_id] = by_home
+            self._away[table_id] = by_away
+
+    def team_key(self, team):
+        """Clave de un equipo dado por ID (int) o por nombre (resuelto con los alias de la página)."""
+        return team if isinstance(team, int) else team_ref(name=team, aliases=self.aliases)
+
+    def has_table(self, table_id):
+        return bool(self.rows.get(table_id))
+
+    def pair_rows(self, table_id, team, opponent, league_id=None):
+        """Partidos entre los dos equipos en cualquier sentido, en el orden de la tabla."""
+        t, o = self.team_key(team), self.team_key(opponent)
+        pairs = self._pairs.get(table_id, {})
+        positions = sorted(pairs.get((t, o), []) + (pairs.get((o, t), []) if t != o else []))
+        rows = [self.rows[table_id][p] for p in positions]
+        if league_id:
+            rows = [d for d in rows if not d.get('league_id_hist') or d.get('league_id_hist') == str(league_id)]
+        return rows
+
+    def opponents(self, table_id, team, as_home):
+        """{clave del rival: [partidos]} de `team` jugando como local (as_home) o como visitante."""
+        side = self._home if as_home else self._away
+        return {opp: [self.rows[table_id][p] for p in positions]
+                for opp, positions in side.get(table_id, {}).get(self.team_key(team), {}).items()}
+
+
+def get_opponent_index(soup):
+    """Índice del soup, construido la primera vez y guardado en el propio objeto."""
+    # soup.__dict__ y no getattr: BeautifulSoup interpreta los atributos desconocidos como find()
+    index = soup.__dict__.get("_opponent_index")
+    if index is None:
+        index = soup.__dict__["_opponent_index"] = OpponentIndex(soup)
+    return index
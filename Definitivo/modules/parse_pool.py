@@ -0,0 +1,77 @@
+# modules/parse_pool.py
+"""
+Pool de procesos para el parseo CPU-bound de las páginas de Nowgoal.
+
+BeautifulSoup y los extractores son Python puro: con hilos no ganan nada y además
+compiten por el GIL con los hilos que atienden peticiones. En modo 'process' se
+envía el HTML en bruto a un proceso trabajador, que lo parsea allí y devuelve
+únicamente diccionarios compactos (picklables).
+
+Configuración por variables de entorno:
+    PARSE_MODE=thread|process      (por defecto 'thread', el comportamiento original)
+    PARSE_PROCESS_WORKERS=N        (por defecto, número de CPUs)
+"""
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+PARSE_MODE = os.environ.get("PARSE_MODE", "thread").strip().lower()
+PARSE_PROCESS_WORKERS = int(os.environ.get("PARSE_PROCESS_WORKERS", os.cpu_count() or 2))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_process_pool(max_workers=None):
+    """Devuelve el pool de procesos compartido, creándolo la primera vez."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # 'spawn' evita heredar hilos y locks del servidor (gthread) al hacer fork
+                _pool = ProcessPoolExecutor(
+                    max_workers=max_workers or PARSE_PROCESS_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _pool
+
+
+def shutdown_process_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=True)
+            _pool = None
+
+
+def run_in_process_pool(fn, *args, timeout=None):
+    """
+    Ejecuta fn(*args) en el pool de procesos y espera el resultado.
+    fn debe ser una función de nivel de módulo y sus argumentos picklables (p. ej. HTML en str).
+    Si el pool se rompe (un trabajador muere), se recrea y se reintenta una vez.
+    """
+    try:
+        return get_process_pool().submit(fn, *args).result(timeout=timeout)
+    except BrokenProcessPool:
+        shutdown_process_pool()
+        return get_process_pool().submit(fn, *args).result(timeout=timeout)
+
+
+def submit_to_process_pool(fn, *args):
+    """Como run_in_process_pool, pero sin esperar: devuelve el future (ver process_pool_result)."""
+    try:
+        return get_process_pool().submit(fn, *args)
+    except BrokenProcessPool:
+        shutdown_process_pool()
+        return get_process_pool().submit(fn, *args)
+
+
+def process_pool_result(future, fn, *args, timeout=None):
+    """Resultado de un future de submit_to_process_pool; si el pool se rompió, se repite fn(*args) una vez."""
+    try:
+        return future.result(timeout=timeout)
+    except BrokenProcessPool:
+        shutdown_process_pool()
+        return get_process_pool().submit(fn, *args).result(timeout=timeout)
@@ -0,0 +1,225 @@
+# modules/prewarm.py
+"""
+Precalentamiento de análisis para los partidos que empiezan pronto.
+
+Casi siempre se abren partidos que empiezan en la próxima hora o dos, y cada
+análisis en frío son ~15 s de Selenium. El PrewarmScheduler recibe cada foto de
+próximos partidos que publica el índice de la portada (modules/match_index.py,
+como listener del UpcomingStore: no descarga la portada por su cuenta) y analiza
+en segundo plano los N primeros que empiezan dentro de PREWARM_HORIZON_HOURS,
+guardándolos en la caché de análisis (modules/analysis_cache.py), de modo que
+"Analizar" en index.html da un 'hit'. Si la foto tiene más de
+PREWARM_SNAPSHOT_INTERVAL segundos pide al índice que se refresque.
+
+Presupuesto:
+  - Un solo worker de gunicorn precalienta (modules/process_lock.py), con un
+    solo hilo y como mucho PREWARM_MAX_PER_HOUR análisis por hora, separados al
+    menos PREWARM_MIN_INTERVAL segundos.
+  - Cede el paso a las peticiones interactivas: mientras haya alguna en curso
+    (ver interactive()) no empieza ningún análisis nuevo.
+  - Entre los workers de gunicorn cada partido se reserva en la caché (try_claim)
+    para no analizarlo dos veces.
+
+Configuración por variables de entorno:
+    PREWARM_ENABLED=1|0             (por defecto 0; requiere la caché de análisis)
+    PREWARM_MAX_MATCHES=N           (por defecto 8)
+    PREWARM_HORIZON_HOURS=h         (por defecto 2)
+    PREWARM_MAX_PER_HOUR=N          (por defecto 40)
+    PREWARM_MIN_INTERVAL=s          (por defecto 20)
+    PREWARM_SNAPSHOT_INTERVAL=s     (por defecto 600)
+"""
+import datetime
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from modules.analysis_cache import get_analysis_cache, obtener_resultado_cacheado
+from modules.process_lock import try_acquire
+
+PREWARM_ENABLED = os.environ.get("PREWARM_ENABLED", "0") == "1"
+PREWARM_MAX_MATCHES = int(os.environ.get("PREWARM_MAX_MATCHES", "8"))
+PREWARM_HORIZON_HOURS = float(os.environ.get("PREWARM_HORIZON_HOURS", "2"))
+PREWARM_MAX_PER_HOUR = int(os.environ.get("PREWARM_MAX_PER_HOUR", "40"))
+PREWARM_MIN_INTERVAL = float(os.environ.get("PREWARM_MIN_INTERVAL", "20"))
+PREWARM_SNAPSHOT_INTERVAL = float(os.environ.get("PREWARM_SNAPSHOT_INTERVAL", "600"))
+
+
+def kickoff_timestamp(match):
+    """Timestamp UTC de 'time' ('%Y-%m-%d %H:%M', en UTC como data-t de la portada)."""
+    try:
+        kickoff = datetime.datetime.strptime(match["time"], "%Y-%m-%d %H:%M")
+    except (KeyError, TypeError, ValueError):
+        return None
+    return kickoff.replace(tzinfo=datetime.timezone.utc).timestamp()
+
+
+def select_candidates(matches, now=None, horizon_hours=PREWARM_HORIZON_HOURS, max_matches=PREWARM_MAX_MATCHES):
+    """IDs de los partidos que empiezan dentro del horizonte, del más cercano al más lejano."""
+    now = now or time.time()
+    upcoming = []
+    for match in matches:
+        kickoff = kickoff_timestamp(match)
+        if kickoff is not None and now <= kickoff <= now + horizon_hours * 3600:
+            upcoming.append((kickoff, str(match["id"])))
+    upcoming.sort()
+    return [match_id for _, match_id in upcoming[:max_matches]]
+
+
+class PrewarmScheduler:
+    def __init__(self, analyze, refresh_snapshot=None, cache=None, max_matches=PREWARM_MAX_MATCHES,
+                 horizon_hours=PREWARM_HORIZON_HOURS, max_per_hour=PREWARM_MAX_PER_HOUR,
+                 min_interval=PREWARM_MIN_INTERVAL, snapshot_interval=PREWARM_SNAPSHOT_INTERVAL):
+        self.analyze = analyze                  # analyze(match_id) -> AnalysisResult
+        self.refresh_snapshot = refresh_snapshot  # () que refresca el índice de la portada si ha caducado
+        self.cache = cache
+        self.max_matches = max_matches
+        self.horizon_hours = horizon_hours
+        self.max_per_hour = max_per_hour
+        self.min_interval = min_interval
+        self.snapshot_interval = snapshot_interval
+        self.owner = f"{os.getpid()}"
+        self.stats = {"warmed": 0, "already_warm": 0, "claimed_elsewhere": 0, "errors": 0, "yielded": 0}
+        self._attempted = {}                    # match_id -> último intento (no se repite en 10 min)
+        self._snapshot = []
+        self._snapshot_at = 0.0
+        self._refresh_tried_at = 0.0
+        self._started = deque()                 # Instantes de inicio de la última hora
+        self._interactive = 0
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stop = False
+
+    # --- Entradas desde la app ---
+    def note_snapshot(self, matches, taken_at=None):
+        """Actualiza la foto de próximos partidos (listener de UpcomingStore: listener(matches, built_at))."""
+        with self._cond:
+            self._snapshot = list(matches)
+            self._snapshot_at = taken_at or time.time()
+            self._cond.notify_all()
+
+    @contextmanager
+    def interactive(self):
+        """Marca una petición interactiva en curso: el precalentamiento espera a que termine."""
+        with self._cond:
+            self._interactive += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._interactive -= 1
+                self._cond.notify_all()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="prewarm", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+
+    # --- Bucle de fondo ---
+    def _run(self):
+        while not self._stop:
+            try:
+                self._refresh_snapshot_if_stale()
+                pending = [mid for mid in select_candidates(self._snapshot, horizon_hours=self.horizon_hours,
+                                                            max_matches=self.max_matches)
+                           if time.time() - self._attempted.get(mid, 0) > 600 and not self.cache.is_fresh(mid)]
+                if not pending:
+                    self._wait(60)
+                    continue
+                for match_id in pending:
+                    if self._stop or not self._wait_for_budget():
+                        break
+                    self._warm(match_id)
+            except Exception as e:
+                print(f"[prewarm] Error en el bucle de precalentamiento: {e}")
+                self._wait(60)
+
+    def _refresh_snapshot_if_stale(self):
+        now = time.time()
+        if (self.refresh_snapshot is None or now - self._snapshot_at < self.snapshot_interval
+                or now - self._refresh_tried_at < self.snapshot_interval):
+            return
+        self._refresh_tried_at = now  # Si falla se reintenta en el siguiente intervalo
+        try:
+            # El índice publica la foto nueva a sus listeners, entre ellos note_snapshot
+            self.refresh_snapshot()
+        except Exception as e:
+            print(f"[prewarm] No se pudo actualizar la lista de partidos: {e}")
+
+    def _wait(self, seconds):
+        with self._cond:
+            self._cond.wait(timeout=seconds)
+
+    def _wait_for_budget(self):
+        """Espera a que no haya peticiones interactivas y quede presupuesto de ritmo."""
+        with self._cond:
+            while not self._stop:
+                now = time.time()
+                while self._started and now - self._started[0] > 3600:
+                    self._started.popleft()
+                if self._interactive:
+                    self.stats["yielded"] += 1
+                    self._cond.wait(timeout=5)
+                    continue
+                delay = 0.0
+                if self._started:
+                    delay = self.min_interval - (now - self._started[-1])
+                if len(self._started) >= self.max_per_hour:
+                    delay = max(delay, 3600 - (now - self._started[0]))
+                if delay > 0:
+                    self._cond.wait(timeout=delay)
+                    continue
+                self._started.append(now)
+                return True
+        return False
+
+    def _warm(self, match_id):
+        self._attempted[match_id] = time.time()
+        if self.cache.is_fresh(match_id):
+            self.stats["already_warm"] += 1
+            return
+        if not self.cache.try_claim(match_id, self.owner, ttl=300):
+            self.stats["claimed_elsewhere"] += 1
+            return
+        try:
+            start = time.perf_counter()
+            result, status = obtener_resultado_cacheado(match_id, lambda: self.analyze(match_id), cache=self.cache)
+            if result.error:
+                self.stats["errors"] += 1
+                print(f"[prewarm] {match_id}: error ({result.error_kind}) {result.error}")
+            else:
+                self.stats["warmed"] += 1
+                print(f"[prewarm] {match_id}: {status} en {time.perf_counter() - start:.1f}s")
+        finally:
+            self.cache.release_claim(match_id, self.owner)
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_prewarm_scheduler(analyze, refresh_snapshot=None):
+    """
+    Scheduler del proceso, arrancado la primera vez. None si está desactivado, no hay
+    caché o el precalentamiento ya lo hace otro worker.
+    """
+    global _scheduler
+    if not PREWARM_ENABLED:
+        return None
+    with _scheduler_lock:
+        if _scheduler is None:
+            cache = get_analysis_cache()
+            if cache is None:
+                return None
+            if not try_acquire("prewarm"):
+                print(f"[prewarm] Otro worker se encarga del precalentamiento (pid {os.getpid()} no lo arranca)")
+                return None
+            _scheduler = PrewarmScheduler(analyze, refresh_snapshot, cache).start()
+    return _scheduler
@@ -0,0 +1,49 @@
+# modules/process_lock.py
+"""
+Elección de un único worker de gunicorn para una tarea de fondo.
+
+Con `gunicorn -w N` cada worker importa app.py y arrancaría sus propios hilos de
+fondo (precalentamiento, sondeo de la portada). try_acquire(nombre) toma un
+flock no bloqueante sobre <PROCESS_LOCK_DIR>/<nombre>.lock y lo mantiene
+mientras vive el proceso: solo el primer worker que lo consigue ejecuta la
+tarea. Si ese worker muere el sistema libera el lock y el worker que gunicorn
+arranca en su lugar lo vuelve a intentar al importar la app.
+
+Sin fcntl (Windows, desarrollo local) no hay elección: se asume un solo proceso.
+
+Configuración por variable de entorno:
+    PROCESS_LOCK_DIR=ruta    (por defecto el directorio de trabajo, junto a las cachés SQLite)
+"""
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+PROCESS_LOCK_DIR = os.environ.get("PROCESS_LOCK_DIR", ".")
+
+_held = {}              # nombre -> fichero abierto con el lock (se mantiene vivo)
+_held_lock = threading.Lock()
+
+
+def try_acquire(name, lock_dir=PROCESS_LOCK_DIR):
+    """True si este proceso tiene (o acaba de conseguir) el lock `name`."""
+    if fcntl is None:
+        return True
+    with _held_lock:
+        if name in _held:
+            return True
+        lock_file = open(os.path.join(lock_dir, f"{name}.lock"), "a+")
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        lock_file.seek(0)
+        lock_file.truncate()
+        lock_file.write(f"{os.getpid()}\n")
+        lock_file.flush()
+        _held[name] = lock_file
+        return True
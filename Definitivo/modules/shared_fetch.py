@@ -0,0 +1,55 @@
+# modules/shared_fetch.py
+"""
+Deduplicación de peticiones compartidas entre varios análisis (p. ej. un lote de
+una jornada completa). Varios partidos suelen necesitar las mismas páginas
+(estadísticas de progresión de un mismo partido histórico, el mismo H2H Col3...):
+con SharedFetches solo se hace una petición por clave y el resto de llamadores
+reciben el mismo resultado, aunque lleguen mientras la primera sigue en curso.
+"""
+import threading
+from concurrent.futures import Future
+
+
+class SharedFetches:
+    """Caché 'single-flight' de resultados por clave, con contadores de aciertos."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._futures = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_fetch(self, key, fn, *args):
+        """Devuelve fn(*args), ejecutándolo solo la primera vez que se pide 'key'."""
+        with self._lock:
+            future = self._futures.get(key)
+            if future is not None:
+                self.hits += 1
+                owner = False
+            else:
+                future = self._futures[key] = Future()
+                self.misses += 1
+                owner = True
+        if not owner:
+            return future.result()
+        try:
+            result = fn(*args)
+        except BaseException as e:
+            # No cacheamos errores: el siguiente llamador lo reintentará
+            with self._lock:
+                self._futures.pop(key, None)
+            future.set_exception(e)
+            raise
+        future.set_result(result)
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "keys": len(self._futures)}
+
+
+def fetch(shared, key, fn, *args):
+    """Atajo: usa la caché compartida si existe, si no llama directamente a fn."""
+    if shared is None:
+        return fn(*args)
+    return shared.get_or_fetch(key, fn, *args)
@@ -0,0 +1,202 @@
+# modules/team_history.py
+"""
+Historial de partidos por equipo, indexado por ID de equipo y actualizado de forma
+incremental.
+
+Los mismos equipos aparecen en muchos análisis (como local, visitante, rival o
+rival del rival) y sus últimas filas de historial se volvían a descargar y parsear
+cada vez. Cada página H2H que se descarga trae el historial de sus dos equipos
+(table_v1 = local / hId, table_v2 = visitante / gId en _matchInfo); aquí se guardan
+esas filas ya parseadas, una por (equipo, partido), usando los IDs de los enlaces
+team(ID). Un partido ya conocido no se vuelve a escribir: cada página solo aporta
+las filas nuevas (el delta).
+
+Además se anota cuándo se sincronizó por última vez la tabla de cada equipo: si es
+reciente (TEAM_HISTORY_FRESH_HOURS), el historial del almacén se considera completo
+y los analizadores pueden leerlo en lugar de cargar otra página, p. ej. el H2H
+Col3 (find_h2h) que antes exigía una navegación de Selenium.
+
+    filas = extract_history_rows(soup)            # parseo puro (vale en el pool de procesos)
+    store.ingest(filas)                           # -> número de filas nuevas
+    store.history(team_id, limit=20, league_id=None)
+    store.find_h2h(team_a_id, team_b_id)
+
+Configuración por variables de entorno:
+    TEAM_HISTORY_FILE=ruta          (por defecto 'team_history.sqlite3'; vacío = desactivado)
+    TEAM_HISTORY_FRESH_HOURS=h      (por defecto 12)
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from modules.utils import get_match_details_from_row_of
+
+TEAM_HISTORY_FILE = os.environ.get("TEAM_HISTORY_FILE", "team_history.sqlite3")
+TEAM_HISTORY_FRESH_HOURS = float(os.environ.get("TEAM_HISTORY_FRESH_HOURS", "12"))
+
+def _date_key(date_txt):
+    """'dd-mm-yyyy' -> yyyymmdd (entero ordenable); 0 si no se reconoce."""
+    m = re.search(r"(\d{2})-(\d{2})-(\d{4})", date_txt or "")
+    return int(f"{m.group(3)}{m.group(2)}{m.group(1)}") if m else 0
+
+
+def _match_info_ids(soup):
+    script_tag = soup.find("script", string=re.compile(r"var _matchInfo = "))
+    if not (script_tag and script_tag.string):
+        return None, None
+    home = re.search(r"hId:\s*parseInt\('(\d+)'\)", script_tag.string)
+    away = re.search(r"gId:\s*parseInt\('(\d+)'\)", script_tag.string)
+    return (home.group(1) if home else None), (away.group(1) if away else None)
+
+
+def extract_history_rows(soup):
+    """
+    Filas de historial de table_v1/table_v2 con los IDs de ambos equipos.
+    Devuelve {"synced": [ids de equipos cuya tabla se leyó], "rows": [dicts]}.
+    """
+    home_id, away_id = _match_info_ids(soup)
+    rows, synced = [], []
+    for table_id, owner_id, score_selector in (("table_v1", home_id, "fscore_1"), ("table_v2", away_id, "fscore_2")):
+        table = soup.find("table", id=table_id)
+        if not table:
+            continue
+        if owner_id:
+            synced.append(owner_id)
+        for row in table.find_all("tr", id=re.compile(rf"tr{table_id[-1]}_\d+")):
+            # get_match_details_from_row_of ya trae los IDs de los enlaces team(ID)
+            details = get_match_details_from_row_of(row, score_class_selector=score_selector, source_table_type="hist")
+            if not (details and details.get("home_id") and details.get("away_id") and details.get("matchIndex")):
+                continue
+            details = dict(details, home_id=str(details["home_id"]), away_id=str(details["away_id"]))
+            rows.append(details)
+    return {"synced": synced, "rows": rows}
+
+
+class TeamHistoryStore:
+    def __init__(self, path=TEAM_HISTORY_FILE, fresh_hours=TEAM_HISTORY_FRESH_HOURS):
+        self.path = path
+        self.fresh_seconds = fresh_hours * 3600
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS team_matches (
+                team_id   TEXT NOT NULL,
+                match_id  TEXT NOT NULL,
+                date_key  INTEGER NOT NULL,
+                league_id TEXT,
+                home_id   TEXT NOT NULL,
+                away_id   TEXT NOT NULL,
+                details   TEXT NOT NULL,
+                PRIMARY KEY (team_id, match_id)
+            )""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_team_date ON team_matches (team_id, date_key DESC)")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS team_sync (
+                team_id   TEXT PRIMARY KEY,
+                synced_at REAL NOT NULL
+            )""")
+        self.stats = {"ingested": 0, "new_rows": 0, "h2h_hits": 0, "h2h_misses": 0}
+
+    def ingest(self, extracted):
+        """Guarda las filas de extract_history_rows que aún no estaban; devuelve cuántas son nuevas."""
+        if not extracted:
+            return 0
+        records = []
+        for d in extracted.get("rows", []):
+            payload = json.dumps(d, ensure_ascii=False, separators=(",", ":"))
+            for team_id in (d["home_id"], d["away_id"]):
+                records.append((team_id, d["matchIndex"], _date_key(d.get("date")), d.get("league_id_hist"),
+                                d["home_id"], d["away_id"], payload))
+        now = time.time()
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO team_matches (team_id, match_id, date_key, league_id, home_id, away_id, details) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)", records)
+                new_rows = self._conn.total_changes - before
+                self._conn.executemany("INSERT OR REPLACE INTO team_sync (team_id, synced_at) VALUES (?, ?)",
+                                       [(team_id, now) for team_id in extracted.get("synced", [])])
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        self.stats["ingested"] += 1
+        self.stats["new_rows"] += new_rows
+        return new_rows
+
+    def is_synced(self, team_id, now=None):
+        """True si la tabla de historial del equipo se leyó completa hace poco."""
+        now = now or time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT synced_at FROM team_sync WHERE team_id = ?", (str(team_id),)).fetchone()
+        return row is not None and now - row[0] < self.fresh_seconds
+
+    def history(self, team_id, limit=20, league_id=None):
+        """Últimos partidos del equipo (más reciente primero), como get_match_details_from_row_of + IDs."""
+        sql = "SELECT details FROM team_matches WHERE team_id = ?"
+        params = [str(team_id)]
+        if league_id:
+            sql += " AND league_id = ?"
+            params.append(str(league_id))
+        sql += " ORDER BY date_key DESC, CAST(match_id AS INTEGER) DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def find_h2h(self, team_a_id, team_b_id):
+        """
+        Último partido con resultado entre dos equipos, con la forma que devuelve
+        get_h2h_details_for_original_logic_of. None si ninguno de los dos tiene el
+        historial sincronizado recientemente o si no hay partido entre ellos.
+        """
+        if not (team_a_id and team_b_id) or str(team_a_id) == str(team_b_id) \
+                or not (self.is_synced(team_a_id) or self.is_synced(team_b_id)):
+            self.stats["h2h_misses"] += 1
+            return None
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT details FROM team_matches WHERE team_id = ? AND "
+                "((home_id = ? AND away_id = ?) OR (home_id = ? AND away_id = ?)) ORDER BY date_key DESC",
+                (str(team_a_id), str(team_a_id), str(team_b_id), str(team_b_id), str(team_a_id))).fetchall()
+        for (payload,) in rows:
+            d = json.loads(payload)
+            if "?" in d.get("score_raw", "?"):
+                continue
+            g_h, g_a = d["score_raw"].split("-", 1)
+            self.stats["h2h_hits"] += 1
+            return {
+                "status": "found", "goles_home": g_h, "goles_away": g_a,
+                "handicap": d.get("ahLine_raw") if d.get("ahLine_raw") not in (None, "-") else "N/A",
+                "match_id": d["matchIndex"], "h2h_home_team_name": d["home"], "h2h_away_team_name": d["away"],
+                "source": "team_history",
+            }
+        self.stats["h2h_misses"] += 1
+        return None
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_team_history_store():
+    """Almacén compartido del proceso (None si TEAM_HISTORY_FILE está vacío)."""
+    global _store
+    if not TEAM_HISTORY_FILE:
+        return None
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = TeamHistoryStore(TEAM_HISTORY_FILE)
+    return _store
@@ -0,0 +1,138 @@
+# modules/team_identity.py
+"""
+Identidad de equipos por ID numérico de nowgoal.
+
+Los analizadores comparaban equipos por nombre ('team.lower() in home.lower()'),
+lo que además de lento confunde "FC X" con "FC X U21". Las páginas traen los IDs:
+los enlaces de cada fila de historial (onclick "soccerDbPage.team(5144)") y
+hId/gId en _matchInfo. Aquí:
+  - row_team_ids(row): (id local, id visitante) de una fila, como int.
+    get_match_details_from_row_of los añade a cada fila como 'home_id'/'away_id'.
+  - TeamRegistry: caché del proceso ID -> nombre (internado). Solo sirve para
+    poner nombre a un ID: nunca resuelve un nombre a ID, porque dos equipos
+    distintos pueden compartir nombre en páginas distintas.
+  - TeamAliases: tabla de alias nombre normalizado -> ID local a una página (la
+    construye el índice de rivales, modules/opponent_index.py), para resolver
+    las filas o los parámetros que solo traen el nombre. Un nombre que en la
+    misma página aparece con dos IDs se considera ambiguo y no se resuelve.
+  - same_team(): compara por ID siempre que se pueda y solo como último recurso
+    por nombre normalizado exacto (nunca por subcadena).
+"""
+import re
+import sys
+import threading
+
+_TEAM_ID_RE = re.compile(r"team\((\d+)\)")
+
+
+def normalize_name(name):
+    return " ".join((name or "").split()).lower()
+
+
+def row_team_ids(row):
+    """(home_id, away_id) como int a partir de los enlaces team(ID) de la fila; None si faltan."""
+    ids = []
+    for link in row.find_all("a", onclick=True):
+        m = _TEAM_ID_RE.search(link.get("onclick", ""))
+        if m:
+            ids.append(int(m.group(1)))
+    return (ids[0], ids[1]) if len(ids) >= 2 else (None, None)
+
+
+def to_team_id(value):
+    """int o None a partir de un ID en texto/int."""
+    try:
+        return int(value) if value not in (None, "", "N/A") else None
+    except (TypeError, ValueError):
+        return None
+
+
+class TeamRegistry:
+    def __init__(self):
+        self._names = {}        # id -> nombre
+        self._lock = threading.Lock()
+
+    def learn(self, team_id, name):
+        team_id = to_team_id(team_id)
+        if team_id is None or not name or name == "N/A":
+            return team_id
+        # Lectura sin lock en el caso habitual (ya conocido)
+        if team_id not in self._names:
+            with self._lock:
+                self._names.setdefault(team_id, sys.intern(name))
+        return team_id
+
+    def learn_row(self, details):
+        """Aprende los dos equipos de una fila de get_match_details_from_row_of."""
+        self.learn(details.get("home_id"), details.get("home"))
+        self.learn(details.get("away_id"), details.get("away"))
+
+    def name_of(self, team_id):
+        return self._names.get(to_team_id(team_id))
+
+    def __len__(self):
+        return len(self._names)
+
+
+_registry = TeamRegistry()
+
+
+def get_team_registry():
+    return _registry
+
+
+_AMBIGUOUS = object()
+
+
+class TeamAliases:
+    """Alias nombre normalizado -> ID aprendidos de las filas de una sola página."""
+
+    def __init__(self):
+        self._ids = {}
+
+    def learn(self, team_id, name):
+        team_id = to_team_id(team_id)
+        if team_id is None or not name or name == "N/A":
+            return
+        key = normalize_name(name)
+        known = self._ids.get(key)
+        if known is None:
+            self._ids[key] = team_id
+        elif known != team_id:
+            self._ids[key] = _AMBIGUOUS
+
+    def learn_row(self, details):
+        self.learn(details.get("home_id"), details.get("home"))
+        self.learn(details.get("away_id"), details.get("away"))
+
+    def resolve(self, name):
+        """ID del nombre en esta página, o None si no se conoce o es ambiguo."""
+        team_id = self._ids.get(normalize_name(name))
+        return None if team_id is _AMBIGUOUS else team_id
+
+
+def team_ref(team_id=None, name=None, aliases=None):
+    """
+    Clave de comparación de un equipo: su ID (int) si se conoce, directamente o por
+    los alias de la página (TeamAliases), y si no el nombre normalizado.
+    """
+    resolved = to_team_id(team_id)
+    if resolved is None and name and aliases is not None:
+        resolved = aliases.resolve(name)
+    return resolved if resolved is not None else normalize_name(name)
+
+
+def team_arg(team_id=None, name=None):
+    """El ID (int) si se conoce y si no el nombre: lo que aceptan las consultas de OpponentIndex."""
+    resolved = to_team_id(team_id)
+    return resolved if resolved is not None else name
+
+
+def row_side_ref(details, side, aliases=None):
+    """Clave del equipo local ('home') o visitante ('away') de una fila."""
+    return team_ref(details.get(f"{side}_id"), details.get(side), aliases)
+
+
+def same_team(details, side, team_id=None, team_name=None, aliases=None):
+    """True si el equipo en details[side] es el indicado (por ID si es posible)."""
+    return row_side_ref(details, side, aliases) == team_ref(team_id, team_name, aliases)
@@ -1,6 +1,7 @@
 # modules/utils.py
 import re
 import math
+from modules.team_identity import get_team_registry, row_team_ids
 
 def get_match_details_from_row_of(row_element, score_class_selector='score', source_table_type='h2h'):
     """Extrae detalles de un partido desde una fila de la tabla."""
@@ -30,11 +31,17 @@ def get_match_details_from_row_of(row_element, score_class_selector='score', sou
         ah_line_raw = (ah_cell.get('data-o') or ah_cell.text).strip()
         ah_line_fmt = format_ah_as_decimal_string_of(ah_line_raw) if ah_line_raw not in ['', '-'] else '-'
         
+        # IDs de equipo de los enlaces team(ID); se guardan en la caché ID -> nombre del proceso
+        home_id, away_id = row_team_ids(row_element)
+        get_team_registry().learn(home_id, home)
+        get_team_registry().learn(away_id, away)
+        
         return {
             'date': date_txt, 'home': home, 'away': away, 'score': score_fmt,
             'score_raw': score_raw, 'ahLine': ah_line_fmt, 'ahLine_raw': ah_line_raw or '-',
             'matchIndex': row_element.get('index'), 'vs': row_element.get('vs'),
-            'league_id_hist': row_element.get('name')
+            'league_id_hist': row_element.get('name'),
+            'home_id': home_id, 'away_id': away_id
         }
     except Exception:
         return None
@@ -1,23 +1,30 @@
 
-import streamlit as st
-import subprocess
-import sys
-import os
+from modules.startup import (import_breakdown, install_playwright_browsers, lazy_import,
+                             playwright_browsers_installed, step, timed_import)
+st = timed_import("streamlit")
 import asyncio
-from playwright.async_api import async_playwright
-from bs4 import BeautifulSoup
 import datetime
-import pandas as pd
 
-# --- PASO 1: INSTALACIÓN DE NAVEGADORES (A PRUEBA DE FALLOS) ---
-# Usamos cache_resource para que esto solo se ejecute UNA VEZ.
+# Módulos pesados: se importan la primera vez que se usan (modules/startup.py)
+pd = lazy_import("pandas")
+bs4 = lazy_import("bs4")
+estudio_scraper = lazy_import("modules.estudio_scraper")
+
+from modules.swr_cache import SWRCache
+from modules.progress import LogSubscriber, MetricsSubscriber, ProgressReporter, StreamlitSubscriber
+
+# --- PASO 1: NAVEGADORES DE PLAYWRIGHT ---
+# Usamos cache_resource para que esto solo se ejecute UNA VEZ por proceso.
 @st.cache_resource
 def setup_playwright():
-    """Instala los navegadores de Playwright y sus dependencias de sistema."""
+    """Comprueba en disco que Chromium esté instalado; solo si falta lanza el instalador."""
+    with step("playwright: comprobar navegadores"):
+        instalado = playwright_browsers_installed()
+    if instalado:
+        return
     with st.spinner("Configurando el entorno por primera vez (puede tardar 1-2 minutos)..."):
         try:
-            # El comando install se encarga de descargar Chromium.
-            subprocess.run([sys.executable, "-m", "playwright", "install"], check=True)
+            install_playwright_browsers()
         except Exception as e:
             st.error(f"Error durante la instalación de Playwright: {e}")
             st.exception(e)
@@ -26,10 +33,6 @@ def setup_playwright():
 # Ejecutamos la configuración inicial.
 setup_playwright()
 
-# --- PASO 2: IMPORTACIONES DEL PROYECTO ---
-# Se importan después de la instalación para asegurar que el entorno está listo.
-from modules.estudio_scraper import obtener_datos_completos_partido
-
 # --- PASO 3: CONFIGURACIÓN DE LA APP DE STREAMLIT ---
 st.set_page_config(
     page_title="Análisis de Partidos",
@@ -43,9 +46,35 @@ st.markdown("Herramienta para extraer y analizar datos de partidos de fútbol.")
 # --- LÓGICA DE LA APLICACIÓN ---
 URL_NOWGOAL = "https://live20.nowgoal25.com/"
 
+# Stale-while-revalidate: pasado el TTL se sirven los datos anteriores al instante
+# y se recargan en segundo plano; pasado MAX_STALE se espera a datos nuevos.
+PARTIDOS_FRESH_TTL, PARTIDOS_MAX_STALE = 600, 3600
+ANALISIS_FRESH_TTL, ANALISIS_MAX_STALE = 1800, 6 * 3600
+
+@st.cache_resource
+def get_swr_cache():
+    """Caché compartida por todas las sesiones del servidor."""
+    return SWRCache()
+
+@st.cache_resource
+def get_metricas_analisis():
+    """Duración por etapa de los análisis de este proceso (modules/progress.py)."""
+    return MetricsSubscriber()
+
+def mostrar_antiguedad(info):
+    """Muestra la antigüedad de los datos servidos por la caché."""
+    if info.state == "miss":
+        return
+    mensaje = f"🕒 Datos de {info.age_text()}"
+    if info.refreshing:
+        mensaje += " · actualizando en segundo plano"
+    st.caption(mensaje)
+    if info.last_error:
+        st.warning(f"La última actualización falló; se muestran los datos anteriores ({info.last_error}).")
+
 @st.cache_data(ttl=600)
 def parse_main_page_matches(html_content, limit=50):
-    soup = BeautifulSoup(html_content, 'html.parser')
+    soup = bs4.BeautifulSoup(html_content, 'html.parser')
     match_rows = soup.find_all('tr', id=lambda x: x and x.startswith('tr1_'))
     upcoming_matches = []
     now_utc = datetime.datetime.utcnow()
@@ -86,6 +115,7 @@ def parse_main_page_matches(html_content, limit=50):
     return upcoming_matches[:limit]
 
 async def _get_main_page_html_async():
+    async_playwright = timed_import("playwright.async_api").async_playwright
     async with async_playwright() as p:
         browser = await p.chromium.launch(headless=True, args=['--no-sandbox', '--disable-dev-shm-usage'])
         page = await browser.new_page()
@@ -96,17 +126,32 @@ async def _get_main_page_html_async():
         finally:
             await browser.close()
 
-@st.cache_data(ttl=600)
-def get_upcoming_matches_data():
+def _descargar_partidos():
     html_content = asyncio.run(_get_main_page_html_async())
     return parse_main_page_matches(html_content)
 
+def get_upcoming_matches_data():
+    """Devuelve (partidos, CacheInfo)."""
+    return get_swr_cache().get("upcoming_matches", _descargar_partidos,
+                               fresh_ttl=PARTIDOS_FRESH_TTL, max_stale=PARTIDOS_MAX_STALE)
+
+def get_analisis_partido(match_id):
+    """Devuelve (datos del análisis, CacheInfo). Los análisis con error no se guardan."""
+    # Los mensajes solo se pintan si el análisis corre en el hilo del script; en las
+    # recargas de fondo de swr_cache van al log y a las métricas
+    progreso = ProgressReporter([StreamlitSubscriber(), LogSubscriber(), get_metricas_analisis()])
+    return get_swr_cache().get(f"analisis:{match_id}",
+                               lambda: estudio_scraper.obtener_datos_completos_partido(match_id, progress=progreso),
+                               fresh_ttl=ANALISIS_FRESH_TTL, max_stale=ANALISIS_MAX_STALE,
+                               cacheable=lambda datos: bool(datos) and "error" not in datos)
+
 # --- INTERFAZ DE USUARIO ---
 st.header("📅 Próximos Partidos")
 if st.button("Cargar Próximos Partidos"):
     with st.spinner("Buscando partidos en Nowgoal..."):
         try:
-            matches_data = get_upcoming_matches_data()
+            matches_data, cache_info = get_upcoming_matches_data()
+            mostrar_antiguedad(cache_info)
             if matches_data:
                 df = pd.DataFrame(matches_data)
                 st.dataframe(df, use_container_width=True)
@@ -126,7 +171,8 @@ if st.button("Analizar Partido"):
     else:
         with st.spinner(f"Realizando análisis completo para el partido {match_id_input}..."):
             try:
-                datos_partido = obtener_datos_completos_partido(match_id_input)
+                datos_partido, cache_info = get_analisis_partido(match_id_input)
+                mostrar_antiguedad(cache_info)
                 if not datos_partido or "error" in datos_partido:
                     st.error(f"Error al obtener datos: {datos_partido.get('error', 'Error desconocido')}")
                 else:
@@ -138,3 +184,23 @@ if st.button("Analizar Partido"):
             except Exception as e:
                 st.error(f"Ocurrió un error crítico durante el análisis.")
                 st.exception(e)
+
+# --- TIEMPOS DE ARRANQUE ---
+@st.cache_resource
+def _log_arranque():
+    """Escribe una vez por proceso el desglose del arranque en el log del servidor."""
+    filas, total_ms = import_breakdown()
+    print(f"[arranque] {total_ms:.0f} ms hasta la primera ejecución del script: " +
+          ", ".join(f"{nombre} {ms:.0f} ms" for nombre, ms, _ in filas))
+
+_log_arranque()
+with st.sidebar.expander("⏱️ Tiempos de arranque"):
+    filas, total_ms = import_breakdown()
+    st.caption(f"Proceso en marcha desde hace {total_ms / 1000:.1f} s")
+    st.markdown("\n".join(f"- `{nombre}` ({tipo}): {ms:.0f} ms" for nombre, ms, tipo in filas) or "Sin datos.")
+
+etapas = get_metricas_analisis().snapshot()["stages"]
+if etapas:
+    with st.sidebar.expander("📊 Tiempos por etapa del análisis"):
+        st.markdown("\n".join(f"- `{nombre}`: media {m['avg_s']:.1f} s, máx. {m['max_s']:.1f} s ({m['count']} análisis)"
+                               for nombre, m in etapas.items()))
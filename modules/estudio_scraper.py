@@ -1,10 +1,9 @@
 
 # modules/estudio_scraper.py
-import streamlit as st
+import os
 import time
 import re
 import math
-import pandas as pd
 import asyncio
 from concurrent.futures import ThreadPoolExecutor
 from bs4 import BeautifulSoup
@@ -12,10 +11,12 @@ import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
-# --- LIBRERÍA DE AUTOMATIZACIÓN ÚNICA: PLAYWRIGHT ---
-from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
+# Playwright se importa al usarse: el módulo también se usa fuera de la app de
+# Streamlit y así no alarga el arranque (modules/startup.py)
+from modules.startup import lazy_import
+from modules.progress import as_reporter
+playwright_api = lazy_import("playwright.async_api")
 
-# Importaciones de módulos locales
 from modules.analisis_avanzado import generar_analisis_comparativas_indirectas
 from modules.analisis_reciente import analizar_rendimiento_reciente_con_handicap, comparar_lineas_handicap_recientes
 from modules.analisis_rivales import analizar_rivales_comunes, analizar_contra_rival_del_rival
@@ -29,53 +30,80 @@ from modules.utils import parse_ah_to_number_of, format_ah_as_decimal_string_of,
 BASE_URL_OF = "https://live18.nowgoal25.com"
 PLAYWRIGHT_TIMEOUT = 25000 # Milisegundos
 
-# --- GESTOR DE NAVEGADOR PLAYWRIGHT (AJUSTADO PARA LA CACHÉ) ---
-@st.cache_resource(ttl=3600) # Cachear el browser por 1 hora
-async def get_playwright_browser():
+# --- GESTOR DE NAVEGADOR PLAYWRIGHT ---
+# Un navegador por bucle de eventos: los objetos de Playwright no se pueden usar desde otro bucle
+_browsers = {}
+
+async def get_playwright_browser(progress=None):
     """
-    Crea y devuelve una instancia del navegador. La caché de Streamlit
-    evitará que se re-ejecute la corutina, devolviendo el objeto browser cacheado.
+    Devuelve el navegador del bucle de eventos actual, creándolo la primera vez.
     """
+    loop = asyncio.get_running_loop()
+    cached = _browsers.get(loop)
+    if cached is not None and cached[1].is_connected():
+        return cached[1]
+    p, browser = await _lanzar_navegador(as_reporter(progress))
+    if browser is not None:
+        _browsers[loop] = p, browser
+    return browser
+
+async def _cerrar_navegador():
+    """Cierra el navegador del bucle actual (antes de que asyncio.run cierre el bucle)."""
+    cached = _browsers.pop(asyncio.get_running_loop(), None)
+    if cached is None:
+        return
+    p, browser = cached
+    try:
+        await browser.close()
+    finally:
+        await p.stop()
+
+async def _lanzar_navegador(progress):
+    """(playwright, browser) recién lanzados o (None, None) si no se pudo."""
+    async_playwright = playwright_api.async_playwright
     # Check if we're in Streamlit Cloud environment
-    import os
-    if os.environ.get('STREAMLIT_SERVER'):
-        st.info("⚙️ Ejecutando en entorno cloud - usando configuración optimizada...")
-        try:
-            p = await async_playwright().start()
-            # In cloud environments, we might need different launch options
-            browser = await p.chromium.launch(
-                headless=True,
-                args=['--no-sandbox', '--disable-dev-shm-usage']
-            )
-            st.success("✅ Instancia del navegador creada (cloud mode).")
-            return browser
-        except Exception as e:
-            st.error(f"No se pudo iniciar Playwright en cloud: {e}")
-            return None
+    cloud = bool(os.environ.get('STREAMLIT_SERVER'))
+    if cloud:
+        mensaje, listo = "⚙️ Ejecutando en entorno cloud - usando configuración optimizada...", "✅ Instancia del navegador creada (cloud mode)."
+        # In cloud environments, we might need different launch options
+        launch_kwargs = {"headless": True, "args": ['--no-sandbox', '--disable-dev-shm-usage']}
     else:
-        st.info("⚙️ Creando una nueva instancia del navegador virtual (Playwright)...")
-        try:
+        mensaje, listo = "⚙️ Creando una nueva instancia del navegador virtual (Playwright)...", "✅ Instancia del navegador creada."
+        launch_kwargs = {"headless": True}
+    try:
+        with progress.stage("navegador", mensaje, listo):
             p = await async_playwright().start()
-            browser = await p.chromium.launch(headless=True)
-            st.success("✅ Instancia del navegador creada.")
-            return browser # Usamos return en lugar de yield para evitar el error de corutina
-        except Exception as e:
-            st.error(f"No se pudo iniciar Playwright: {e}")
-            return None
+            browser = await p.chromium.launch(**launch_kwargs)
+        return p, browser
+    except Exception as e:
+        progress.error(f"No se pudo iniciar Playwright{' en cloud' if cloud else ''}: {e}")
+        return None, None
 
 # --- FUNCIÓN PRINCIPAL DE EXTRACCIÓN ---
-def obtener_datos_completos_partido(match_id: str):
-    return asyncio.run(obtener_datos_completos_partido_async(match_id))
+def obtener_datos_completos_partido(match_id: str, progress=None):
+    """
+    Análisis completo del partido. `progress` recibe los eventos de progreso
+    (ProgressReporter, suscriptor o lista de suscriptores; ver modules/progress.py).
+    """
+    return asyncio.run(_analizar_y_cerrar(match_id, progress))
 
-async def obtener_datos_completos_partido_async(match_id: str):
+async def _analizar_y_cerrar(match_id, progress):
+    # asyncio.run crea un bucle por llamada: el navegador se cierra con él
+    try:
+        return await obtener_datos_completos_partido_async(match_id, progress)
+    finally:
+        await _cerrar_navegador()
+
+async def obtener_datos_completos_partido_async(match_id: str, progress=None):
     if not match_id or not match_id.isdigit():
         return {"error": "ID de partido inválido."}
 
-    st.info(f"Iniciando análisis para el partido ID: {match_id}...")
+    progress = as_reporter(progress, match_id=match_id)
+    progress.info(f"Iniciando análisis para el partido ID: {match_id}...")
     page = None
     context = None
     try:
-        browser = await get_playwright_browser()
+        browser = await get_playwright_browser(progress)
         if browser is None:
             return {"error": "No se pudo crear la instancia del navegador. Esto puede deberse a restricciones del entorno de ejecución en la nube."}
         
@@ -87,66 +115,61 @@ async def obtener_datos_completos_partido_async(match_id: str):
         main_page_url = f"{BASE_URL_OF}/match/h2h-{match_id}"
         datos = {"match_id": match_id}
 
-        st.info(f"🌐 Navegando a la página del partido...")
-        await page.goto(main_page_url, timeout=PLAYWRIGHT_TIMEOUT, wait_until="domcontentloaded")
-        
-        await page.wait_for_selector("#table_v1", timeout=PLAYWRIGHT_TIMEOUT)
-        st.success("✅ Página principal cargada.")
-
-        st.info("🔍 Ajustando filtros de historial a 'All'...")
-        for select_id in ["hSelect_1", "hSelect_2", "hSelect_3"]:
-            try:
-                await page.select_option(f"#{select_id}", "0", timeout=5000)
-            except PlaywrightTimeoutError:
-                st.warning(f"No se encontró el filtro '{select_id}', continuando sin él.")
-                continue
-        
-        await page.wait_for_timeout(2000)
+        with progress.stage("carga", "🌐 Navegando a la página del partido...", "✅ Página principal cargada."):
+            await page.goto(main_page_url, timeout=PLAYWRIGHT_TIMEOUT, wait_until="domcontentloaded")
+            await page.wait_for_selector("#table_v1", timeout=PLAYWRIGHT_TIMEOUT)
+
+        with progress.stage("filtros", "🔍 Ajustando filtros de historial a 'All'..."):
+            for select_id in ["hSelect_1", "hSelect_2", "hSelect_3"]:
+                try:
+                    await page.select_option(f"#{select_id}", "0", timeout=5000)
+                except playwright_api.TimeoutError:
+                    progress.warning(f"No se encontró el filtro '{select_id}', continuando sin él.")
+                    continue
+            
+            await page.wait_for_timeout(2000)
         
-        html_content = await page.content()
-        soup_completo = BeautifulSoup(html_content, "lxml")
-        st.success("📄 Contenido de la página parseado.")
+        with progress.stage("parseo", "", "📄 Contenido de la página parseado."):
+            html_content = await page.content()
+            soup_completo = BeautifulSoup(html_content, "lxml")
 
-        st.info("📊 Extrayendo datos primarios...")
-        home_id, away_id, league_id, home_name, away_name, league_name = get_team_league_info_from_script_of(soup_completo)
+        with progress.stage("datos_primarios", "📊 Extrayendo datos primarios..."):
+            home_id, away_id, league_id, home_name, away_name, league_name = get_team_league_info_from_script_of(soup_completo)
         if not home_name or not away_name or home_name == "N/A":
              return {"error": "No se pudo extraer la información básica de los equipos."}
         datos.update({"home_name": home_name, "away_name": away_name, "league_name": league_name})
 
-        st.info("🚀 Ejecutando análisis en paralelo...")
-        with ThreadPoolExecutor(max_workers=8) as executor:
-            future_main_odds = executor.submit(extract_bet365_initial_odds_of, soup_completo)
-            future_h2h_data = executor.submit(extract_h2h_data_of, soup_completo, home_name, away_name, None)
-            future_rendimiento_local = executor.submit(analizar_rendimiento_reciente_con_handicap, soup_completo, home_name, True)
-            future_rendimiento_visitante = executor.submit(analizar_rendimiento_reciente_con_handicap, soup_completo, away_name, False)
-
-            main_match_odds_data = future_main_odds.result()
-            h2h_data = future_h2h_data.result()
-            rendimiento_local = future_rendimiento_local.result()
-            rendimiento_visitante = future_rendimiento_visitante.result()
-
-        st.success("📈 Análisis de datos completado.")
-
-        st.info("✍️ Generando resúmenes...")
-        current_ah_line = parse_ah_to_number_of(main_match_odds_data.get('ah_linea_raw', '0'))
-        
-        comparacion_local = {}
-        comparacion_visitante = {}
-        if current_ah_line is not None:
-            comparacion_local = comparar_lineas_handicap_recientes(soup_completo, home_name, current_ah_line, True)
-            comparacion_visitante = comparar_lineas_handicap_recientes(soup_completo, away_name, current_ah_line, False)
-
-        datos["market_analysis_html"] = generar_analisis_completo_mercado(main_match_odds_data, h2h_data, home_name, away_name, format_ah_as_decimal_string_of, parse_ah_to_number_of)
-        datos["recent_performance_analysis_html"] = generar_analisis_rendimiento_reciente(home_name, away_name, rendimiento_local, rendimiento_visitante, current_ah_line, comparacion_local, comparacion_visitante)
+        with progress.stage("analisis", "🚀 Ejecutando análisis en paralelo...", "📈 Análisis de datos completado."):
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                future_main_odds = executor.submit(extract_bet365_initial_odds_of, soup_completo)
+                future_h2h_data = executor.submit(extract_h2h_data_of, soup_completo, home_name, away_name, None)
+                future_rendimiento_local = executor.submit(analizar_rendimiento_reciente_con_handicap, soup_completo, home_name, True)
+                future_rendimiento_visitante = executor.submit(analizar_rendimiento_reciente_con_handicap, soup_completo, away_name, False)
+
+                main_match_odds_data = future_main_odds.result()
+                h2h_data = future_h2h_data.result()
+                rendimiento_local = future_rendimiento_local.result()
+                rendimiento_visitante = future_rendimiento_visitante.result()
+
+        with progress.stage("resumenes", "✍️ Generando resúmenes...", "🎉 ¡Análisis finalizado con éxito!"):
+            current_ah_line = parse_ah_to_number_of(main_match_odds_data.get('ah_linea_raw', '0'))
+            
+            comparacion_local = {}
+            comparacion_visitante = {}
+            if current_ah_line is not None:
+                comparacion_local = comparar_lineas_handicap_recientes(soup_completo, home_name, current_ah_line, True)
+                comparacion_visitante = comparar_lineas_handicap_recientes(soup_completo, away_name, current_ah_line, False)
+
+            datos["market_analysis_html"] = generar_analisis_completo_mercado(main_match_odds_data, h2h_data, home_name, away_name, format_ah_as_decimal_string_of, parse_ah_to_number_of)
+            datos["recent_performance_analysis_html"] = generar_analisis_rendimiento_reciente(home_name, away_name, rendimiento_local, rendimiento_visitante, current_ah_line, comparacion_local, comparacion_visitante)
         
-        st.success("🎉 ¡Análisis finalizado con éxito!")
         return datos
 
-    except PlaywrightTimeoutError:
-        st.error("Error de Timeout: La página tardó demasiado en responder.")
+    except playwright_api.TimeoutError:
+        progress.error("Error de Timeout: La página tardó demasiado en responder.")
         return {"error": "Timeout durante el scraping con Playwright."}
     except Exception as e:
-        st.error(f"Ocurrió un error inesperado durante el scraping con Playwright: {e}")
+        progress.error(f"Ocurrió un error inesperado durante el scraping con Playwright: {e}")
         return {"error": f"Error inesperado en el scraper: {e}"}
     finally:
         if page:
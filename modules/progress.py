@@ -0,0 +1,215 @@
+# modules/progress.py
+"""
+Eventos de progreso del scraper, independientes de la interfaz.
+
+obtener_datos_completos_partido_async llamaba a st.info/st.success/st.warning
+directamente, lo que lo ataba al hilo del script de Streamlit: desde Flask, un
+hilo de fondo (la recarga de swr_cache) o un pool de procesos fallaba o llenaba
+el log de avisos. Ahora el scraper emite ProgressEvent a un ProgressReporter y
+cada interfaz se suscribe a lo que necesita:
+
+    reporter = ProgressReporter([StreamlitSubscriber(), metrics])
+    with reporter.stage("carga", "Navegando a la página del partido..."):
+        ...                                  # -> stage_started / stage_finished (con duración)
+    reporter.warning("No se encontró el filtro 'hSelect_3'")
+
+Suscriptores incluidos:
+  - StreamlitSubscriber: st.info/success/warning/error, solo si se emite desde
+    el hilo del script (desde otros hilos no pinta nada).
+  - LogSubscriber: una línea por evento (CLI, logs del servidor).
+  - MetricsSubscriber: recuento y duración por etapa.
+  - QueueSubscriber: cola thread-safe para enviar los eventos por SSE.
+Cualquier función que reciba un ProgressEvent también vale como suscriptor.
+"""
+import json
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+
+STAGE_STARTED = "stage_started"
+STAGE_FINISHED = "stage_finished"
+STAGE_FAILED = "stage_failed"
+INFO = "info"
+WARNING = "warning"
+ERROR = "error"
+
+
+@dataclass
+class ProgressEvent:
+    kind: str
+    message: str = ""
+    stage: str = None
+    duration_s: float = None
+    context: dict = field(default_factory=dict)     # p. ej. {"match_id": "2696131"}
+    ts: float = field(default_factory=time.time)
+
+    def to_dict(self):
+        return asdict(self)
+
+    def to_sse(self):
+        """Evento en formato text/event-stream."""
+        return f"event: {self.kind}\ndata: {json.dumps(self.to_dict(), ensure_ascii=False)}\n\n"
+
+
+class ProgressReporter:
+    def __init__(self, subscribers=None, **context):
+        self.subscribers = list(subscribers or [])
+        self.context = context
+
+    def subscribe(self, subscriber):
+        self.subscribers.append(subscriber)
+        return subscriber
+
+    def emit(self, kind, message="", stage=None, duration_s=None):
+        event = ProgressEvent(kind, message, stage, duration_s, dict(self.context))
+        for subscriber in self.subscribers:
+            try:
+                subscriber(event)
+            except Exception as e:
+                # Un suscriptor roto no debe interrumpir el análisis
+                print(f"[progress] Error en el suscriptor {subscriber!r}: {e}")
+        return event
+
+    def info(self, message):
+        self.emit(INFO, message)
+
+    def warning(self, message):
+        self.emit(WARNING, message)
+
+    def error(self, message):
+        self.emit(ERROR, message)
+
+    @contextmanager
+    def stage(self, name, message="", done_message=None):
+        """Emite stage_started al entrar y stage_finished (o stage_failed) al salir, con la duración."""
+        self.emit(STAGE_STARTED, message, name)
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException as e:
+            self.emit(STAGE_FAILED, str(e) or type(e).__name__, name, time.perf_counter() - start)
+            raise
+        self.emit(STAGE_FINISHED, done_message or "", name, time.perf_counter() - start)
+
+
+def as_reporter(progress, **context):
+    """Acepta un ProgressReporter, un suscriptor, una lista de suscriptores o None."""
+    if isinstance(progress, ProgressReporter):
+        return ProgressReporter(progress.subscribers, **dict(progress.context, **context)) if context else progress
+    if progress is None:
+        return ProgressReporter(**context)
+    if callable(progress):
+        return ProgressReporter([progress], **context)
+    return ProgressReporter(progress, **context)
+
+
+# --- Suscriptores ---
+class StreamlitSubscriber:
+    """Muestra los mensajes con st.info/st.success/st.warning/st.error."""
+
+    def __init__(self, show_durations=False):
+        self.show_durations = show_durations
+        self._st = None
+
+    def _streamlit(self):
+        if self._st is None:
+            import streamlit
+            self._st = streamlit
+        return self._st
+
+    @staticmethod
+    def _in_script_thread():
+        try:
+            from streamlit.runtime.scriptrunner import get_script_run_ctx
+        except ImportError:
+            return False
+        # suppress_warning: desde los hilos del scraper no hay contexto y es lo esperado
+        return get_script_run_ctx(suppress_warning=True) is not None
+
+    def __call__(self, event):
+        if not self._in_script_thread():
+            return
+        st = self._streamlit()
+        if event.kind == STAGE_STARTED and event.message:
+            st.info(event.message)
+        elif event.kind == STAGE_FINISHED and event.message:
+            suffix = f" ({event.duration_s:.1f}s)" if self.show_durations and event.duration_s is not None else ""
+            st.success(event.message + suffix)
+        elif event.kind == INFO:
+            st.info(event.message)
+        elif event.kind == WARNING:
+            st.warning(event.message)
+        elif event.kind == ERROR:
+            # stage_failed no se pinta: el scraper ya emite su propio error legible
+            st.error(event.message)
+
+
+class LogSubscriber:
+    def __init__(self, prefix="[progreso]", write=print):
+        self.prefix = prefix
+        self.write = write
+
+    def __call__(self, event):
+        parts = [self.prefix]
+        if event.context.get("match_id"):
+            parts.append(str(event.context["match_id"]))
+        parts.append(event.kind)
+        if event.stage:
+            parts.append(event.stage)
+        if event.duration_s is not None:
+            parts.append(f"{event.duration_s * 1000:.0f}ms")
+        if event.message:
+            parts.append(f"- {event.message}")
+        self.write(" ".join(parts))
+
+
+class MetricsSubscriber:
+    """Recuento, duración total y máxima por etapa; avisos y errores."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stages = {}
+        self.warnings = 0
+        self.errors = 0
+
+    def __call__(self, event):
+        with self._lock:
+            if event.kind in (STAGE_FINISHED, STAGE_FAILED):
+                s = self.stages.setdefault(event.stage, {"count": 0, "failed": 0, "total_s": 0.0, "max_s": 0.0})
+                s["count"] += 1
+                s["failed"] += event.kind == STAGE_FAILED
+                s["total_s"] += event.duration_s
+                s["max_s"] = max(s["max_s"], event.duration_s)
+            elif event.kind == WARNING:
+                self.warnings += 1
+            elif event.kind == ERROR:
+                self.errors += 1
+
+    def snapshot(self):
+        with self._lock:
+            stages = {name: dict(s, avg_s=s["total_s"] / s["count"]) for name, s in self.stages.items()}
+            return {"stages": stages, "warnings": self.warnings, "errors": self.errors}
+
+
+class QueueSubscriber:
+    """Deja los eventos en una cola para consumirlos desde otro hilo (p. ej. un endpoint SSE)."""
+
+    def __init__(self, maxsize=1000):
+        self.queue = queue.Queue(maxsize=maxsize)
+
+    def __call__(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            pass
+
+    def iter_sse(self, done, poll=0.5):
+        """Genera los eventos en formato SSE hasta que done() sea True y la cola esté vacía."""
+        while True:
+            try:
+                yield self.queue.get(timeout=poll).to_sse()
+            except queue.Empty:
+                if done():
+                    return
@@ -0,0 +1,118 @@
+# modules/startup.py
+"""
+Arranque en frío de la app de Streamlit.
+
+Cada proceso nuevo del servidor lanzaba 'python -m playwright install' (un
+subproceso que arranca Node y revisa las descargas) e importaba pandas,
+playwright y bs4 antes de pintar nada. Aquí:
+  - playwright_browsers_installed() mira en disco si Chromium ya está instalado
+    (la carpeta de navegadores de Playwright y su marca INSTALLATION_COMPLETE),
+    sin subprocesos; solo si falta hay que llamar a install_playwright_browsers().
+  - lazy_import() devuelve un módulo que se importa la primera vez que se usa
+    uno de sus atributos, y timed_import() lo importa ya. Ambos anotan cuánto
+    tardó cada importación.
+  - import_breakdown() da esos tiempos (y los de los pasos de arranque medidos
+    con step()) para mostrarlos en la app o en el log.
+"""
+import glob
+import importlib
+import importlib.util
+import os
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+_timings = []           # [(nombre, segundos, tipo)]
+_timings_lock = threading.Lock()
+PROCESS_START = time.perf_counter()
+
+
+def _record(name, seconds, kind):
+    with _timings_lock:
+        _timings.append((name, seconds, kind))
+
+
+def timed_import(name):
+    """Importa el módulo anotando el tiempo (0 si ya estaba importado)."""
+    if name in sys.modules:
+        return sys.modules[name]
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    _record(name, time.perf_counter() - start, "import")
+    return module
+
+
+class _LazyModule:
+    """Módulo que se importa al acceder al primer atributo."""
+
+    def __init__(self, name):
+        self.__dict__["_name"] = name
+        self.__dict__["_module"] = None
+
+    def _load(self):
+        if self._module is None:
+            self.__dict__["_module"] = timed_import(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = "cargado" if self._module is not None else "sin cargar"
+        return f"<módulo diferido {self._name!r} ({state})>"
+
+
+def lazy_import(name):
+    return _LazyModule(name)
+
+
+@contextmanager
+def step(name):
+    """Mide un paso del arranque (p. ej. la comprobación de navegadores)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record(name, time.perf_counter() - start, "step")
+
+
+def import_breakdown():
+    """[(nombre, ms, tipo)] de más lento a más rápido, y ms desde que arrancó el proceso."""
+    with _timings_lock:
+        rows = sorted(((n, s * 1000, k) for n, s, k in _timings), key=lambda r: -r[1])
+    return rows, (time.perf_counter() - PROCESS_START) * 1000
+
+
+# --- Navegadores de Playwright ---
+def _playwright_browsers_dirs():
+    custom = os.environ.get("PLAYWRIGHT_BROWSERS_PATH")
+    if custom == "0":
+        # Navegadores dentro del paquete de playwright
+        spec = importlib.util.find_spec("playwright")
+        if spec and spec.submodule_search_locations:
+            return [os.path.join(spec.submodule_search_locations[0], "driver", "package", ".local-browsers")]
+        return []
+    if custom:
+        return [custom]
+    if sys.platform == "win32":
+        return [os.path.join(os.environ.get("LOCALAPPDATA", os.path.expanduser("~")), "ms-playwright")]
+    if sys.platform == "darwin":
+        return [os.path.expanduser("~/Library/Caches/ms-playwright")]
+    return [os.path.join(os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "ms-playwright")]
+
+
+def playwright_browsers_installed(browser="chromium"):
+    """True si hay una instalación completa de `browser` en la carpeta de Playwright."""
+    for base in _playwright_browsers_dirs():
+        for path in glob.glob(os.path.join(base, f"{browser}-*")):
+            if os.path.exists(os.path.join(path, "INSTALLATION_COMPLETE")):
+                return True
+    return False
+
+
+def install_playwright_browsers(browser="chromium"):
+    """Lanza el instalador de Playwright (lento: solo si playwright_browsers_installed() es False)."""
+    with step("playwright install"):
+        subprocess.run([sys.executable, "-m", "playwright", "install", browser], check=True)
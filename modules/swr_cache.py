@@ -0,0 +1,142 @@
+# modules/swr_cache.py
+"""
+Caché stale-while-revalidate para la app de Streamlit.
+
+Con st.cache_data(ttl=600), al vencer la entrada el siguiente usuario se quedaba
+esperando una descarga completa con Chromium. Aquí cada entrada tiene dos límites:
+  - fresh_ttl:  mientras no se supere, el valor se sirve tal cual ('fresh').
+  - max_stale:  entre fresh_ttl y max_stale se sirve el valor viejo al instante
+                ('stale') y se lanza UNA recarga en segundo plano por clave.
+                Pasado max_stale el valor ya no se considera utilizable y la
+                petición espera a la recarga ('miss').
+Si la recarga en segundo plano falla, se sigue sirviendo el valor viejo (hasta
+max_stale) y el error queda en `last_error` para mostrarlo en la interfaz.
+
+    cache = SWRCache()
+    valor, info = cache.get("partidos", cargar_partidos, fresh_ttl=600, max_stale=3600)
+    info.age_seconds, info.state, info.refreshing, info.last_error
+"""
+import threading
+import time
+from dataclasses import dataclass
+
+
+@dataclass
+class CacheInfo:
+    state: str                 # 'fresh' | 'stale' | 'miss'
+    age_seconds: float         # Antigüedad de los datos devueltos
+    fetched_at: float          # time.time() de la descarga de esos datos
+    refreshing: bool = False   # Hay una recarga en segundo plano en curso
+    last_error: str = None     # Error de la última recarga fallida (si la hubo)
+
+    def age_text(self):
+        """Antigüedad legible ('hace 45 s', 'hace 12 min', 'hace 2 h')."""
+        age = int(self.age_seconds)
+        if age < 60:
+            return f"hace {age} s"
+        if age < 3600:
+            return f"hace {age // 60} min"
+        return f"hace {age // 3600} h {age % 3600 // 60} min"
+
+
+class _Entry:
+    __slots__ = ("value", "fetched_at", "refreshing", "last_error")
+
+    def __init__(self, value, fetched_at):
+        self.value = value
+        self.fetched_at = fetched_at
+        self.refreshing = False
+        self.last_error = None
+
+
+class SWRCache:
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._load_locks = {}   # clave -> [Lock, peticiones que lo usan]; vive lo que su entrada
+
+    def get(self, key, loader, fresh_ttl=600, max_stale=3600, cacheable=None):
+        """
+        Devuelve (valor, CacheInfo). loader() descarga el valor; cacheable(valor)
+        decide si se guarda (p. ej. no guardar respuestas con error).
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry.fetched_at < max_stale:
+                return self._serve(key, entry, now, loader, cacheable, fresh_ttl)
+            load_lock = self._load_locks.setdefault(key, [threading.Lock(), 0])
+            load_lock[1] += 1
+
+        # Sin valor utilizable: una sola carga síncrona por clave, el resto espera
+        try:
+            with load_lock[0]:
+                with self._lock:
+                    entry = self._entries.get(key)
+                    now = time.time()
+                    if entry is not None and now - entry.fetched_at < max_stale:
+                        # Otra petición la cargó mientras esperábamos
+                        return self._serve(key, entry, now, loader, cacheable, fresh_ttl)
+                value = loader()
+                fetched_at = time.time()
+                if cacheable is None or cacheable(value):
+                    with self._lock:
+                        self._store(key, value, fetched_at)
+                return value, CacheInfo("miss", 0.0, fetched_at)
+        finally:
+            with self._lock:
+                load_lock[1] -= 1
+                if load_lock[1] == 0 and key not in self._entries:
+                    # Carga no cacheable o entrada ya descartada: el lock se va con ella
+                    self._load_locks.pop(key, None)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._drop_load_lock(key)
+
+    def _serve(self, key, entry, now, loader, cacheable, fresh_ttl):
+        """Valor de una entrada utilizable (llamar con self._lock tomado); si está vieja lanza la recarga."""
+        if now - entry.fetched_at < fresh_ttl:
+            return entry.value, self._info("fresh", entry, now)
+        if not entry.refreshing:
+            entry.refreshing = True
+            threading.Thread(target=self._refresh, args=(key, loader, cacheable),
+                             name=f"swr-refresh-{key}", daemon=True).start()
+        return entry.value, self._info("stale", entry, now)
+
+    def _refresh(self, key, loader, cacheable):
+        try:
+            value = loader()
+            if cacheable is not None and not cacheable(value):
+                raise ValueError("respuesta no cacheable")
+        except Exception as e:
+            print(f"[swr] Recarga en segundo plano de {key!r} fallida: {e}")
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    entry.refreshing = False
+                    entry.last_error = str(e)
+            return
+        with self._lock:
+            self._store(key, value, time.time())
+
+    def _store(self, key, value, fetched_at):
+        self._entries.pop(key, None)
+        self._entries[key] = _Entry(value, fetched_at)
+        while len(self._entries) > self.max_entries:
+            # Se descarta la entrada más antigua (los dicts mantienen el orden de inserción)
+            evicted = next(iter(self._entries))
+            self._entries.pop(evicted)
+            self._drop_load_lock(evicted)
+
+    def _drop_load_lock(self, key):
+        # Si hay peticiones usándolo, la última lo quita al terminar
+        load_lock = self._load_locks.get(key)
+        if load_lock is not None and load_lock[1] == 0:
+            del self._load_locks[key]
+
+    @staticmethod
+    def _info(state, entry, now):
+        return CacheInfo(state, now - entry.fetched_at, entry.fetched_at, entry.refreshing, entry.last_error)